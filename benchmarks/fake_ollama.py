@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/tags and /api/chat like Ollama, with canned tokens."""
+    protocol_version = "HTTP/1.1"
+    # Tokens go out as tiny writes; don't let Nagle hold them back
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+    def _counters(self, request, started):
+        # Token counts and nanosecond durations, as Ollama reports them when done
+        elapsed = time.perf_counter_ns() - started
+        prompt = sum(len(message.get("content", "").split()) for message in request.get("messages", []))
+        return {
+            "done": True,
+            "total_duration": elapsed,
+            "load_duration": 0,
+            "prompt_eval_count": prompt,
+            "prompt_eval_duration": 0,
+            "eval_count": self.server.tokens,
+            "eval_duration": elapsed
+        }
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": self.server.model}]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != "/api/chat":
+            self._send_json({"error": "not found"}, 404)
+            return
+
+        request = json.loads(body or b"{}")
+        started = time.perf_counter_ns()
+        tokens = [f"{self.server.token} " for _ in range(self.server.tokens)]
+        if not request.get("stream", True):
+            time.sleep(self.server.token_delay * len(tokens))
+            self._send_json(dict(
+                self._counters(request, started),
+                model=request.get("model"),
+                message={"role": "assistant", "content": "".join(tokens)}
+            ))
+            return
+
+        # One NDJSON line per token, like a real generation
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens:
+            if self.server.token_delay:
+                time.sleep(self.server.token_delay)
+            line = {"model": request.get("model"), "message": {"role": "assistant", "content": token}, "done": False}
+            self._write_chunk(json.dumps(line).encode("utf-8") + b"\n")
+        final = dict(self._counters(request, started), model=request.get("model"))
+        self._write_chunk(json.dumps(final).encode("utf-8") + b"\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+class FakeOllama:
+    """A local stand-in for the Ollama API, so the LLM client can be benchmarked offline.
+    
+    Every chat answer is `tokens` copies of `token`, streamed with
+    `token_delay` seconds between them.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, model="fake-model", tokens=200, token="word", token_delay=0.0):
+        self.server = ThreadingHTTPServer((host, port), FakeOllamaHandler)
+        self.server.daemon_threads = True
+        self.server.model = model
+        self.server.tokens = tokens
+        self.server.token = token
+        self.server.token_delay = token_delay
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fake-ollama", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Ollama API for offline benchmarks")
+    parser.add_argument("--port", type=int, default=11435, help="Port to listen on")
+    parser.add_argument("--model", default="fake-model", help="Model name to report")
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens per answer")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed tokens")
+    args = parser.parse_args()
+
+    fake = FakeOllama(port=args.port, model=args.model, tokens=args.tokens, token_delay=args.token_delay)
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        fake.server.server_close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
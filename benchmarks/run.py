@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+
+# Suites in the order they run; search grows the repo the index suite built
+SUITES = ("index", "search", "context", "llm")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark indexing, search, context generation and LLM streaming")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma-separated suites to run ({', '.join(SUITES)})")
+    parser.add_argument("--files", type=int, default=500, help="Files in the synthetic repo (and added per search step)")
+    parser.add_argument("--languages", help="Language mix by weight, e.g. py=60,js=30,go=10")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic repo, history and queries")
+    parser.add_argument("--search-steps", type=int, default=3, help="Times the tables grow during the search suite")
+    parser.add_argument("--commands", type=int, default=2000, help="History rows added per search step")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per search step")
+    parser.add_argument("--context-queries", type=int, default=30, help="Distinct queries for the context suite")
+    parser.add_argument("--llm-tokens", type=int, default=500, help="Tokens per fake LLM answer")
+    parser.add_argument("--llm-rounds", type=int, default=20, help="Fake LLM answers to stream")
+    parser.add_argument("--output", help="JSON results file (default: benchmark-<commit>-<time>.json)")
+    parser.add_argument("--workdir", help="Directory for the repo and database (default: a temporary one)")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory afterwards")
+    return parser.parse_args()
+
+def _git(*args):
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment():
+    """Where the numbers came from, so result files can be compared fairly."""
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    }
+
+def main():
+    args = parse_args()
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    unknown = [suite for suite in suites if suite not in SUITES]
+    if unknown:
+        print(f"Unknown suite(s): {', '.join(unknown)}; expected: {', '.join(SUITES)}")
+        return 1
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="mcp-bench-")
+
+    # Must be set before any server module reads its configuration
+    os.environ["MCP_DB_FILE"] = os.path.join(workdir, "db", "session_history.db")
+    from server import mcp_server
+    from benchmarks import suites as bench
+    from benchmarks.synthetic import parse_language_mix
+
+    languages = parse_language_mix(args.languages) if args.languages else None
+    workspace = bench.Workspace(workdir, languages, args.seed)
+    results = {"environment": environment(), "parameters": vars(args), "results": {}}
+
+    mcp_server.start_background()
+    try:
+        for suite in suites:
+            print(f"Running {suite} benchmark...")
+            started = time.perf_counter()
+            if suite == "index":
+                result = bench.bench_index(workspace, args.files)
+            elif suite == "search":
+                result = bench.bench_search(workspace, args.search_steps, args.files, args.commands, args.queries)
+            elif suite == "context":
+                result = bench.bench_context(workspace, args.context_queries)
+            else:
+                result = bench.bench_llm(args.llm_tokens, args.llm_rounds)
+            results["results"][suite] = result
+            print(json.dumps(result, indent=2))
+            print(f"{suite} benchmark took {time.perf_counter() - started:.1f}s")
+    finally:
+        mcp_server.stop_background()
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    commit = (results["environment"]["commit"] or "unknown")[:10]
+    output = args.output or f"benchmark-{commit}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
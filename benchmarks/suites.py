@@ -0,0 +1,219 @@
+import io
+import os
+import time
+import threading
+import contextlib
+from werkzeug.serving import make_server
+
+from server import mcp_server
+from server.database import log_command, search_code, get_similar_commands, resolve_project_ids
+from server.code_indexer import indexer
+from server.semantic_index import semantic_index
+from server.context_builder import RANKERS
+from server.serve import KeepAliveRequestHandler
+from client import transport
+from client.llm_interface import LLMInterface
+from .synthetic import generate_repo, generate_commands, generate_queries
+from .fake_ollama import FakeOllama
+
+def summarize(samples):
+    """Latency percentiles in milliseconds for a list of durations in seconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def percentile(p):
+        # Nearest rank, so every reported value was actually observed
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(percentile(50), 3),
+        "p90_ms": round(percentile(90), 3),
+        "p99_ms": round(percentile(99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+def _timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+class Workspace:
+    """A synthetic repository and shell history that the suites grow and measure."""
+
+    def __init__(self, root, languages=None, seed=0):
+        self.repo = os.path.join(root, "repo")
+        self.languages = languages
+        self.seed = seed
+        self.files = 0
+        self.bytes = 0
+        self.commands = 0
+        self.working_dirs = [self.repo] + [os.path.join(self.repo, f"pkg_{i}") for i in range(4)]
+
+    def add_files(self, count):
+        """Write `count` more files and index them; returns (files, bytes, seconds)."""
+        files, size = generate_repo(self.repo, count, self.languages, seed=self.seed, start=self.files)
+        self.files += files
+        self.bytes += size
+
+        started = time.perf_counter()
+        indexer.index_project(self.repo)
+        wait_for_indexing()
+        return files, size, time.perf_counter() - started
+
+    def add_commands(self, count):
+        for command, output, working_dir, exit_code in generate_commands(
+            count, self.working_dirs, seed=self.seed, start=self.commands
+        ):
+            log_command(command, output, working_dir, exit_code)
+        self.commands += count
+
+def wait_for_indexing(poll=0.005):
+    """Block until queued files are parsed and their rows committed."""
+    while indexer.is_indexing():
+        time.sleep(poll)
+    indexer.writer.flush()
+
+def bench_index(workspace, files):
+    """Index a fresh synthetic repo, then re-index it unchanged."""
+    written, size, seconds = workspace.add_files(files)
+    rescan_seconds, _ = _timed(lambda: (indexer.index_project(workspace.repo), wait_for_indexing()))
+    writer = indexer.writer.get_stats()
+    return {
+        "files": written,
+        "bytes": size,
+        "seconds": round(seconds, 3),
+        "files_per_second": round(written / seconds, 1),
+        "bytes_per_second": round(size / seconds, 1),
+        "batches_committed": writer["batches_committed"],
+        "avg_commit_seconds": writer["avg_commit_seconds"],
+        "unchanged_rescan_seconds": round(rescan_seconds, 3)
+    }
+
+def bench_search(workspace, steps, files_per_step, commands_per_step, queries):
+    """Measure search_code and get_similar_commands latency as both tables grow.
+
+    Each step adds files_per_step files and commands_per_step history rows,
+    then runs every query against each table.
+    """
+    queries = generate_queries(queries, workspace.seed)
+    results = []
+    for step in range(steps):
+        # The index suite may already have built the first step's repo
+        if step > 0 or workspace.files == 0:
+            workspace.add_files(files_per_step)
+        workspace.add_commands(commands_per_step)
+        project_ids = resolve_project_ids(workspace.repo)
+
+        code_seconds, code_hits, command_seconds, command_hits = [], 0, [], 0
+        for query in queries:
+            seconds, hits = _timed(search_code, query, 10, project_ids)
+            code_seconds.append(seconds)
+            code_hits += len(hits)
+            seconds, hits = _timed(get_similar_commands, query, 5)
+            command_seconds.append(seconds)
+            command_hits += len(hits)
+
+        results.append({
+            "files": workspace.files,
+            "commands": workspace.commands,
+            "search_code": dict(summarize(code_seconds), mean_results=round(code_hits / len(queries), 2)),
+            "get_similar_commands": dict(summarize(command_seconds), mean_results=round(command_hits / len(queries), 2))
+        })
+    return results
+
+class _QuietRequestHandler(KeepAliveRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+@contextlib.contextmanager
+def _http_server():
+    """Serve the app on a free local port, the way serve.py's threaded mode does."""
+    server = make_server("127.0.0.1", 0, mcp_server.app, threaded=True, request_handler=_QuietRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, name="bench-server", daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def bench_context(workspace, queries):
+    """Time /api/context/generate over HTTP, uncached per ranker and then cached."""
+    if workspace.files == 0:
+        workspace.add_files(100)
+    semantic_index.refresh()
+    queries = list(dict.fromkeys(generate_queries(queries * 2, workspace.seed + 1)))[:queries]
+
+    results = {}
+    with _http_server() as url:
+        session = transport.create_session(url, None)
+
+        def generate(query, ranker):
+            response = session.post(
+                f"{url}/api/context/generate",
+                json={"query": query, "project_path": workspace.repo, "ranker": ranker},
+                timeout=transport.DEFAULT_TIMEOUT
+            )
+            response.raise_for_status()
+            return response.json()
+
+        for ranker in RANKERS:
+            samples, tokens = [], 0
+            for query in queries:
+                seconds, data = _timed(generate, query, ranker)
+                samples.append(seconds)
+                tokens += data["context"]["tokens"]
+            results[ranker] = dict(summarize(samples), mean_tokens=round(tokens / len(queries), 1))
+
+        # Same queries again; answered from the context cache
+        results["cached"] = summarize([_timed(generate, query, RANKERS[-1])[0] for query in queries])
+    return results
+
+def bench_llm(tokens, rounds, token_delay=0.0):
+    """Measure LLMInterface._stream_response against a fake Ollama.
+
+    `raw` reads the same stream without parsing or printing it, so
+    overhead_per_token_us is what the client itself adds per token.
+    """
+    context = {
+        "project_path": "/tmp/project",
+        "code_snippets": [
+            {"file_path": "app.py", "content": "def main():\n    pass\n", "language": "python", "start_line": 1, "end_line": 2}
+        ],
+        "command_history": [{"command": "pytest", "output": "1 passed"}]
+    }
+
+    with FakeOllama(tokens=tokens, token_delay=token_delay) as fake:
+        llm = LLMInterface(model="fake-model", check_availability=False)
+        llm.base_url = fake.url
+
+        def raw():
+            response = transport.post(
+                f"{fake.url}/api/chat",
+                json={"model": "fake-model", "messages": [], "stream": True},
+                stream=True
+            )
+            for _ in response.iter_lines():
+                pass
+
+        def interface():
+            # Tokens are echoed to the terminal; keep them out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                return llm.generate_response("explain main", context, stream=True)
+
+        interface()     # warm the connection pool
+        raw_samples = [_timed(raw)[0] for _ in range(rounds)]
+        samples = [_timed(interface)[0] for _ in range(rounds)]
+
+    overhead = (sum(samples) - sum(raw_samples)) / rounds / tokens
+    return {
+        "tokens": tokens,
+        "token_delay": token_delay,
+        "raw": summarize(raw_samples),
+        "stream_response": summarize(samples),
+        "tokens_per_second": round(tokens * rounds / sum(samples), 1),
+        "overhead_per_token_us": round(overhead * 1e6, 2)
+    }
\ No newline at end of file
@@ -0,0 +1,208 @@
+import os
+import random
+
+# Words identifiers, comments and commands are built from; queries draw on
+# the same words so searches have something to find
+WORDS = [
+    "account", "buffer", "cache", "channel", "client", "config", "connection", "context",
+    "cursor", "decode", "digest", "document", "encode", "event", "export", "filter",
+    "format", "handler", "header", "index", "input", "item", "job", "layout", "loader",
+    "message", "metric", "model", "node", "order", "output", "packet", "page", "parse",
+    "payload", "plugin", "policy", "queue", "record", "render", "report", "request",
+    "resolve", "response", "route", "schema", "session", "signal", "snapshot", "socket",
+    "source", "stream", "task", "template", "token", "transform", "user", "validate",
+    "value", "worker"
+]
+
+# Weights used when --languages isn't given
+DEFAULT_LANGUAGES = {"py": 50, "js": 20, "go": 10, "rs": 10, "java": 5, "md": 5}
+
+def parse_language_mix(spec):
+    """Parse "py=60,js=30,go=10" into {extension: weight}."""
+    mix = {}
+    for part in spec.split(","):
+        extension, _, weight = part.strip().partition("=")
+        if extension not in _GENERATORS:
+            raise ValueError(f"Unsupported language '{extension}', expected one of: {', '.join(_GENERATORS)}")
+        mix[extension] = float(weight or 1)
+    return mix
+
+def _snake(rng, parts=2):
+    return "_".join(rng.sample(WORDS, parts))
+
+def _camel(rng, parts=2):
+    first, *rest = rng.sample(WORDS, parts)
+    return first + "".join(word.title() for word in rest)
+
+def _pascal(rng, parts=2):
+    return "".join(word.title() for word in rng.sample(WORDS, parts))
+
+def _sentence(rng, words=6):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def _python(rng, functions):
+    parts = [f'"""{_sentence(rng).capitalize()}."""\nimport os\nimport json\n']
+    class_name = _pascal(rng)
+    parts.append(f"class {class_name}:\n    \"\"\"{_sentence(rng).capitalize()}.\"\"\"\n")
+    parts.append("    def __init__(self, source, limit=10):\n        self.source = source\n        self.limit = limit\n")
+    for _ in range(functions):
+        name, arg, field = _snake(rng), rng.choice(WORDS), rng.choice(WORDS)
+        parts.append(
+            f"    def {name}(self, {arg}):\n"
+            f"        # {_sentence(rng)}\n"
+            f"        results = []\n"
+            f"        for item in {arg}:\n"
+            f"            if item.get(\"{field}\") and len(results) < self.limit:\n"
+            f"                results.append(json.dumps(item))\n"
+            f"        return results\n"
+        )
+    parts.append(
+        f"def {_snake(rng)}(path):\n    with open(os.path.join(path, \"{rng.choice(WORDS)}.json\")) as f:\n"
+        f"        return {class_name}(json.load(f))\n"
+    )
+    return "\n".join(parts)
+
+def _javascript(rng, functions):
+    parts = [f"// {_sentence(rng)}\nconst fs = require('fs');\n"]
+    class_name = _pascal(rng)
+    parts.append(f"class {class_name} {{\n  constructor(source) {{\n    this.source = source;\n  }}\n")
+    for _ in range(functions):
+        name, arg, field = _camel(rng), rng.choice(WORDS), rng.choice(WORDS)
+        parts.append(
+            f"  {name}({arg}) {{\n"
+            f"    // {_sentence(rng)}\n"
+            f"    return {arg}.filter((item) => item.{field} !== undefined).map((item) => item.{field});\n"
+            f"  }}\n"
+        )
+    parts.append(f"}}\n\nmodule.exports = {{ {class_name} }};\n")
+    return "\n".join(parts)
+
+def _go(rng, functions):
+    struct = _pascal(rng)
+    parts = [f"// Package {rng.choice(WORDS)} {_sentence(rng)}\npackage {rng.choice(WORDS)}\n\nimport \"strings\"\n"]
+    parts.append(f"type {struct} struct {{\n\tName  string\n\tLimit int\n}}\n")
+    for _ in range(functions):
+        name, arg = _pascal(rng), rng.choice(WORDS)
+        parts.append(
+            f"// {name} {_sentence(rng)}\n"
+            f"func (s *{struct}) {name}({arg} []string) []string {{\n"
+            f"\tvar out []string\n"
+            f"\tfor _, v := range {arg} {{\n"
+            f"\t\tif strings.Contains(v, s.Name) && len(out) < s.Limit {{\n"
+            f"\t\t\tout = append(out, v)\n"
+            f"\t\t}}\n"
+            f"\t}}\n"
+            f"\treturn out\n"
+            f"}}\n"
+        )
+    return "\n".join(parts)
+
+def _rust(rng, functions):
+    struct = _pascal(rng)
+    parts = [f"//! {_sentence(rng)}\nuse std::collections::HashMap;\n"]
+    parts.append(f"pub struct {struct} {{\n    values: HashMap<String, u64>,\n}}\n\nimpl {struct} {{")
+    for _ in range(functions):
+        name, key = _snake(rng), rng.choice(WORDS)
+        parts.append(
+            f"    /// {_sentence(rng)}\n"
+            f"    pub fn {name}(&mut self, amount: u64) -> u64 {{\n"
+            f"        let entry = self.values.entry(\"{key}\".to_string()).or_insert(0);\n"
+            f"        *entry += amount;\n"
+            f"        *entry\n"
+            f"    }}\n"
+        )
+    parts.append("}\n")
+    return "\n".join(parts)
+
+def _java(rng, functions):
+    class_name = _pascal(rng)
+    parts = [f"import java.util.List;\nimport java.util.ArrayList;\n\n/** {_sentence(rng)} */\npublic class {class_name} {{"]
+    for _ in range(functions):
+        name, arg = _camel(rng), rng.choice(WORDS)
+        parts.append(
+            f"    /** {_sentence(rng)} */\n"
+            f"    public List<String> {name}(List<String> {arg}) {{\n"
+            f"        List<String> out = new ArrayList<>();\n"
+            f"        for (String item : {arg}) {{\n"
+            f"            if (!item.isEmpty()) {{\n"
+            f"                out.add(item.trim());\n"
+            f"            }}\n"
+            f"        }}\n"
+            f"        return out;\n"
+            f"    }}\n"
+        )
+    parts.append("}\n")
+    return "\n".join(parts)
+
+def _markdown(rng, sections):
+    parts = [f"# {_sentence(rng, 3).title()}\n"]
+    for _ in range(sections):
+        parts.append(f"## {_sentence(rng, 2).title()}\n\n{_sentence(rng, 40).capitalize()}.\n")
+    return "\n".join(parts)
+
+_GENERATORS = {"py": _python, "js": _javascript, "go": _go, "rs": _rust, "java": _java, "md": _markdown}
+
+def generate_repo(root, files, languages=None, functions=(3, 12), files_per_dir=20, seed=0, start=0):
+    """Write `files` synthetic source files under root.
+
+    Languages are picked by weight from `languages` ({extension: weight}),
+    each file gets a random number of functions in the `functions` range,
+    and files are spread over nested directories of about files_per_dir
+    each. Output is deterministic for a given seed; `start` numbers the
+    files so a repo can be grown in steps. Returns (files, bytes) written.
+    """
+    languages = languages or DEFAULT_LANGUAGES
+    extensions, weights = list(languages), list(languages.values())
+    total_bytes = 0
+    for number in range(start, start + files):
+        rng = random.Random(f"{seed}-{number}")
+        extension = rng.choices(extensions, weights)[0]
+        content = _GENERATORS[extension](rng, rng.randint(*functions))
+
+        # pkg_3/pkg_1/file_0071.py: a few levels, a bounded fan-out
+        directory = number // files_per_dir
+        parts = []
+        while directory:
+            parts.append(f"pkg_{directory % 8}")
+            directory //= 8
+        path = os.path.join(root, *parts, f"{rng.choice(WORDS)}_{number:05d}.{extension}")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+        total_bytes += len(content.encode("utf-8"))
+    return files, total_bytes
+
+_COMMAND_TEMPLATES = [
+    ("git commit -m 'Fix {a} {b}'", "[main 1a2b3c4] Fix {a} {b}\n 2 files changed, 14 insertions(+), 3 deletions(-)"),
+    ("pytest tests/test_{a}.py -k {b}", "collected 12 items\n\ntests/test_{a}.py ....F...\nFAILED tests/test_{a}.py::test_{b} - AssertionError"),
+    ("python -m {a}.{b} --verbose", "Loading {a}\nProcessing {b}: 120 records\nDone in 0.4s"),
+    ("grep -rn {a}_{b} src/", "src/{a}/{b}.py:12:def {a}_{b}(value):\nsrc/{a}/__init__.py:3:from .{b} import {a}_{b}"),
+    ("make {a}", "cc -O2 -c {a}.c -o {a}.o\ncc -o {a} {a}.o\n"),
+    ("docker build -t {a}-{b} .", "Step 1/6 : FROM python:3.11-slim\nStep 6/6 : CMD [\"python\", \"{a}.py\"]\nSuccessfully tagged {a}-{b}:latest"),
+    ("npm run {a} -- --{b}", "> {a}\n> node scripts/{a}.js --{b}\n\nError: Cannot find module '{b}'"),
+    ("ls {a}/{b}", "{a}.py\n{b}.py\n__init__.py")
+]
+
+def generate_commands(count, working_dirs, seed=0, start=0):
+    """Yield (command, output, working_dir, exit_code) tuples for a synthetic shell history."""
+    for number in range(start, start + count):
+        rng = random.Random(f"{seed}-command-{number}")
+        command, output = rng.choice(_COMMAND_TEMPLATES)
+        words = {"a": rng.choice(WORDS), "b": rng.choice(WORDS)}
+        exit_code = 1 if "Error" in output or "FAILED" in output else 0
+        yield command.format(**words), output.format(**words), rng.choice(working_dirs), exit_code
+
+def generate_queries(count, seed=0):
+    """Search queries mixing single words, word pairs and identifiers."""
+    rng = random.Random(f"{seed}-queries")
+    queries = []
+    for _ in range(count):
+        shape = rng.random()
+        if shape < 0.3:
+            queries.append(rng.choice(WORDS))
+        elif shape < 0.7:
+            queries.append(" ".join(rng.sample(WORDS, 2)))
+        else:
+            queries.append(_snake(rng))
+    return queries
\ No newline at end of file
@@ -2,7 +2,30 @@ import os
 import subprocess
 import requests
 import json
-from .config import SERVER_URL, LLM_PREFIX
+from . import transport
+from .config import SERVER_URL, LLM_PREFIX, LLM_CACHE_BYPASS_FLAG, HTTP_CONNECT_TIMEOUT
+
+def _stat(summary, field, scale=1, unit="", digits=1):
+    """Format a timing summary as "median (p90)", or "-" if nothing reported it."""
+    value = summary.get(field)
+    if not value:
+        return "-"
+    return f"{value['p50'] * scale:.{digits}f}{unit} ({value['p90'] * scale:.{digits}f}{unit})"
+
+def _mean(summary, field):
+    value = summary.get(field)
+    return f"{value['mean']:.0f}" if value else "-"
+
+def _format_run(run):
+    """Format an indexing run as "path: state, done/total files (percent), ETA"."""
+    line = f"  {run.get('project')}: {run.get('state')}"
+    if run.get("state") == "indexing":
+        line += f", {run.get('files_done')}/{run.get('files_total')} files ({run.get('progress', 0) * 100:.0f}%)"
+        eta = run.get("eta_seconds")
+        if eta is not None:
+            minutes, seconds = divmod(int(eta), 60)
+            line += f", about {minutes}m {seconds:02d}s left"
+    return line
 
 class CommandProcessor:
     def __init__(self, llm_interface=None):
@@ -22,7 +45,10 @@ class CommandProcessor:
         
         # Handle special commands
         if user_input.startswith("@index"):
-            path = user_input[7:].strip() or os.getcwd()
+            argument = user_input[7:].strip()
+            if argument in ("pause", "resume", "cancel"):
+                return "index_control", argument
+            path = argument or os.getcwd()
             return "index_project", path
         
         if user_input.startswith("@help"):
@@ -31,6 +57,14 @@ class CommandProcessor:
         if user_input.startswith("@status"):
             return "status", None
         
+        if user_input.startswith("@perf"):
+            model = user_input[5:].strip() or None
+            return "perf", model
+        
+        if user_input.startswith("@watch"):
+            enabled = user_input[6:].strip().lower() not in ("off", "stop")
+            return "watch", enabled
+        
         if user_input.startswith("@history"):
             limit = 10
             try:
@@ -53,7 +87,7 @@ class CommandProcessor:
         """Execute a shell command and return the output."""
         try:
             # Log the command via the server
-            response = requests.post(
+            response = transport.post(
                 f"{self.server_url}/api/command/execute",
                 json={
                     "command": command,
@@ -89,6 +123,48 @@ class CommandProcessor:
         except Exception as e:
             return "", f"Error executing command: {e}", 1
     
+    def stream_shell_command(self, command, on_output):
+        """Execute a shell command, passing output to on_output(stream, text) as it arrives.
+        
+        Returns the exit code. Falls back to running the command locally,
+        attached to this terminal, if the server can't be reached.
+        """
+        try:
+            response = transport.post(
+                f"{self.server_url}/api/command/execute/stream",
+                json={
+                    "command": command,
+                    "working_dir": self.current_dir
+                },
+                stream=True,
+                # Commands can stay quiet for a long time; wait as long as they run
+                timeout=(HTTP_CONNECT_TIMEOUT, None)
+            )
+        except requests.exceptions.ConnectionError:
+            response = None
+        
+        if response is None or response.status_code != 200:
+            # Fallback to local execution if the server is down or failed
+            return subprocess.run(command, shell=True, cwd=self.current_dir).returncode
+        
+        exit_code = 1
+        try:
+            # chunk_size=None hands over each chunk as soon as it arrives
+            for line in response.iter_lines(chunk_size=None):
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get("type") == "output":
+                    on_output(event.get("stream"), event.get("data", ""))
+                elif event.get("type") == "exit":
+                    exit_code = event.get("exit_code", 1)
+        except Exception as e:
+            on_output("stderr", f"Error streaming command output: {e}\n")
+        finally:
+            response.close()
+        
+        return exit_code
+    
     def change_directory(self, directory):
         """Change the current working directory."""
         try:
@@ -110,7 +186,7 @@ class CommandProcessor:
             
             # Log the command
             try:
-                requests.post(
+                transport.post(
                     f"{self.server_url}/api/command/log",
                     json={
                         "command": f"cd {directory}",
@@ -133,9 +209,14 @@ class CommandProcessor:
         if not self.llm_interface:
             return False, "LLM interface not initialized"
         
+        # "@llm --no-cache <query>" always asks the model
+        use_cache = not query.startswith(LLM_CACHE_BYPASS_FLAG)
+        if not use_cache:
+            query = query[len(LLM_CACHE_BYPASS_FLAG):].strip()
+        
         try:
             # Get context from the server
-            response = requests.post(
+            response = transport.post(
                 f"{self.server_url}/api/context/generate",
                 json={
                     "query": query,
@@ -147,30 +228,80 @@ class CommandProcessor:
                 context = response.json().get("context", {})
                 
                 # Generate response from LLM
-                llm_response = self.llm_interface.generate_response(query, context, stream=True)
+                llm_response = self.llm_interface.generate_response(query, context, stream=True, use_cache=use_cache)
+                self.report_llm_timing()
                 
                 return True, llm_response
             else:
                 # Fallback to querying without context
-                llm_response = self.llm_interface.generate_response(query, None, stream=True)
+                llm_response = self.llm_interface.generate_response(query, None, stream=True, use_cache=use_cache)
+                self.report_llm_timing()
                 
                 return True, llm_response
         
         except requests.exceptions.ConnectionError:
             # Fallback to querying without context if server is down
-            llm_response = self.llm_interface.generate_response(query, None, stream=True)
+            llm_response = self.llm_interface.generate_response(query, None, stream=True, use_cache=use_cache)
             
             return True, llm_response
         
         except Exception as e:
             return False, f"Error handling LLM query: {e}"
     
+    def report_llm_timing(self):
+        """Send the timing of the last LLM request to the server, if it is up."""
+        timing = self.llm_interface.last_timing
+        if timing is None:
+            return False
+        
+        try:
+            response = transport.post(f"{self.server_url}/api/llm/requests", json=timing)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            # Timings are nice to have; never get in the way of the answer
+            return False
+    
+    def get_llm_performance(self, model=None):
+        """Summarize recent LLM response times per model."""
+        try:
+            response = transport.get(
+                f"{self.server_url}/api/llm/stats",
+                params={"model": model} if model else None
+            )
+            
+            if response.status_code == 200:
+                models = response.json().get("models", [])
+                
+                if not models:
+                    return True, "No LLM requests recorded yet"
+                
+                lines = ["LLM performance (median, 90th percentile in brackets):"]
+                for summary in models:
+                    lines.append(
+                        f"{summary['model']} - {summary['requests']} requests\n"
+                        f"  first token: {_stat(summary, 'first_token_seconds', 1000, ' ms', 0)}, "
+                        f"total: {_stat(summary, 'total_seconds', unit=' s')}, "
+                        f"speed: {_stat(summary, 'tokens_per_second', unit=' tokens/s')}\n"
+                        f"  average tokens - prompt: {_mean(summary, 'prompt_tokens')}, "
+                        f"context: {_mean(summary, 'context_tokens')}, answer: {_mean(summary, 'completion_tokens')}"
+                    )
+                
+                return True, "\n".join(lines)
+            else:
+                return False, f"Failed to get LLM performance: {response.text}"
+        
+        except requests.exceptions.ConnectionError:
+            return False, "Server is not running. Start the server first."
+        
+        except Exception as e:
+            return False, f"Error getting LLM performance: {e}"
+    
     def index_current_project(self, path=None):
         """Index the current project or a specified path."""
         project_path = path or self.current_dir
         
         try:
-            response = requests.post(
+            response = transport.post(
                 f"{self.server_url}/api/index/project",
                 json={"project_path": project_path}
             )
@@ -186,16 +317,76 @@ class CommandProcessor:
         except Exception as e:
             return False, f"Error indexing project: {e}"
     
+    def control_indexing(self, action):
+        """Pause, resume or cancel (every project's) indexing."""
+        try:
+            response = transport.post(f"{self.server_url}/api/index/{action}", json={})
+            
+            message = response.json().get("message", response.text)
+            if response.status_code == 200:
+                return True, message
+            else:
+                return False, f"Failed to {action} indexing: {message}"
+        
+        except requests.exceptions.ConnectionError:
+            return False, "Server is not running. Start the server first."
+        
+        except Exception as e:
+            return False, f"Error trying to {action} indexing: {e}"
+    
+    def set_watch_mode(self, enabled=True):
+        """Turn live re-indexing of the current project on or off."""
+        try:
+            response = transport.post(
+                f"{self.server_url}/api/index/watch",
+                json={"enabled": enabled, "project_path": self.current_dir}
+            )
+            
+            if response.status_code == 200:
+                watch = response.json().get("watch")
+                if watch:
+                    return True, f"Watching {watch.get('root')} for changes ({watch.get('mode')})"
+                return True, "Stopped watching for changes"
+            else:
+                return False, f"Failed to change watch mode: {response.text}"
+        
+        except requests.exceptions.ConnectionError:
+            return False, "Server is not running. Start the server first."
+        
+        except Exception as e:
+            return False, f"Error changing watch mode: {e}"
+    
     def get_indexing_status(self):
         """Get the current indexing status."""
         try:
-            response = requests.get(f"{self.server_url}/api/index/status")
+            response = transport.get(f"{self.server_url}/api/index/status")
             
             if response.status_code == 200:
                 status = response.json()
+                last_run = status.get("last_run") or {}
+                counts = (
+                    f"Added: {last_run.get('added', 0)}, Changed: {last_run.get('changed', 0)}, "
+                    f"Removed: {last_run.get('removed', 0)}, Skipped: {last_run.get('skipped', 0)}, "
+                    f"Ignored: {last_run.get('ignored', 0)}"
+                )
+                writer = status.get("writer") or {}
+                if writer.get("batches_committed"):
+                    counts += (
+                        f"\nWrite throughput: {writer.get('files_per_second')} files/s "
+                        f"in {writer.get('batches_committed')} batches"
+                    )
                 
                 if status.get("is_indexing"):
-                    return True, f"Indexing in progress: {status.get('project')}\nIndexed files: {status.get('indexed_files')}, Queue size: {status.get('queue_size')}"
+                    workers = status.get("workers") or []
+                    busy = sum(1 for worker in workers if worker.get("state") != "idle")
+                    runs = "".join(
+                        f"\n{_format_run(run)}" for run in status.get("runs") or []
+                        if run.get("state") in ("scanning", "indexing")
+                    )
+                    paused = " (paused)" if status.get("paused") else ""
+                    return True, f"Indexing in progress{paused}: {status.get('project')}{runs}\nIndexed files: {status.get('indexed_files')}, Queue size: {status.get('queue_size')}/{status.get('queue_capacity')}, Workers busy: {busy}/{len(workers)}\n{counts}"
+                elif status.get("project"):
+                    return True, f"No indexing in progress\nLast run: {status.get('project')}\n{counts}"
                 else:
                     return True, "No indexing in progress"
             else:
@@ -210,9 +401,9 @@ class CommandProcessor:
     def get_command_history(self, limit=10):
         """Get recent command history."""
         try:
-            response = requests.post(
+            response = transport.post(
                 f"{self.server_url}/api/search/commands",
-                json={"query": "", "limit": limit}
+                json={"query": "", "limit": limit, "include_output": False}
             )
             
             if response.status_code == 200:
@@ -243,9 +434,14 @@ MCP Terminal Assistant - Help
 
 Commands:
   @llm <query>          - Ask the AI assistant (e.g., @llm how to check disk space)
+  @llm --no-cache <q>   - Ask again instead of replaying a cached answer (MCP_LLM_CACHE=1)
   @index [path]         - Index the current directory or specified path
+  @index pause|resume   - Pause or resume indexing
+  @index cancel         - Cancel indexing; files indexed so far are kept
   @status               - Check indexing status
+  @watch [on|off]       - Keep the index of the current directory up to date as files change
   @history [limit]      - Show recent command history (default: 10)
+  @perf [model]         - Show LLM response times and speed per model
   @help                 - Show this help message
 
 The assistant can:
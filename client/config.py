@@ -4,6 +4,20 @@ from pathlib import Path
 # Server configuration
 SERVER_URL = "http://127.0.0.1:5000"
 
+# Talk to the server over this Unix domain socket instead of TCP (the server
+# must be started with the same MCP_SERVER_SOCKET)
+SERVER_SOCKET = os.environ.get("MCP_SERVER_SOCKET")
+
+# HTTP transport: connections are pooled and kept alive; requests may take
+# CONNECT_TIMEOUT seconds to connect and READ_TIMEOUT seconds to answer, and
+# only failed connection attempts are retried, with exponential backoff
+HTTP_POOL_SIZE = 4
+HTTP_CONNECT_TIMEOUT = 2.0
+SERVER_READ_TIMEOUT = 60.0
+OLLAMA_READ_TIMEOUT = 300.0
+HTTP_CONNECT_RETRIES = 2
+HTTP_RETRY_BACKOFF = 0.05
+
 # Ollama configuration
 OLLAMA_URL = "http://localhost:11434"
 DEFAULT_MODEL = "deepseek-coder:33b-instruct-q5_K_M"
@@ -12,6 +26,9 @@ DEFAULT_MODEL = "deepseek-coder:33b-instruct-q5_K_M"
 HISTORY_FILE = os.path.join(Path.home(), ".mcp_terminal", "client_history.txt")
 CONFIG_DIR = os.path.dirname(HISTORY_FILE)
 
+# The figlet banner is rendered once and cached here (pyfiglet is slow to load)
+BANNER_FILE = os.path.join(CONFIG_DIR, "banner.txt")
+
 # Ensure the directory exists
 if not os.path.exists(CONFIG_DIR):
     os.makedirs(CONFIG_DIR)
@@ -19,6 +36,16 @@ if not os.path.exists(CONFIG_DIR):
 # Command prefix for LLM queries
 LLM_PREFIX = "@llm"
 
+# Opt-in cache of LLM answers (MCP_LLM_CACHE=1), keyed on the model, system
+# prompt, formatted context and query. Entries expire after LLM_CACHE_TTL
+# seconds and the least recently used go first past LLM_CACHE_MAX_BYTES;
+# "@llm --no-cache <query>" always asks the model
+LLM_CACHE_ENABLED = os.environ.get("MCP_LLM_CACHE", "").lower() in ("1", "true", "yes", "on")
+LLM_CACHE_FILE = os.path.join(CONFIG_DIR, "llm_cache.db")
+LLM_CACHE_TTL = 7 * 24 * 60 * 60
+LLM_CACHE_MAX_BYTES = 50 * 1024 * 1024
+LLM_CACHE_BYPASS_FLAG = "--no-cache"
+
 # System prompt for LLM
 SYSTEM_PROMPT = """
 You are an AI terminal assistant for developers. You have access to:
@@ -2,18 +2,31 @@ import requests
 import json
 import os
 import time
-from .config import OLLAMA_URL, DEFAULT_MODEL, SYSTEM_PROMPT
+from . import transport
+from .response_cache import ResponseCache
+from .config import (
+    OLLAMA_URL, DEFAULT_MODEL, SYSTEM_PROMPT, HTTP_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT,
+    LLM_CACHE_ENABLED, LLM_CACHE_BYPASS_FLAG
+)
+
+# Generation can take minutes while a model loads
+OLLAMA_TIMEOUT = (HTTP_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT)
 
 class LLMInterface:
-    def __init__(self, model=DEFAULT_MODEL):
+    def __init__(self, model=DEFAULT_MODEL, check_availability=True):
         self.model = model
         self.base_url = OLLAMA_URL
-        self.check_ollama_availability()
+        self.available = None   # unknown until checked
+        self.last_timing = None  # timing of the latest successful request
+        self.cache = ResponseCache() if LLM_CACHE_ENABLED else None
+        if check_availability:
+            self.check_ollama_availability()
     
     def check_ollama_availability(self):
-        """Check if Ollama server is running."""
+        """Check if Ollama server is running, pulling the model if it is missing."""
         try:
-            response = requests.get(f"{self.base_url}/api/tags")
+            response = transport.get(f"{self.base_url}/api/tags")
+            self.available = response.status_code == 200
             if response.status_code == 200:
                 available_models = response.json().get("models", [])
                 model_names = [model.get("name") for model in available_models]
@@ -25,15 +38,24 @@ class LLMInterface:
             
             return True
         except requests.exceptions.ConnectionError:
+            self.available = False
             print("Error: Cannot connect to Ollama server. Please ensure Ollama is running.")
             return False
+        except requests.exceptions.RequestException as e:
+            # Timeouts, exhausted retries and garbled replies; this may run on
+            # a background thread, where an escaping exception would go unreported
+            self.available = False
+            print(f"Error: Ollama server check failed: {e}")
+            return False
     
     def _pull_model(self):
         """Pull the model if not available."""
         try:
-            response = requests.post(
+            # Downloads take as long as they take
+            response = transport.post(
                 f"{self.base_url}/api/pull",
-                json={"name": self.model}
+                json={"name": self.model},
+                timeout=(HTTP_CONNECT_TIMEOUT, None)
             )
             
             if response.status_code == 200:
@@ -46,14 +68,20 @@ class LLMInterface:
             print(f"Error pulling model: {e}")
             return False
     
-    def generate_response(self, query, context=None, stream=False):
-        """Generate a response from the LLM."""
+    def generate_response(self, query, context=None, stream=False, use_cache=True):
+        """Generate a response from the LLM.
+        
+        With the response cache enabled, an identical earlier request is
+        answered from the cache (printed as if streamed) unless use_cache
+        is False; fresh answers are stored either way.
+        """
         # Build messages
         messages = [
             {"role": "system", "content": SYSTEM_PROMPT}
         ]
         
         # Add context if provided
+        context_str = ""
         if context:
             context_str = self._format_context(context)
             messages.append({"role": "system", "content": context_str})
@@ -61,14 +89,74 @@ class LLMInterface:
         # Add user query
         messages.append({"role": "user", "content": query})
         
+        self.last_timing = None
+        cache_key = None
+        if self.cache is not None:
+            cache_key = ResponseCache.fingerprint(self.model, SYSTEM_PROMPT, context_str, query)
+            cached = self._cached_response(cache_key) if use_cache else None
+            if cached is not None:
+                if stream:
+                    self._print_stream([cached])
+                    print(f"(cached answer; use {LLM_CACHE_BYPASS_FLAG} to ask again)")
+                return cached
+        
         # Make the API call
         try:
             if stream:
-                return self._stream_response(messages)
+                response = self._stream_response(messages)
             else:
-                return self._get_response(messages)
+                response = self._get_response(messages)
         except Exception as e:
             return f"Error: Failed to get a response from the LLM: {e}"
+        
+        # Only completed requests have a timing; errors aren't cached
+        if self.last_timing is not None:
+            self.last_timing.update(
+                prompt_chars=len(query),
+                context_chars=len(context_str),
+                context_tokens=(context or {}).get("tokens")
+            )
+            if cache_key is not None:
+                self._cache_response(cache_key, response)
+        return response
+    
+    def _cached_response(self, key):
+        try:
+            return self.cache.get(key)
+        except Exception as e:
+            print(f"Warning: LLM response cache unavailable: {e}")
+            return None
+    
+    def _cache_response(self, key, response):
+        try:
+            self.cache.put(key, self.model, response)
+        except Exception as e:
+            print(f"Warning: failed to cache LLM response: {e}")
+    
+    def _record_timing(self, started, connected, first_token, result, stream):
+        """Keep the timing of a finished request, with Ollama's counters from `result`.
+        
+        Ollama reports durations in nanoseconds; tokens/sec is based on its
+        eval_duration when given, so network and printing time don't count.
+        """
+        def seconds(field):
+            value = result.get(field)
+            return value / 1e9 if value is not None else None
+        
+        completion_tokens = result.get("eval_count")
+        eval_seconds = seconds("eval_duration")
+        self.last_timing = {
+            "model": self.model,
+            "stream": stream,
+            "connect_seconds": connected - started,
+            "first_token_seconds": first_token - started if first_token is not None else None,
+            "total_seconds": time.perf_counter() - started,
+            "load_seconds": seconds("load_duration"),
+            "prompt_eval_seconds": seconds("prompt_eval_duration"),
+            "prompt_tokens": result.get("prompt_eval_count"),
+            "completion_tokens": completion_tokens,
+            "tokens_per_second": completion_tokens / eval_seconds if completion_tokens and eval_seconds else None
+        }
     
     def _format_context(self, context):
         """Format the context for the LLM."""
@@ -86,11 +174,17 @@ class LLMInterface:
                 content = snippet.get("content", "")
                 language = snippet.get("language", "")
                 
-                # Truncate long snippets
-                if len(content) > 500:
-                    content = content[:500] + "... [truncated]"
+                # The server already fit snippets into its token budget
+                if snippet.get("truncated"):
+                    content += "\n... [truncated]"
+                
+                location = file_path
+                if snippet.get("start_line"):
+                    location += f":{snippet['start_line']}-{snippet.get('end_line')}"
+                if snippet.get("name"):
+                    location += f" ({snippet.get('kind')} {snippet['name']})"
                 
-                context_parts.append(f"Snippet {i} from {file_path} ({language}):")
+                context_parts.append(f"Snippet {i} from {location} ({language}):")
                 context_parts.append(f"```{language}\n{content}\n```")
         
         # Add command history
@@ -100,9 +194,9 @@ class LLMInterface:
                 command = cmd.get("command", "")
                 output = cmd.get("output", "")
                 
-                # Truncate long outputs
-                if len(output) > 200:
-                    output = output[:200] + "... [truncated]"
+                # Outputs trimmed to the budget keep their last lines
+                if cmd.get("truncated"):
+                    output = "[truncated] ..." + output
                 
                 context_parts.append(f"Command {i}: {command}")
                 if output:
@@ -112,48 +206,73 @@ class LLMInterface:
     
     def _get_response(self, messages):
         """Get a response from the LLM."""
-        response = requests.post(
+        started = time.perf_counter()
+        response = transport.post(
             f"{self.base_url}/api/chat",
             json={
                 "model": self.model,
                 "messages": messages,
                 "stream": False
-            }
+            },
+            timeout=OLLAMA_TIMEOUT
         )
         
         if response.status_code == 200:
             result = response.json()
+            self._record_timing(started, time.perf_counter(), None, result, stream=False)
             return result.get("message", {}).get("content", "No response")
         else:
             return f"Error: {response.status_code} - {response.text}"
     
+    def _print_stream(self, contents):
+        """Print response pieces as they arrive and return the whole response."""
+        full_response = ""
+        for content in contents:
+            print(content, end="", flush=True)
+            full_response += content
+        
+        print()  # New line at end
+        return full_response
+    
     def _stream_response(self, messages):
         """Stream a response from the LLM."""
-        response = requests.post(
+        started = time.perf_counter()
+        response = transport.post(
             f"{self.base_url}/api/chat",
             json={
                 "model": self.model,
                 "messages": messages,
                 "stream": True
             },
-            stream=True
+            stream=True,
+            timeout=OLLAMA_TIMEOUT
         )
         
-        full_response = ""
+        # Headers are back; the body streams in as tokens are generated
+        connected = time.perf_counter()
+        first_token = None
+        final_chunk = {}
         
         if response.status_code == 200:
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        chunk = json.loads(line)
-                        content = chunk.get("message", {}).get("content", "")
-                        if content:
-                            print(content, end="", flush=True)
-                            full_response += content
-                    except json.JSONDecodeError:
-                        pass
+            def contents():
+                nonlocal first_token, final_chunk
+                for line in response.iter_lines():
+                    if line:
+                        try:
+                            chunk = json.loads(line)
+                            content = chunk.get("message", {}).get("content", "")
+                            if content:
+                                if first_token is None:
+                                    first_token = time.perf_counter()
+                                yield content
+                            # The last chunk carries Ollama's token counts and durations
+                            if chunk.get("done"):
+                                final_chunk = chunk
+                        except json.JSONDecodeError:
+                            pass
             
-            print()  # New line at end
+            full_response = self._print_stream(contents())
+            self._record_timing(started, connected, first_token, final_chunk, stream=True)
             return full_response
         else:
             error_msg = f"Error: {response.status_code} - {response.text}"
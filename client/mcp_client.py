@@ -2,21 +2,25 @@
 import os
 import sys
 import time
-import requests
+
+# Startup timings count from here; interpreter startup comes before it
+STARTED = time.perf_counter()
+
+import argparse
+import threading
 from prompt_toolkit import PromptSession
 from prompt_toolkit.formatted_text import HTML
 from prompt_toolkit.styles import Style
 from prompt_toolkit.history import FileHistory
+from prompt_toolkit.patch_stdout import patch_stdout
 from pathlib import Path
-import pyfiglet
 from rich.console import Console
-from rich.markdown import Markdown
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from client.config import SERVER_URL, LLM_PREFIX, HISTORY_FILE, CONFIG_DIR, PROMPT_MARKER
-from client.command_processor import CommandProcessor
-from client.llm_interface import LLMInterface
+# requests, pyfiglet and the command processor are imported when first
+# needed, off the path to the first prompt
+from client.config import SERVER_URL, LLM_PREFIX, HISTORY_FILE, CONFIG_DIR, PROMPT_MARKER, BANNER_FILE
 
 # Create config directory if it doesn't exist
 if not os.path.exists(CONFIG_DIR):
@@ -31,21 +35,101 @@ style = Style.from_dict({
     "path": "#0000aa",
 })
 
+# Set by --timings
+show_timings = False
+
+def report_timing(label):
+    """With --timings, print how far into startup `label` was reached."""
+    if show_timings:
+        console.print(f"[dim]startup: {label} after {(time.perf_counter() - STARTED) * 1000:.0f} ms[/dim]")
+
 def check_server_connection():
     """Check if the MCP server is running."""
     try:
-        response = requests.get(f"{SERVER_URL}/api/health", timeout=2)
+        from client import transport
+        response = transport.get(f"{SERVER_URL}/api/health", timeout=2)
         return response.status_code == 200
     except:
         return False
 
+def render_banner():
+    """Get the figlet banner, rendered once and then read back from BANNER_FILE."""
+    try:
+        with open(BANNER_FILE) as f:
+            return f.read()
+    except OSError:
+        pass
+    
+    import pyfiglet
+    banner = pyfiglet.figlet_format("MCP Terminal", font="slant")
+    try:
+        with open(BANNER_FILE, "w") as f:
+            f.write(banner)
+    except OSError:
+        pass
+    return banner
+
+class BackgroundStartup:
+    """Loads the command processor and checks the server and Ollama off the main thread.
+    
+    The prompt is drawn meanwhile; the first command waits for the processor
+    if it isn't loaded yet, and warnings are printed above the prompt.
+    """
+    
+    def __init__(self):
+        self.ready = threading.Event()
+        self.processor = None
+        self.error = None
+        self.server_running = False
+    
+    def start(self):
+        threading.Thread(target=self._run, name="client-startup", daemon=True).start()
+    
+    def get_processor(self):
+        """Get the command processor, waiting for it to load."""
+        self.ready.wait()
+        return self.processor
+    
+    def current_dir(self):
+        return self.processor.current_dir if self.processor else os.getcwd()
+    
+    def _run(self):
+        try:
+            from client.command_processor import CommandProcessor
+            from client.llm_interface import LLMInterface
+            llm = LLMInterface(check_availability=False)
+            self.processor = CommandProcessor(llm)
+        except Exception as e:
+            self.error = e
+            return
+        finally:
+            self.ready.set()
+        report_timing("command processor loaded")
+        
+        self.server_running = check_server_connection()
+        report_timing("server checked")
+        if not self.server_running:
+            console.print("[bold yellow]Warning: MCP server is not running.[/bold yellow]")
+            console.print("[yellow]Some features will be limited. Start the server with: python server/serve.py[/yellow]")
+        
+        llm.check_ollama_availability()
+        report_timing("Ollama checked")
+
 def print_welcome_banner():
     """Print a welcome banner."""
-    ascii_banner = pyfiglet.figlet_format("MCP Terminal", font="slant")
+    ascii_banner = render_banner()
     console.print(f"[bold green]{ascii_banner}[/bold green]")
     console.print("[bold]AI-Powered Terminal Assistant[/bold]")
     console.print("Type [bold cyan]@help[/bold cyan] for commands\n")
 
+def print_command_output(stream, text):
+    """Print command output as it arrives, stderr in red."""
+    if stream == "stderr":
+        console.print(text, style="red", end="", markup=False, highlight=False, soft_wrap=True)
+    else:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
 def get_prompt(current_dir):
     """Get the prompt with current directory."""
     username = os.environ.get("USER", "user")
@@ -58,36 +142,46 @@ def get_prompt(current_dir):
     
     return HTML(f"<prompt>{username}@{hostname}</prompt>:<path>{current_dir}</path>{PROMPT_MARKER}")
 
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="MCP Terminal Assistant client")
+    parser.add_argument("--timings", action="store_true", help="Print how long each startup step took")
+    return parser.parse_args()
+
 def main():
     """Main function to run the MCP client."""
-    print_welcome_banner()
-    
-    # Check server connection
-    server_running = check_server_connection()
-    if not server_running:
-        console.print("[bold yellow]Warning: MCP server is not running.[/bold yellow]")
-        console.print("[yellow]Some features will be limited. Start the server with: python server/mcp_server.py[/yellow]\n")
+    global show_timings
+    show_timings = parse_args().timings
+    report_timing("imports done")
     
-    # Initialize LLM interface
-    llm = LLMInterface()
+    print_welcome_banner()
+    report_timing("banner shown")
     
-    # Initialize command processor
-    processor = CommandProcessor(llm)
+    # Load the processor and check the server and Ollama in the background
+    startup = BackgroundStartup()
+    startup.start()
     
     # Initialize prompt session with history
     session = PromptSession(
         history=FileHistory(HISTORY_FILE),
         style=style
     )
+    report_timing("prompt ready")
     
     # Main loop
     while True:
         try:
-            # Get user input
-            user_input = session.prompt(
-                lambda: get_prompt(processor.current_dir),
-                complete_in_thread=True
-            )
+            # Get user input; background output is printed above the prompt
+            with patch_stdout(raw=True):
+                user_input = session.prompt(
+                    lambda: get_prompt(startup.current_dir()),
+                    complete_in_thread=True
+                )
+            
+            processor = startup.get_processor()
+            if processor is None:
+                console.print(f"[red]Error: failed to load the command processor: {startup.error}[/red]")
+                break
             
             # Process input
             command_type, command_value = processor.process_input(user_input)
@@ -97,13 +191,7 @@ def main():
             
             # Handle different command types
             if command_type == "shell_command":
-                stdout, stderr, exit_code = processor.execute_shell_command(command_value)
-                
-                if stdout:
-                    console.print(stdout, end="")
-                
-                if stderr:
-                    console.print(f"[red]{stderr}[/red]", end="")
+                processor.stream_shell_command(command_value, print_command_output)
             
             elif command_type == "change_directory":
                 success, message = processor.change_directory(command_value)
@@ -112,8 +200,8 @@ def main():
                     console.print(f"[red]{message}[/red]")
             
             elif command_type == "llm_query":
-                if not server_running:
-                    server_running = check_server_connection()
+                if not startup.server_running:
+                    startup.server_running = check_server_connection()
                 
                 success, response = processor.handle_llm_query(command_value)
                 
@@ -128,6 +216,14 @@ def main():
                 else:
                     console.print(f"[red]{message}[/red]")
             
+            elif command_type == "index_control":
+                success, message = processor.control_indexing(command_value)
+                
+                if success:
+                    console.print(f"[green]{message}[/green]")
+                else:
+                    console.print(f"[red]{message}[/red]")
+            
             elif command_type == "status":
                 success, message = processor.get_indexing_status()
                 
@@ -136,6 +232,14 @@ def main():
                 else:
                     console.print(f"[red]{message}[/red]")
             
+            elif command_type == "watch":
+                success, message = processor.set_watch_mode(command_value)
+                
+                if success:
+                    console.print(f"[green]{message}[/green]")
+                else:
+                    console.print(f"[red]{message}[/red]")
+            
             elif command_type == "history":
                 success, message = processor.get_command_history(command_value)
                 
@@ -144,6 +248,14 @@ def main():
                 else:
                     console.print(f"[red]{message}[/red]")
             
+            elif command_type == "perf":
+                success, message = processor.get_llm_performance(command_value)
+                
+                if success:
+                    console.print(f"[blue]{message}[/blue]")
+                else:
+                    console.print(f"[red]{message}[/red]")
+            
             elif command_type == "help":
                 success, message = processor.show_help()
                 console.print(message)
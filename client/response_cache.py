@@ -0,0 +1,90 @@
+import json
+import time
+import sqlite3
+import hashlib
+from .config import LLM_CACHE_FILE, LLM_CACHE_TTL, LLM_CACHE_MAX_BYTES
+
+class ResponseCache:
+    """LLM answers stored in SQLite, keyed by a fingerprint of everything the model saw.
+    
+    Entries older than `ttl` seconds are never returned and are deleted on
+    the next write; past `max_bytes` the least recently used go first.
+    """
+    
+    def __init__(self, path=LLM_CACHE_FILE, ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.initialized = False
+    
+    @staticmethod
+    def fingerprint(model, system_prompt, context, query):
+        """Hash the parts of a request that decide the answer; whitespace in the query doesn't count."""
+        parts = [model, system_prompt, context or "", " ".join(query.split())]
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self.initialized:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_used ON llm_responses (last_used)")
+            self.initialized = True
+        return conn
+    
+    def get(self, key):
+        """Get a cached answer that hasn't expired, or None."""
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT response FROM llm_responses WHERE key = ? AND created >= ?",
+                    (key, time.time() - self.ttl)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE llm_responses SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                    (time.time(), key)
+                )
+            return row[0]
+        finally:
+            conn.close()
+    
+    def put(self, key, model, response):
+        """Store an answer, then drop expired entries and trim the cache to size."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, model, response, size, created, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, response, len(response.encode("utf-8")), now, now)
+                )
+                self._evict(conn, now)
+        finally:
+            conn.close()
+    
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM llm_responses WHERE created < ?", (now - self.ttl,))
+        excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM llm_responses ORDER BY last_used"):
+            stale.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM llm_responses WHERE key = ?", stale)
@@ -0,0 +1,100 @@
+import socket
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.retry import Retry
+from .config import (
+    SERVER_URL, SERVER_SOCKET, HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, SERVER_READ_TIMEOUT,
+    HTTP_CONNECT_RETRIES, HTTP_RETRY_BACKOFF
+)
+
+# Default (connect, read) timeouts for server requests
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, SERVER_READ_TIMEOUT)
+
+class _UnixConnection(HTTPConnection):
+    """HTTP connection over a Unix domain socket; the URL's host is only used in headers."""
+
+    def __init__(self, *args, socket_path=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout if isinstance(self.timeout, (int, float)) else None)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise NewConnectionError(self, f"Failed to connect to {self.socket_path}: {e}") from e
+        return sock
+
+class _UnixConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _UnixConnection
+
+class UnixSocketAdapter(HTTPAdapter):
+    """Transport adapter sending every request it handles to one Unix socket."""
+
+    def __init__(self, socket_path, **kwargs):
+        self.socket_path = socket_path
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": lambda host, port, **context: _UnixConnectionPool(
+                host, port, socket_path=self.socket_path, **context
+            )
+        }
+
+def _retry():
+    # Only connection failures are retried: the request never reached the
+    # server, so resending it is safe even for POSTs
+    return Retry(
+        total=HTTP_CONNECT_RETRIES,
+        connect=HTTP_CONNECT_RETRIES,
+        read=0,
+        status=0,
+        other=0,
+        redirect=False,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        raise_on_status=False
+    )
+
+def create_session(server_url=SERVER_URL, socket_path=SERVER_SOCKET):
+    """Create a session with pooled keep-alive connections and connect retries.
+
+    With socket_path, requests under server_url go over that Unix socket
+    instead of TCP; other URLs (e.g. Ollama) are unaffected.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=_retry())
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if socket_path and hasattr(socket, "AF_UNIX"):
+        unix_adapter = UnixSocketAdapter(socket_path, pool_maxsize=HTTP_POOL_SIZE, max_retries=_retry())
+        session.mount(server_url.rstrip("/") + "/", unix_adapter)
+    return session
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """The process-wide session, so every caller shares its connection pools."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+def request(method, url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """Send a request through the shared session; a timeout is always set."""
+    return get_session().request(method, url, timeout=timeout, **kwargs)
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
\ No newline at end of file
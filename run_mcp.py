@@ -5,33 +5,72 @@ import subprocess
 import time
 import signal
 import argparse
+import urllib.request
 
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from server.config import DB_DIR, SERVER_HOST, SERVER_PORT
+
+SERVER_LOG_FILE = os.path.join(DB_DIR, "server.log")
+
+# How long to wait for the server to answer its health check
+SERVER_START_TIMEOUT = 30
+
 def parse_args():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description="Run MCP Terminal Assistant")
     parser.add_argument("--server-only", action="store_true", help="Run only the server")
     parser.add_argument("--client-only", action="store_true", help="Run only the client")
+    parser.add_argument("--workers", type=int, help="Server worker processes (default: SERVER_WORKERS)")
+    parser.add_argument("--timings", action="store_true", help="Print startup timings")
     return parser.parse_args()
 
-def run_server():
-    """Run the MCP server process."""
+def run_server(workers=None, log_file=None):
+    """Run the MCP server process, writing its output to log_file if given."""
+    command = [sys.executable, os.path.join(os.path.dirname(__file__), "server", "serve.py")]
+    if workers:
+        command += ["--workers", str(workers)]
+    # A pipe nobody reads would fill up with request logs and stall the server
+    output = open(log_file, "a") if log_file else None
     server_process = subprocess.Popen(
-        [sys.executable, os.path.join(os.path.dirname(__file__), "server", "mcp_server.py")],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
+        command,
+        stdout=output,
+        stderr=subprocess.STDOUT if output else None,
         text=True
     )
+    # The server has its own copy of the descriptor
+    if output:
+        output.close()
     print("MCP Server started with PID:", server_process.pid)
     return server_process
 
-def run_client():
+def wait_for_server(server_process, timeout=SERVER_START_TIMEOUT):
+    """Poll the server's health check until it answers. Returns whether it did."""
+    url = f"http://{SERVER_HOST}:{SERVER_PORT}/api/health"
+    # Straight to the server, whatever proxy the environment configures
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+    deadline = time.monotonic() + timeout
+    delay = 0.02
+    while time.monotonic() < deadline:
+        if server_process.poll() is not None:
+            return False
+        try:
+            with opener.open(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+    return False
+
+def run_client(timings=False):
     """Run the MCP client process."""
-    client_process = subprocess.Popen(
-        [sys.executable, os.path.join(os.path.dirname(__file__), "client", "mcp_client.py")]
-    )
+    command = [sys.executable, os.path.join(os.path.dirname(__file__), "client", "mcp_client.py")]
+    if timings:
+        command.append("--timings")
+    client_process = subprocess.Popen(command)
     return client_process
 
 def main():
@@ -44,14 +83,23 @@ def main():
     try:
         # Run server if not client-only
         if not args.client_only:
-            server_process = run_server()
-            # Give the server time to start
-            time.sleep(2)
+            started = time.perf_counter()
+            server_process = run_server(args.workers, None if args.server_only else SERVER_LOG_FILE)
+            # Wait until the server answers rather than for a fixed time
+            if wait_for_server(server_process):
+                if args.timings:
+                    print(f"Server ready after {(time.perf_counter() - started) * 1000:.0f} ms")
+            elif server_process.poll() is not None:
+                print(f"Server exited with code {server_process.returncode}")
+            else:
+                print(f"Server did not answer within {SERVER_START_TIMEOUT}s; starting the client anyway")
         
-        # Run client if not server-only
+        # Run client if not server-only; otherwise serve until interrupted
         if not args.server_only:
-            client_process = run_client()
+            client_process = run_client(args.timings)
             client_process.wait()
+        elif server_process:
+            server_process.wait()
     
     except KeyboardInterrupt:
         print("\nReceived keyboard interrupt. Shutting down...")
@@ -64,14 +112,13 @@ def main():
             print("Client process terminated")
         
         if server_process and server_process.poll() is None:
+            # SIGTERM lets the server finish requests in flight before exiting
             server_process.terminate()
             server_process.wait()
             print("Server process terminated")
             
-            # Print server output for debugging
-            stdout, stderr = server_process.communicate()
-            if stderr:
-                print("Server errors:", stderr)
+        if server_process and not args.server_only:
+            print("Server output was written to", SERVER_LOG_FILE)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,60 +1,380 @@
 import os
+import re
+import math
+import mmap
 import fnmatch
+import hashlib
+import itertools
 from pathlib import Path
 import time
 import threading
-from queue import Queue
-from .database import add_code_file
-from .config import IGNORED_DIRS, INDEXED_EXTENSIONS
+from queue import PriorityQueue, Full
+from concurrent.futures import ProcessPoolExecutor
+from .database import get_indexed_files, get_indexed_file_rows, register_project, get_project
+from .file_watcher import FileWatcher
+from .index_writer import IndexWriter
+from .code_parser import analyze_file
+from .metrics import (
+    INDEX_FILES, INDEX_ERRORS, INDEX_IGNORED, INDEX_QUEUE_DEPTH, INDEX_WRITE_QUEUE_DEPTH, INDEX_IN_PROGRESS,
+    INDEX_FILES_PER_SECOND, INDEX_BYTES_PER_SECOND
+)
+from .config import (
+    IGNORED_DIRS, INDEXED_EXTENSIONS, INDEX_WORKERS, INDEX_PARSE_PROCESSES,
+    INDEX_MAX_FILE_BYTES, INDEX_SAMPLE_BYTES, INDEX_MINIFIED_LINE_LENGTH, INDEX_MMAP_BYTES,
+    INDEX_GENERATED_HEAD_LINES, INDEX_GENERATED_PATTERNS, INDEX_GENERATED_EXEMPT_EXTENSIONS, INDEX_QUEUE_SIZE
+)
+
+# Control characters that plain text does contain
+_TEXT_CONTROL_BYTES = set(b"\t\n\r\f\b\x1b")
+
+_GENERATED_RE = re.compile("|".join(f"(?:{pattern})" for pattern in INDEX_GENERATED_PATTERNS), re.MULTILINE)
+
+def content_hash(data):
+    """Hash raw file content for change detection.
+    
+    Takes bytes or any buffer, such as an mmap. For UTF-8 files this is the
+    same as hashing the decoded text.
+    """
+    return hashlib.sha1(data).hexdigest()
+
+def sniff_content(sample, check_generated=True):
+    """Judge a file by its first bytes: "binary", "minified", "generated", or None for indexable text."""
+    if b"\0" in sample:
+        return "binary"
+    
+    control = sum(1 for byte in sample if byte < 32 and byte not in _TEXT_CONTROL_BYTES)
+    text = sample.decode('utf-8', errors='ignore')
+    # A cut-off multi-byte character at the end of the sample is fine
+    if control > len(sample) * 0.05 or len(text.encode('utf-8')) < len(sample) * 0.7:
+        return "binary"
+    
+    if len(text) > INDEX_MINIFIED_LINE_LENGTH and len(text) / (text.count("\n") + 1) > INDEX_MINIFIED_LINE_LENGTH:
+        return "minified"
+    
+    if check_generated:
+        head = "\n".join(text.split("\n", INDEX_GENERATED_HEAD_LINES)[:INDEX_GENERATED_HEAD_LINES])
+        if _GENERATED_RE.search(head):
+            return "generated"
+    return None
+
+def parse_content(file_path, data, previous_hash=None):
+    """Decode file content and derive what the index stores for it.
+    
+    `data` may be bytes or an mmap. If it hashes to previous_hash, only the
+    hash is returned and nothing is decoded or parsed. Otherwise the whole
+    file is decoded and kept for chunking and storage, so a changed file
+    costs a full copy of its text whichever way it was read.
+    """
+    digest = content_hash(data)
+    if digest == previous_hash:
+        return {"content_hash": digest, "unchanged": True}
+    
+    content = str(data, 'utf-8', errors='ignore')
+    
+    # Determine language from file extension
+    _, ext = os.path.splitext(file_path)
+    language = ext[1:] if ext else ""
+    
+    analysis = analyze_file(content, language)
+    
+    return {
+        "content": content,
+        "language": language,
+        "content_hash": digest,
+        "chunks": analysis["chunks"],
+        "symbols": analysis["symbols"]
+    }
+
+def ingest_file(file_path, size, previous_hash=None):
+    """Read and parse one file, or say why it was left out ({"ignored": reason}).
+    
+    Only a sample is read from files that turn out not to be indexable
+    text. Large files are memory-mapped, which lets an unchanged one be
+    hashed without reading it into a buffer; a changed one is still decoded
+    in full, so INDEX_MAX_FILE_BYTES is what bounds memory per file. Kept at
+    module level so it can run in a worker process.
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(INDEX_SAMPLE_BYTES)
+        reason = sniff_content(sample, not file_path.endswith(INDEX_GENERATED_EXEMPT_EXTENSIONS))
+        if reason is not None:
+            return {"ignored": reason}
+        
+        if size < INDEX_MMAP_BYTES:
+            return parse_content(file_path, sample + f.read(), previous_hash)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return parse_content(file_path, data, previous_hash)
+
+def file_priority(file_stats, now=None):
+    """Queue priority of a file; lower goes first.
+    
+    Recently modified files are likeliest to be asked about and small ones
+    are quickest to index, so both lead; age in hours and size in 4 KB
+    pages count alike on a log scale.
+    """
+    age_hours = max(0.0, (now or time.time()) - file_stats.st_mtime) / 3600
+    return math.log2(1 + age_hours) + math.log2(1 + file_stats.st_size / 4096)
+
+class IndexRun:
+    """One indexing pass over a project, with its progress and completion estimate.
+    
+    A run is "scanning" while the project is walked, "indexing" while its
+    queued files are processed, then "finished" or "cancelled".
+    """
+    
+    def __init__(self, project_id, project_path):
+        self.project_id = project_id
+        self.project_path = project_path
+        self.state = "scanning"
+        self.started_at = time.time()
+        self.indexing_started_at = None
+        self.finished_at = None
+        self.total_files = 0
+        self.total_bytes = 0
+        self.done_files = 0
+        self.done_bytes = 0
+        self.paused_seconds = 0.0
+        self.paused_since = None
+        self.lock = threading.Lock()
+    
+    @property
+    def active(self):
+        return self.state in ("scanning", "indexing")
+    
+    @property
+    def cancelled(self):
+        return self.state == "cancelled"
+    
+    def start_indexing(self, total_files, total_bytes):
+        """The walk is done; `total_files` files of `total_bytes` bytes were queued."""
+        with self.lock:
+            if not self.active:
+                return
+            self.total_files, self.total_bytes = total_files, total_bytes
+            self.indexing_started_at = time.time()
+            # The estimate only looks at indexing time, so pauses while scanning don't count
+            self.paused_seconds = 0.0
+            if self.paused_since is not None:
+                self.paused_since = self.indexing_started_at
+            self.state = "indexing"
+            self._finish_if_done()
+    
+    def file_done(self, size):
+        with self.lock:
+            self.done_files += 1
+            self.done_bytes += size
+            self._finish_if_done()
+    
+    def _finish_if_done(self):
+        if self.state == "indexing" and self.done_files >= self.total_files:
+            self.state = "finished"
+            self.finished_at = time.time()
+    
+    def cancel(self):
+        with self.lock:
+            if self.active:
+                self.state = "cancelled"
+                self.finished_at = time.time()
+    
+    def pause(self):
+        with self.lock:
+            if self.paused_since is None:
+                self.paused_since = time.time()
+    
+    def resume(self):
+        with self.lock:
+            if self.paused_since is not None:
+                self.paused_seconds += time.time() - self.paused_since
+                self.paused_since = None
+    
+    def progress(self):
+        """Fraction done, counting files and bytes equally; per-file overhead and size both cost time."""
+        if not self.total_files:
+            return 0.0 if self.state == "scanning" else 1.0
+        files = self.done_files / self.total_files
+        if not self.total_bytes:
+            return files
+        return (files + self.done_bytes / self.total_bytes) / 2
+    
+    def eta_seconds(self):
+        """Seconds until the queued files are done at the rate so far, excluding pauses."""
+        progress = self.progress()
+        if self.state != "indexing" or progress <= 0:
+            return None
+        now = self.paused_since or time.time()
+        elapsed = now - self.indexing_started_at - self.paused_seconds
+        return max(0.0, elapsed) * (1 - progress) / progress
+    
+    def to_dict(self):
+        with self.lock:
+            eta = self.eta_seconds()
+            return {
+                "project": self.project_path,
+                "state": self.state,
+                "paused": self.paused_since is not None,
+                "files_total": self.total_files,
+                "files_done": self.done_files,
+                "bytes_total": self.total_bytes,
+                "bytes_done": self.done_bytes,
+                "progress": round(self.progress(), 3),
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at
+            }
 
 class CodeIndexer:
-    def __init__(self):
-        self.index_queue = Queue()
-        self.indexing_thread = None
-        self.is_indexing = False
+    def __init__(self, workers=INDEX_WORKERS, parse_processes=INDEX_PARSE_PROCESSES):
+        # (priority, sequence, item); bounded so a huge walk can't run far ahead
+        self.index_queue = PriorityQueue(maxsize=INDEX_QUEUE_SIZE)
+        self.sequence = itertools.count()
+        self.resumed = threading.Event()
+        self.resumed.set()
+        self.runs = {}          # project id -> latest IndexRun
+        self.runs_lock = threading.Lock()
+        self.worker_count = max(1, workers)
+        self.worker_threads = []
+        self.worker_states = {}
+        self.parse_processes = parse_processes
+        self.parse_pool = None
         self.current_project = None
+        self.current_project_id = None
         self.indexed_files_count = 0
+        self.writer = IndexWriter()
+        self.watcher = None
+        # project id -> [changed, deleted, deleted dirs] from the watcher, not yet applied
+        self.watch_changes = {}
+        self.watch_changes_ready = threading.Condition()
+        self.watch_applying = False
+        self.watch_thread = None
+        self.stats_lock = threading.Lock()
+        self.run_stats = self._empty_run_stats()
+    
+    @staticmethod
+    def _empty_run_stats():
+        return {"added": 0, "changed": 0, "removed": 0, "skipped": 0, "ignored": 0}
+    
+    def _count(self, key, amount=1):
+        with self.stats_lock:
+            self.run_stats[key] += amount
+        INDEX_FILES.inc(amount, outcome=key)
         
     def start_indexing_thread(self):
-        """Start the background indexing thread."""
-        if self.indexing_thread is None or not self.indexing_thread.is_alive():
-            self.indexing_thread = threading.Thread(
+        """Start the background indexing workers and writer thread."""
+        self.writer.start()
+        
+        # CPU-heavy parsing can be moved off the GIL into worker processes
+        if self.parse_processes and self.parse_pool is None:
+            self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_processes)
+        
+        for worker_id in range(self.worker_count):
+            if worker_id < len(self.worker_threads) and self.worker_threads[worker_id].is_alive():
+                continue
+            
+            self.worker_states[worker_id] = {
+                "state": "idle",
+                "file": None,
+                "processed": 0,
+                "errors": 0
+            }
+            thread = threading.Thread(
                 target=self._process_index_queue,
+                args=(worker_id,),
+                name=f"indexer-{worker_id}",
                 daemon=True
             )
-            self.indexing_thread.start()
+            if worker_id < len(self.worker_threads):
+                self.worker_threads[worker_id] = thread
+            else:
+                self.worker_threads.append(thread)
+            thread.start()
     
-    def _process_index_queue(self):
-        """Process files in the index queue."""
+    def _process_index_queue(self, worker_id):
+        """Process files in the index queue, most urgent first."""
+        state = self.worker_states[worker_id]
         while True:
+            self.resumed.wait()
+            _, _, (run, project_id, file_path, file_stats, previous) = self.index_queue.get()
             try:
-                file_path = self.index_queue.get(timeout=1)
-                self._index_file(file_path)
+                # Files of cancelled runs are dropped as they come up
+                if run is not None and run.cancelled:
+                    continue
+                
+                self.resumed.wait()
+                state["state"] = "indexing"
+                state["file"] = file_path
+                try:
+                    if self._index_file(project_id, file_path, file_stats, previous):
+                        state["processed"] += 1
+                    else:
+                        state["errors"] += 1
+                        INDEX_ERRORS.inc()
+                finally:
+                    state["state"] = "idle"
+                    state["file"] = None
+                    with self.stats_lock:
+                        self.indexed_files_count += 1
+                    if run is not None:
+                        run.file_done(file_stats.st_size)
+            finally:
                 self.index_queue.task_done()
-                self.indexed_files_count += 1
-            except Exception as e:
-                # Empty queue or error
-                if self.index_queue.empty():
-                    self.is_indexing = False
-                time.sleep(0.1)
     
-    def _index_file(self, file_path):
-        """Index a single file."""
+    def _enqueue(self, run, project_id, file_path, file_stats, previous):
+        """Queue a file, waiting for room; gives up if its run is cancelled meanwhile."""
+        entry = (file_priority(file_stats), next(self.sequence), (run, project_id, file_path, file_stats, previous))
+        while run is None or not run.cancelled:
+            try:
+                self.index_queue.put(entry, timeout=0.5)
+                return True
+            except Full:
+                continue
+        return False
+    
+    def _index_file(self, project_id, file_path, file_stats=None, previous=None):
+        """Index a single file of a project.
+        
+        `previous` is the stored row for a file that was indexed before, or
+        None for a new file.
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+            file_stats = file_stats or os.stat(file_path)
+            previous_hash = previous.get("content_hash") if previous else None
             
-            # Determine language from file extension
-            _, ext = os.path.splitext(file_path)
-            language = ext[1:] if ext else ""
+            # Worker processes read the file themselves; only results are pickled
+            if self.parse_pool is not None:
+                parsed = self.parse_pool.submit(ingest_file, file_path, file_stats.st_size, previous_hash).result()
+            else:
+                parsed = ingest_file(file_path, file_stats.st_size, previous_hash)
             
-            # Add to database
-            add_code_file(file_path, content, language)
+            if "ignored" in parsed:
+                self._ignore_file(project_id, file_path, previous, parsed["ignored"])
+                return True
+            
+            # Stat data changed but content didn't (touch, checkout, etc.)
+            if parsed.get("unchanged"):
+                self.writer.touch_file(project_id, file_path, file_stats)
+                self._count("skipped")
+                return True
+            
+            # Hand off to the batched writer
+            self.writer.add_file(
+                project_id, file_path, parsed["content"], parsed["language"], parsed["content_hash"],
+                file_stats, previous is None,
+                parsed["chunks"], parsed["symbols"]
+            )
+            self._count("changed" if previous else "added")
             return True
         except Exception as e:
             print(f"Error indexing {file_path}: {e}")
             return False
     
+    def _ignore_file(self, project_id, file_path, previous, reason):
+        """Leave a file out of the index, dropping it if it was indexed before."""
+        INDEX_IGNORED.inc(reason=reason)
+        self._count("ignored")
+        if previous:
+            self._count("removed", self.writer.remove_files(project_id, [file_path]))
+        return "ignored"
+    
     def should_index_file(self, file_path):
         """Check if a file should be indexed based on extension and ignore patterns."""
         # Check if file extension is in our list of indexed extensions
@@ -70,35 +390,269 @@ class CodeIndexer:
         return True
     
     def index_project(self, project_path):
-        """Index all files in a project directory."""
+        """Start indexing new and changed files in a project directory.
+        
+        The project is walked on a background thread; this returns once the
+        run is registered. Files whose mtime and size match the stored row
+        are skipped without being read, and rows for files that no longer
+        exist are removed. A run already going for the project is cancelled.
+        """
         project_path = os.path.abspath(project_path)
-        self.current_project = project_path
-        self.is_indexing = True
-        self.indexed_files_count = 0
+        project_id = register_project(project_path)
         
         # Start the indexing thread if not already running
         self.start_indexing_thread()
         
-        # Walk through the project directory
-        for root, dirs, files in os.walk(project_path):
-            # Remove ignored directories from dirs to prevent walking them
-            dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+        run = IndexRun(project_id, project_path)
+        if not self.resumed.is_set():
+            run.pause()
+        with self.runs_lock:
+            previous_run = self.runs.get(project_id)
+            if previous_run is not None:
+                previous_run.cancel()
+            self.runs[project_id] = run
+        
+        self.current_project = project_path
+        self.current_project_id = project_id
+        self.indexed_files_count = 0
+        with self.stats_lock:
+            self.run_stats = self._empty_run_stats()
+        
+        threading.Thread(target=self._scan_project, args=(run,), name="index-scan", daemon=True).start()
+        return True
+    
+    def _scan_project(self, run):
+        """Queue new and changed files, most urgent first, and remove deleted ones."""
+        try:
+            # Anything left in here after the walk has been deleted from disk
+            stored = get_indexed_files(run.project_id)
+            pending = []
+            skipped = 0
+            
+            # Walk through the project directory
+            for root, dirs, files in os.walk(run.project_path):
+                if run.cancelled:
+                    return
+                
+                # Remove ignored directories from dirs to prevent walking them
+                dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+                
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    if not self.should_index_file(file_path):
+                        continue
+                    
+                    if self._queue_if_changed(run.project_id, file_path, stored.pop(file_path, None), pending) == "skipped":
+                        skipped += 1
             
-            for file in files:
-                file_path = os.path.join(root, file)
-                if self.should_index_file(file_path):
-                    self.index_queue.put(file_path)
+            self._count("skipped", skipped)
+            if stored:
+                self._count("removed", self.writer.remove_files(run.project_id, stored))
+            
+            # Only stat data has been read so far; now order the real work
+            now = time.time()
+            pending.sort(key=lambda item: file_priority(item[1], now))
+            run.start_indexing(len(pending), sum(file_stats.st_size for _, file_stats, _ in pending))
+            for file_path, file_stats, previous in pending:
+                if not self._enqueue(run, run.project_id, file_path, file_stats, previous):
+                    break
+        except Exception as e:
+            print(f"Error scanning {run.project_path}: {e}")
+            run.cancel()
+    
+    def _queue_if_changed(self, project_id, file_path, previous, pending=None):
+        """Queue a file unless its stat data matches the stored row.
         
+        With `pending`, (file_path, file_stats, previous) is appended to it
+        instead. Returns "queued", "skipped", "ignored" (too large to index),
+        or None if the file can't be stat'ed.
+        """
+        try:
+            file_stats = os.stat(file_path)
+        except OSError:
+            return None
+        
+        if file_stats.st_size > INDEX_MAX_FILE_BYTES:
+            return self._ignore_file(project_id, file_path, previous, "too_large")
+        
+        if (previous
+                and previous["last_modified"] == file_stats.st_mtime
+                and previous["size"] == file_stats.st_size):
+            return "skipped"
+        
+        if pending is not None:
+            pending.append((file_path, file_stats, previous))
+        else:
+            self._enqueue(None, project_id, file_path, file_stats, previous)
+        return "queued"
+    
+    def start_watching(self, project_path=None, force_polling=False):
+        """Keep a project's index fresh by applying file changes as they happen."""
+        project_path = os.path.abspath(project_path or self.current_project or os.getcwd())
+        project_id = register_project(project_path)
+        self.stop_watching()
+        self.start_indexing_thread()
+        
+        if self.watch_thread is None or not self.watch_thread.is_alive():
+            self.watch_thread = threading.Thread(target=self._apply_watched_changes, name="index-watch", daemon=True)
+            self.watch_thread.start()
+        
+        self.watcher = FileWatcher(
+            project_path,
+            lambda changed, deleted, deleted_dirs: self._merge_changes(project_id, changed, deleted, deleted_dirs),
+            should_watch_dir=lambda name: name not in IGNORED_DIRS,
+            should_watch_file=self.should_index_file,
+            on_rescan=lambda: self.index_project(project_path),
+            force_polling=force_polling
+        )
+        self.watcher.start()
+        return True
+    
+    def stop_watching(self):
+        """Stop watch mode if it is running."""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
         return True
     
+    def _merge_changes(self, project_id, changed_files, deleted_files, deleted_dirs):
+        """Take a batch from the watcher without waiting on indexing.
+        
+        Batches that arrive while earlier ones are still being applied are
+        merged into them, the latest state of each path winning.
+        """
+        with self.watch_changes_ready:
+            changed, deleted, dirs = self.watch_changes.setdefault(project_id, (set(), set(), set()))
+            changed.difference_update(deleted_files)
+            changed.update(changed_files)
+            deleted.difference_update(changed_files)
+            deleted.update(deleted_files)
+            dirs.update(deleted_dirs)
+            self.watch_changes_ready.notify()
+    
+    def _apply_watched_changes(self):
+        """Apply merged watcher batches; this thread, not the watcher's, waits for queue room."""
+        while True:
+            with self.watch_changes_ready:
+                while not self.watch_changes:
+                    self.watch_changes_ready.wait()
+                self.watch_applying = True
+                project_id, changes = self.watch_changes.popitem()
+            try:
+                self._apply_changes(project_id, *changes)
+            except Exception as e:
+                print(f"Error applying watched changes: {e}")
+            finally:
+                self.watch_applying = False
+    
+    def _apply_changes(self, project_id, changed_files, deleted_files, deleted_dirs):
+        """Incrementally index a batch of changes reported by the watcher."""
+        stored = get_indexed_file_rows(project_id, changed_files | deleted_files)
+        
+        for file_path in changed_files:
+            if self._queue_if_changed(project_id, file_path, stored.get(file_path)) == "skipped":
+                self._count("skipped")
+        
+        removed = {file_path for file_path in deleted_files if file_path in stored}
+        for directory in deleted_dirs:
+            removed.update(get_indexed_files(project_id, directory))
+        # A directory deleted in one batch may be back, with some of its files, in a later one
+        removed.difference_update(changed_files)
+        if removed:
+            self._count("removed", self.writer.remove_files(project_id, removed))
+            # The next batch compares against stored rows, so they must be gone by then
+            self.writer.flush()
+    
+    def drop_project(self, project_path):
+        """Remove a project and everything indexed in it.
+        
+        Returns False if the project isn't indexed. Raises RuntimeError while
+        the project is being indexed.
+        """
+        project = get_project(project_path)
+        if project is None:
+            return False
+        
+        run = self.runs.get(project["id"])
+        if run is not None and run.active:
+            raise RuntimeError(f"{project['root_path']} is being indexed")
+        
+        if self.watcher is not None and self.watcher.root == project["root_path"]:
+            self.stop_watching()
+        if project["id"] == self.current_project_id:
+            self.current_project = self.current_project_id = None
+        
+        self.writer.start()
+        self.writer.remove_project(project["id"])
+        self.writer.flush()
+        return True
+    
+    def pause_indexing(self):
+        """Hold queued files until resume_indexing(); files already being indexed finish."""
+        self.resumed.clear()
+        for run in self._active_runs():
+            run.pause()
+        return True
+    
+    def resume_indexing(self):
+        for run in self._active_runs():
+            run.resume()
+        self.resumed.set()
+        return True
+    
+    def cancel_indexing(self, project_path=None):
+        """Cancel the run for a project, or every active run.
+        
+        Queued files of a cancelled run are dropped; files already indexed
+        stay indexed. Returns the paths of the cancelled projects.
+        """
+        if project_path is not None:
+            project_path = os.path.abspath(project_path)
+        cancelled = []
+        for run in self._active_runs():
+            if project_path is None or run.project_path == project_path:
+                run.cancel()
+                cancelled.append(run.project_path)
+        return cancelled
+    
+    def _active_runs(self):
+        with self.runs_lock:
+            return [run for run in self.runs.values() if run.active]
+    
+    def is_indexing(self):
+        # Busy while a run is walking or indexing, watched changes wait to be
+        # queued, or any queued file is still in flight
+        return bool(self._active_runs()) or bool(self.watch_changes) or self.watch_applying \
+            or self.index_queue.unfinished_tasks > 0
+    
     def get_indexing_status(self):
         """Get the current indexing status."""
+        with self.runs_lock:
+            runs = sorted(self.runs.values(), key=lambda run: run.started_at, reverse=True)
         return {
-            "is_indexing": self.is_indexing,
+            "is_indexing": self.is_indexing(),
+            "paused": not self.resumed.is_set(),
             "project": self.current_project,
             "indexed_files": self.indexed_files_count,
-            "queue_size": self.index_queue.qsize()
+            "queue_size": self.index_queue.qsize(),
+            "queue_capacity": self.index_queue.maxsize,
+            "runs": [run.to_dict() for run in runs],
+            "last_run": dict(self.run_stats),
+            "writer": self.writer.get_stats(),
+            "workers": [
+                dict(self.worker_states[worker_id], id=worker_id)
+                for worker_id in sorted(self.worker_states)
+            ],
+            "parse_processes": self.parse_processes if self.parse_pool is not None else 0,
+            "watch": self.watcher.get_status() if self.watcher is not None else None
         }
 
 # Global indexer instance
-indexer = CodeIndexer()
\ No newline at end of file
+indexer = CodeIndexer()
+
+# Read at scrape time, so they cost nothing while indexing
+INDEX_QUEUE_DEPTH.set_function(indexer.index_queue.qsize)
+INDEX_WRITE_QUEUE_DEPTH.set_function(indexer.writer.write_queue.qsize)
+INDEX_IN_PROGRESS.set_function(indexer.is_indexing)
+INDEX_FILES_PER_SECOND.set_function(lambda: indexer.writer.get_stats()["files_per_second"])
+INDEX_BYTES_PER_SECOND.set_function(lambda: indexer.writer.get_stats()["bytes_per_second"])
\ No newline at end of file
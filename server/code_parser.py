@@ -0,0 +1,331 @@
+import re
+from .config import CHUNK_MAX_LINES
+
+# tree-sitter is optional; without it every file gets line-based chunks
+try:
+    from tree_sitter_languages import get_parser
+except ImportError:
+    get_parser = None
+
+# File extension -> tree-sitter-languages grammar
+GRAMMARS = {
+    "py": "python",
+    "js": "javascript",
+    "jsx": "javascript",
+    "ts": "typescript",
+    "tsx": "tsx",
+    "go": "go",
+    "rs": "rust",
+    "c": "c",
+    "h": "c",
+    "cpp": "cpp",
+    "hpp": "cpp",
+    "java": "java",
+    "php": "php",
+    "rb": "ruby",
+    "sh": "bash",
+    "bash": "bash",
+    "zsh": "bash",
+}
+
+# Node types that start a chunk of their own, mapped to a coarse kind
+DEFINITION_KINDS = {
+    "function_definition": "function",
+    "function_declaration": "function",
+    "generator_function_declaration": "function",
+    "function_item": "function",
+    "method_definition": "function",
+    "method_declaration": "function",
+    "constructor_declaration": "function",
+    "method": "function",
+    "singleton_method": "function",
+    "class_definition": "class",
+    "class_declaration": "class",
+    "class_specifier": "class",
+    "struct_specifier": "class",
+    "interface_declaration": "class",
+    "enum_declaration": "class",
+    "type_declaration": "class",
+    "struct_item": "class",
+    "enum_item": "class",
+    "trait_item": "class",
+    "impl_item": "class",
+    "mod_item": "class",
+    "class": "class",
+    "module": "class",
+}
+
+# Nodes that wrap a definition (decorators, exports)
+WRAPPER_FIELDS = {
+    "decorated_definition": "definition",
+    "export_statement": "declaration",
+}
+
+# Leaf node types that name something; other occurrences are references
+IDENTIFIER_TYPES = {
+    "identifier",
+    "field_identifier",
+    "property_identifier",
+    "shorthand_property_identifier",
+    "type_identifier",
+    "constant",
+}
+
+# Fallback symbol extraction when tree-sitter isn't available
+_DEFINITION_RE = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?"
+    r"(def|function|func\s+(?:\([^)]*\)\s*)?|fn|class|struct|interface|trait|enum|module|type|impl)"
+    r"\s*\*?\s*([A-Za-z_]\w*)",
+    re.MULTILINE
+)
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_]\w{2,}")
+_KEYWORDS = {
+    "and", "async", "await", "break", "case", "catch", "class", "const", "continue",
+    "def", "default", "defer", "del", "elif", "else", "enum", "export", "extends",
+    "false", "final", "for", "from", "func", "function", "go", "if", "impl", "import",
+    "in", "interface", "let", "match", "mod", "module", "mut", "new", "nil", "none",
+    "None", "not", "null", "package", "pass", "private", "protected", "pub", "public",
+    "raise", "return", "self", "static", "struct", "switch", "this", "throw", "trait",
+    "true", "True", "False", "try", "type", "use", "var", "void", "while", "with", "yield",
+}
+
+# Per-process parser cache; parsers aren't picklable
+_parsers = {}
+
+def _get_parser(language):
+    grammar = GRAMMARS.get(language)
+    if get_parser is None or grammar is None:
+        return None
+
+    if grammar not in _parsers:
+        try:
+            _parsers[grammar] = get_parser(grammar)
+        except Exception:
+            _parsers[grammar] = None
+    return _parsers[grammar]
+
+def _unwrap(node):
+    """Return the definition node inside decorators/exports, if any."""
+    field = WRAPPER_FIELDS.get(node.type)
+    if field:
+        inner = node.child_by_field_name(field)
+        return _unwrap(inner) if inner is not None else None
+    return node if node.type in DEFINITION_KINDS else None
+
+def _name_node(node):
+    """Best-effort node holding the name of a definition."""
+    for field in ("name", "type"):
+        child = node.child_by_field_name(field)
+        if child is not None:
+            return child
+
+    # e.g. Go `type T struct{}` keeps the name on the type_spec child
+    for child in node.named_children:
+        name = child.child_by_field_name("name")
+        if name is not None:
+            return name
+    return None
+
+def _node_name(node):
+    name = _name_node(node)
+    return name.text.decode("utf-8", errors="ignore") if name is not None else None
+
+def _body_children(node):
+    body = node.child_by_field_name("body")
+    if body is None:
+        return []
+    return [child for child in body.children if child.is_named]
+
+def _make_chunk(lines, start, end, kind, name):
+    return {
+        "kind": kind,
+        "name": name,
+        "start_line": start + 1,
+        "end_line": end + 1,
+        "content": "".join(lines[start:end + 1]),
+    }
+
+def _window_chunks(lines, start, end, kind, name, chunks):
+    """Split an oversized line range into CHUNK_MAX_LINES windows."""
+    part = 1
+    for window_start in range(start, end + 1, CHUNK_MAX_LINES):
+        window_end = min(end, window_start + CHUNK_MAX_LINES - 1)
+        part_name = f"{name} (part {part})" if name else None
+        chunks.append(_make_chunk(lines, window_start, window_end, kind, part_name))
+        part += 1
+
+def _chunk_nodes(nodes, lines, prefix, chunks):
+    """Turn sibling syntax nodes into definition chunks and filler blocks."""
+    block = None      # [start, end] of pending non-definition lines
+    comments = None   # start line of comments directly above the next node
+
+    def flush_block():
+        nonlocal block
+        if block:
+            _window_chunks(lines, block[0], block[1], "block", None, chunks)
+        block = None
+
+    for node in nodes:
+        start, end = node.start_point[0], node.end_point[0]
+
+        if node.type == "comment":
+            comments = start if comments is None else comments
+            continue
+
+        definition = _unwrap(node)
+        if definition is None:
+            start = comments if comments is not None else start
+            comments = None
+            if block and end - block[0] >= CHUNK_MAX_LINES:
+                flush_block()
+            block = [block[0], end] if block else [start, end]
+            continue
+
+        # Leading comments document the definition; keep them together
+        flush_block()
+        if comments is not None:
+            start = comments
+            comments = None
+
+        kind = DEFINITION_KINDS[definition.type]
+        name = _node_name(definition)
+        qualified = f"{prefix}.{name}" if prefix and name else name
+
+        if end - start < CHUNK_MAX_LINES:
+            chunks.append(_make_chunk(lines, start, end, kind, qualified))
+            continue
+
+        # Large classes/impls split into their members plus a header chunk
+        members = _body_children(definition)
+        if any(_unwrap(member) is not None for member in members):
+            header_end = members[0].start_point[0] - 1
+            if header_end >= start:
+                chunks.append(_make_chunk(lines, start, header_end, kind, qualified))
+            _chunk_nodes(members, lines, qualified, chunks)
+        else:
+            _window_chunks(lines, start, end, kind, qualified, chunks)
+
+    if comments is not None:
+        last = nodes[-1].end_point[0]
+        block = [block[0], last] if block else [comments, last]
+    flush_block()
+
+def _line_chunks(lines):
+    """Fallback chunking on blank-line boundaries."""
+    chunks = []
+    start = None
+    for number, line in enumerate(lines):
+        if start is None:
+            if line.strip():
+                start = number
+            continue
+
+        paragraph_end = not line.strip()
+        if (paragraph_end and number - start >= CHUNK_MAX_LINES // 2) or number - start >= CHUNK_MAX_LINES - 1:
+            end = number if not paragraph_end else number - 1
+            chunks.append(_make_chunk(lines, start, end, "block", None))
+            start = None
+
+    if start is not None:
+        chunks.append(_make_chunk(lines, start, len(lines) - 1, "block", None))
+    return chunks
+
+def _tree_chunks(tree, lines):
+    chunks = []
+    nodes = [node for node in tree.root_node.children if node.is_named]
+    if nodes:
+        _chunk_nodes(nodes, lines, None, chunks)
+    return chunks or _line_chunks(lines)
+
+def _tree_symbols(tree):
+    """Collect definitions and identifier references from a syntax tree."""
+    symbols = []
+    seen = set()
+    definition_names = set()
+
+    def add(name_node, kind, role):
+        name = name_node.text.decode("utf-8", errors="ignore")
+        line = name_node.start_point[0] + 1
+        if len(name) < 2 or (name, line, role) in seen:
+            return
+        seen.add((name, line, role))
+        symbols.append({"name": name, "kind": kind, "role": role, "line": line})
+
+    # Iterative pre-order walk; definitions are seen before their name nodes.
+    # The root is skipped since e.g. Python's root node type is "module".
+    cursor = tree.walk()
+    cursor.goto_first_child()
+    while True:
+        node = cursor.node
+        if node.type in DEFINITION_KINDS:
+            name_node = _name_node(node)
+            if name_node is not None:
+                definition_names.add(name_node.start_byte)
+                add(name_node, DEFINITION_KINDS[node.type], "definition")
+        elif node.type in IDENTIFIER_TYPES and node.start_byte not in definition_names:
+            add(node, None, "reference")
+
+        if cursor.goto_first_child() or cursor.goto_next_sibling():
+            continue
+        while cursor.goto_parent():
+            if cursor.goto_next_sibling():
+                break
+        else:
+            return symbols
+
+def _split_lines(content):
+    """Split into lines keeping their endings, breaking on "\n" only.
+    
+    str.splitlines() also breaks on form feeds, "\u2028" and the like,
+    which tree-sitter rows (and symbol lines) don't count.
+    """
+    lines = [line + "\n" for line in content.split("\n")]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+def _regex_symbols(content):
+    """Approximate definitions and references without a parser."""
+    symbols = []
+    definitions = set()
+    for match in _DEFINITION_RE.finditer(content):
+        keyword = match.group(1).split()[0]
+        line = content.count("\n", 0, match.start(2)) + 1
+        kind = "function" if keyword in ("def", "function", "func", "fn") else "class"
+        definitions.add((match.group(2), line))
+        symbols.append({"name": match.group(2), "kind": kind, "role": "definition", "line": line})
+
+    for number, text in enumerate(content.split("\n"), 1):
+        for name in set(_IDENTIFIER_RE.findall(text)) - _KEYWORDS:
+            if (name, number) not in definitions:
+                symbols.append({"name": name, "kind": None, "role": "reference", "line": number})
+    return symbols
+
+def analyze_file(content, language):
+    """Chunk a file and extract its symbols from a single parse.
+    
+    Symbols are only extracted for source languages; data and prose files
+    (JSON, YAML, Markdown, ...) just get chunks.
+    """
+    lines = _split_lines(content)
+    if not lines:
+        return {"chunks": [], "symbols": []}
+
+    tree = None
+    parser = _get_parser(language)
+    if parser is not None:
+        try:
+            tree = parser.parse(content.encode("utf-8"))
+        except Exception:
+            tree = None
+
+    if tree is not None:
+        return {"chunks": _tree_chunks(tree, lines), "symbols": _tree_symbols(tree)}
+
+    symbols = _regex_symbols(content) if language in GRAMMARS else []
+    return {"chunks": _line_chunks(lines), "symbols": symbols}
+
+def chunk_file(content, language):
+    """Split file content into function/class/block chunks with line ranges."""
+    return analyze_file(content, language)["chunks"]
\ No newline at end of file
@@ -0,0 +1,251 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from .command_runner import start_command, stop_command, stream_process_output
+from .database import log_command
+from .metrics import COMMAND_SECONDS, JOBS_RUNNING, JOBS_QUEUED, command_outcome
+from .config import (
+    COMMAND_JOB_WORKERS, COMMAND_JOB_MAX_QUEUED, COMMAND_JOB_HISTORY,
+    COMMAND_JOB_TIMEOUT, COMMAND_JOB_MAX_OUTPUT
+)
+
+# Job states; everything but queued/running is final
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting for a worker."""
+
+class CommandJob:
+    """A shell command running in the background, with its buffered output."""
+
+    def __init__(self, command, working_dir, timeout, max_output):
+        self.id = uuid.uuid4().hex
+        self.command = command
+        self.working_dir = working_dir
+        self.timeout = timeout
+        self.max_output = max_output
+        self.status = QUEUED
+        self.exit_code = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        self.cancel_requested = False
+        self.status_reason = None
+        self.events = []         # (stream, text) chunks in arrival order
+        self.output_bytes = 0
+        self.truncated = False
+        self.changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status not in ACTIVE_STATES
+
+    def append_output(self, stream, text):
+        """Buffer an output chunk, dropping anything past the output limit (in UTF-8 bytes)."""
+        size = len(text.encode('utf-8', errors='replace'))
+        with self.changed:
+            remaining = self.max_output - self.output_bytes
+            if remaining <= 0 or self.truncated:
+                self.truncated = True
+                return
+            if size > remaining:
+                # Cut on a character boundary, so possibly a little short of the limit
+                text = text.encode('utf-8', errors='replace')[:remaining].decode('utf-8', errors='ignore')
+                size = len(text.encode('utf-8'))
+                self.truncated = True
+            self.events.append((stream, text))
+            self.output_bytes += size
+            self.changed.notify_all()
+
+    def set_status(self, status, **fields):
+        with self.changed:
+            self.status = status
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.changed.notify_all()
+
+    def read_output(self, offset=0, wait=0):
+        """Get output events from `offset` on, waiting up to `wait` seconds for new ones."""
+        with self.changed:
+            if wait and offset >= len(self.events) and not self.done:
+                self.changed.wait(wait)
+            events = self.events[offset:]
+        return events, offset + len(events)
+
+    def output_text(self):
+        with self.changed:
+            text = "".join(text for _, text in self.events)
+        if self.truncated:
+            text += "\n... [output truncated]"
+        return text
+
+    def to_dict(self):
+        finished = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "command": self.command,
+            "working_dir": self.working_dir,
+            "status": self.status,
+            "exit_code": self.exit_code,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": round(finished - self.started_at, 3) if self.started_at else None,
+            "output_events": len(self.events),
+            "output_bytes": self.output_bytes,
+            "truncated": self.truncated,
+            "timeout": self.timeout
+        }
+
+class JobManager:
+    """Runs submitted commands on a bounded worker pool.
+
+    At most `max_workers` commands run at once and at most `max_queued` wait
+    for a worker; every job has a wall-clock limit and an output limit.
+    Finished jobs are logged to command_history and kept in memory (the
+    newest `history` of them) for polling.
+    """
+
+    def __init__(self, max_workers=COMMAND_JOB_WORKERS, max_queued=COMMAND_JOB_MAX_QUEUED,
+                 history=COMMAND_JOB_HISTORY):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="command-job")
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.history = history
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, command, working_dir, timeout=None, max_output=None):
+        """Queue a command and return its job."""
+        job = CommandJob(
+            command,
+            working_dir,
+            timeout or COMMAND_JOB_TIMEOUT,
+            max_output or COMMAND_JOB_MAX_OUTPUT
+        )
+
+        with self.lock:
+            # Jobs beyond the worker count are the ones waiting in line
+            active = sum(1 for existing in self.jobs.values() if not existing.done)
+            if active >= self.max_workers + self.max_queued:
+                raise JobQueueFull(f"{active - self.max_workers} jobs are already waiting to run")
+            self.jobs[job.id] = job
+            self._evict_finished()
+
+        self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def has_job(self, job_id):
+        with self.lock:
+            return job_id in self.jobs
+
+    def list_jobs(self):
+        with self.lock:
+            return [job.to_dict() for job in reversed(self.jobs.values())]
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job. Returns the job, or None if unknown."""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
+
+        job.cancel_requested = True
+        if job.process is not None:
+            stop_command(job.process)
+        elif job.status == QUEUED:
+            job.set_status(CANCELLED, finished_at=time.time())
+        return job
+
+    def shutdown(self):
+        """Cancel every queued or running job and wait for the workers to finish."""
+        with self.lock:
+            active = [job.id for job in self.jobs.values() if not job.done]
+        for job_id in active:
+            self.cancel(job_id)
+        self.executor.shutdown(wait=True)
+
+    def get_stats(self):
+        with self.lock:
+            states = [job.status for job in self.jobs.values()]
+        return {
+            "workers": self.max_workers,
+            "running": states.count(RUNNING),
+            "queued": states.count(QUEUED),
+            "retained": len(states)
+        }
+
+    def _evict_finished(self):
+        """Drop the oldest finished jobs beyond the retention limit."""
+        excess = len(self.jobs) - self.history
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done][:max(0, excess)]:
+            del self.jobs[job_id]
+
+    def _expire(self, job):
+        if not job.done:
+            job.status_reason = TIMED_OUT
+            stop_command(job.process)
+
+    def _run(self, job):
+        """Run one job to completion on a worker thread."""
+        if job.cancel_requested:
+            return
+
+        try:
+            process = start_command(job.command, job.working_dir, new_session=True)
+        except Exception as e:
+            job.set_status(FAILED, error=str(e), finished_at=time.time())
+            return
+
+        job.set_status(RUNNING, process=process, started_at=time.time())
+
+        # Cancellation may have raced with the start
+        if job.cancel_requested:
+            stop_command(process)
+
+        timer = threading.Timer(job.timeout, self._expire, args=(job,))
+        timer.daemon = True
+        timer.start()
+        try:
+            for stream, text in stream_process_output(process):
+                job.append_output(stream, text)
+            exit_code = process.wait()
+        finally:
+            timer.cancel()
+
+        if job.status_reason == TIMED_OUT:
+            status = TIMED_OUT
+        elif job.cancel_requested:
+            status = CANCELLED
+        else:
+            status = FINISHED
+        job.set_status(status, exit_code=exit_code, finished_at=time.time(), process=None)
+        COMMAND_SECONDS.observe(
+            job.finished_at - job.started_at, mode="job",
+            outcome=command_outcome(exit_code) if status == FINISHED else status
+        )
+
+        try:
+            log_command(job.command, job.output_text(), job.working_dir, exit_code)
+        except Exception as e:
+            print(f"Error logging job {job.id}: {e}")
+
+# Global job manager instance
+job_manager = JobManager()
+
+JOBS_RUNNING.set_function(lambda: job_manager.get_stats()["running"])
+JOBS_QUEUED.set_function(lambda: job_manager.get_stats()["queued"])
\ No newline at end of file
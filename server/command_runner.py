@@ -0,0 +1,90 @@
+import codecs
+import os
+import signal
+import subprocess
+import threading
+from queue import Queue
+
+# Bytes requested per pipe read; smaller reads mean lower latency per chunk
+READ_SIZE = 4096
+
+def start_command(command, working_dir, new_session=False):
+    """Start a shell command with its stdout and stderr piped back to us.
+
+    With new_session the shell leads its own process group, so
+    stop_command() can take down everything it spawned.
+    """
+    return subprocess.Popen(
+        command,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        stdin=subprocess.DEVNULL,
+        cwd=working_dir,
+        start_new_session=new_session and os.name == "posix"
+    )
+
+def stop_command(process, grace_period=2.0):
+    """Terminate a command and its children, killing it if it lingers."""
+    if process.poll() is not None:
+        return
+
+    try:
+        group_leader = os.name == "posix" and os.getpgid(process.pid) == process.pid
+    except ProcessLookupError:
+        return
+
+    def send(sig):
+        try:
+            if group_leader:
+                os.killpg(process.pid, sig)
+            elif sig == signal.SIGTERM:
+                process.terminate()
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    send(signal.SIGTERM)
+    try:
+        process.wait(timeout=grace_period)
+    except subprocess.TimeoutExpired:
+        send(getattr(signal, "SIGKILL", signal.SIGTERM))
+
+def _pump(pipe, name, events):
+    """Forward decoded chunks from one pipe until it closes."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    try:
+        while True:
+            data = os.read(pipe.fileno(), READ_SIZE)
+            if not data:
+                break
+            text = decoder.decode(data)
+            if text:
+                events.put((name, text))
+        text = decoder.decode(b"", final=True)
+        if text:
+            events.put((name, text))
+    finally:
+        pipe.close()
+        events.put((name, None))
+
+def stream_process_output(process):
+    """Yield (stream, text) pairs from a process as output arrives.
+
+    Each pipe is read by its own thread, so neither stream can block the
+    other and chunks are delivered in roughly the order they were written.
+    """
+    events = Queue()
+    open_streams = 0
+    for name, pipe in (("stdout", process.stdout), ("stderr", process.stderr)):
+        if pipe is not None:
+            threading.Thread(target=_pump, args=(pipe, name, events), daemon=True).start()
+            open_streams += 1
+
+    while open_streams:
+        name, text = events.get()
+        if text is None:
+            open_streams -= 1
+        else:
+            yield name, text
\ No newline at end of file
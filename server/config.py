@@ -5,10 +5,44 @@ from pathlib import Path
 SERVER_HOST = "127.0.0.1"
 SERVER_PORT = 5000
 
-# Database configuration
-DB_FILE = os.path.join(Path.home(), ".mcp_terminal", "session_history.db")
+# Production serving (server/serve.py): SERVER_WORKERS processes answer
+# requests, each on its own threads, while indexing and background jobs run
+# in the parent process only. On shutdown, requests in flight get up to
+# SERVER_SHUTDOWN_TIMEOUT seconds to finish
+SERVER_WORKERS = 1
+SERVER_SHUTDOWN_TIMEOUT = 10.0
+
+# Also listen on this Unix domain socket (readable by this user only); local
+# clients skip TCP entirely when they're given the same path
+SERVER_SOCKET = os.environ.get("MCP_SERVER_SOCKET")
+
+# Idle keep-alive connections are closed after this many seconds
+SERVER_KEEPALIVE_TIMEOUT = 15.0
+
+# /api/metrics histogram buckets, in seconds: request and search latency,
+# shell command run time and LLM response time. Worker processes send their metrics to the
+# parent every METRICS_PUSH_INTERVAL seconds (and whenever they're scraped)
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_COMMAND_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+METRICS_LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+METRICS_PUSH_INTERVAL = 5.0
+
+# Database configuration; MCP_DB_FILE points a server (or a benchmark run)
+# at another database, with the semantic index and logs next to it
+DB_FILE = os.environ.get("MCP_DB_FILE") or os.path.join(Path.home(), ".mcp_terminal", "session_history.db")
 DB_DIR = os.path.dirname(DB_FILE)
 
+# SQLite tuning: WAL journal, NORMAL sync (durable at checkpoints), 64 MB
+# page cache and 256 MB memory-mapped I/O per connection
+DB_BUSY_TIMEOUT_MS = 5000
+DB_CACHE_SIZE_KB = 64000
+DB_MMAP_SIZE = 256 * 1024 * 1024
+DB_SYNCHRONOUS = "NORMAL"
+
+# Idle connections kept for reuse by request handlers
+DB_READ_POOL_SIZE = 8
+DB_WRITE_POOL_SIZE = 2
+
 # Ensure the directory exists
 if not os.path.exists(DB_DIR):
     os.makedirs(DB_DIR)
@@ -26,6 +60,112 @@ INDEXED_EXTENSIONS = [
     ".md", ".sh", ".bash", ".zsh", ".sql"
 ]
 
+# Files are split into function/class/block chunks of at most this many lines
+CHUNK_MAX_LINES = 80
+
+# Ingestion limits: files over INDEX_MAX_FILE_BYTES are never read, and the
+# first INDEX_SAMPLE_BYTES of the rest decide whether they're text worth
+# indexing: no NUL bytes, few control characters, average lines shorter than
+# INDEX_MINIFIED_LINE_LENGTH and no generated-code header in the first
+# INDEX_GENERATED_HEAD_LINES lines. Files over INDEX_MMAP_BYTES are
+# memory-mapped, so unchanged ones are hashed without being read into a
+# buffer; changed files are decoded in full, so the size cap is the real
+# bound on memory per file
+INDEX_MAX_FILE_BYTES = 1024 * 1024
+INDEX_SAMPLE_BYTES = 8192
+INDEX_MINIFIED_LINE_LENGTH = 500
+INDEX_MMAP_BYTES = 256 * 1024
+
+# Generated-code headers (multiline regexes), matched only on whole comment
+# or header lines so text merely mentioning generated code is kept; files
+# with these extensions are never treated as generated
+INDEX_GENERATED_HEAD_LINES = 20
+INDEX_GENERATED_PATTERNS = (
+    r"^// Code generated .* DO NOT EDIT\.\r?$",
+    r"^\s*(#|//|/?\*|--|<!--)\s*@generated\b",
+    r"(?i:^\s*(#|//|/?\*|--|<!--)\s*(this file (is|was|has been) )?(auto-?generated|automatically generated)\b)",
+    r"(?i:^-- (mysql|postgresql database) dump\b)"
+)
+INDEX_GENERATED_EXEMPT_EXTENSIONS = (".md",)
+
+# Indexing workers: threads read files, optional processes do the parsing
+# (0 keeps parsing in the reader threads)
+INDEX_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+INDEX_PARSE_PROCESSES = 0
+
+# Files waiting for an indexing worker; the project walk blocks when it's full
+INDEX_QUEUE_SIZE = 1000
+
+# Watch mode: deliver changes once the tree has been quiet for WATCH_DEBOUNCE
+# seconds (at most WATCH_MAX_DELAY after the first event); the polling
+# fallback used without inotify checks every WATCH_POLL_INTERVAL seconds
+WATCH_DEBOUNCE = 0.5
+WATCH_MAX_DELAY = 5.0
+WATCH_POLL_INTERVAL = 2.0
+
+# Index writer batching: commit after this many files or seconds, whichever
+# comes first, and as soon as the indexing queue goes idle
+INDEX_BATCH_SIZE = 500
+INDEX_BATCH_INTERVAL = 1.0
+INDEX_WRITER_IDLE = 0.2
+
+# Background command jobs: concurrently running jobs, jobs allowed to wait
+# for a worker, finished jobs kept for polling, and per-job defaults for the
+# wall-clock limit (seconds) and retained output (bytes)
+COMMAND_JOB_WORKERS = 4
+COMMAND_JOB_MAX_QUEUED = 32
+COMMAND_JOB_HISTORY = 200
+COMMAND_JOB_TIMEOUT = 30 * 60
+COMMAND_JOB_MAX_OUTPUT = 1024 * 1024
+
+# Command history outputs are stored zlib-compressed and deduplicated; outputs
+# longer than head + tail characters keep only their start and end
+COMMAND_OUTPUT_COMPRESSION_LEVEL = 6
+COMMAND_OUTPUT_HEAD_CHARS = 64 * 1024
+COMMAND_OUTPUT_TAIL_CHARS = 64 * 1024
+
+# Command history search: full-text candidates re-ranked per query, and the
+# age (days) at which a command's recency boost halves. Queries with only
+# tokens too short for the trigram index look at the newest
+# COMMAND_SHORT_QUERY_SCAN commands
+COMMAND_SEARCH_CANDIDATES = 100
+COMMAND_SHORT_QUERY_SCAN = 2000
+COMMAND_RECENCY_HALF_LIFE_DAYS = 14
+
+# /api/context/generate results are cached per normalized query and project
+# for up to CONTEXT_CACHE_TTL seconds, or until the index or history changes
+CONTEXT_CACHE_ENTRIES = 256
+CONTEXT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+CONTEXT_CACHE_TTL = 10 * 60
+
+# Generated context is packed into roughly this many tokens (estimated),
+# CONTEXT_CODE_SHARE of it for code; snippets that don't fit are trimmed
+# down to at least CONTEXT_MIN_ITEM_TOKENS or left out. Retrieval sources
+# run concurrently and are abandoned after CONTEXT_RETRIEVAL_TIMEOUT seconds
+CONTEXT_TOKEN_BUDGET = 3000
+CONTEXT_CODE_SHARE = 0.75
+CONTEXT_MIN_ITEM_TOKENS = 48
+CONTEXT_CODE_CANDIDATES = 10
+CONTEXT_COMMAND_CANDIDATES = 5
+CONTEXT_RETRIEVAL_TIMEOUT = 5.0
+
+# Semantic (TF-IDF) retrieval over indexed chunks, persisted here and
+# memory-mapped on startup. New chunks are picked up REFRESH_DELAY seconds
+# after the index writer commits (or within POLL_INTERVAL if another process
+# wrote); segments are merged and saved once COMPACT_RATIO of the saved
+# index has changed
+SEMANTIC_INDEX_DIR = os.path.join(DB_DIR, "semantic_index")
+SEMANTIC_REFRESH_DELAY = 1.0
+SEMANTIC_POLL_INTERVAL = 10.0
+SEMANTIC_COMPACT_RATIO = 0.25
+
+# How /api/context/generate ranks code: "fts" (keyword), "semantic"
+# (TF-IDF cosine) or "hybrid" (both, fused by rank)
+CONTEXT_RANKER = "hybrid"
+
+# @perf and /api/llm/stats summarize this many of the latest LLM requests
+LLM_STATS_WINDOW = 500
+
 # Ollama configuration
 OLLAMA_URL = "http://localhost:11434"
 DEFAULT_MODEL = "deepseek-coder:33b-instruct-q5_K_M"
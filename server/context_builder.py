@@ -0,0 +1,217 @@
+import re
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from .database import (
+    search_code, get_similar_commands, get_symbol_definitions, update_project_history,
+    resolve_project_ids, get_chunks
+)
+from .semantic_index import semantic_index
+from .metrics import observe_search
+from .config import (
+    CONTEXT_TOKEN_BUDGET, CONTEXT_CODE_SHARE, CONTEXT_MIN_ITEM_TOKENS,
+    CONTEXT_CODE_CANDIDATES, CONTEXT_COMMAND_CANDIDATES, CONTEXT_RETRIEVAL_TIMEOUT,
+    CONTEXT_RANKER
+)
+
+# Words in a query that could name a symbol, e.g. "where is parse_config used"
+QUERY_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+
+# Roughly one BPE token per short word, long identifier piece or symbol
+_TOKEN_RE = re.compile(r"\w{1,8}|[^\w\s]")
+
+# Code rankers: keyword (FTS5), semantic (TF-IDF cosine) or both
+RANKERS = ("fts", "semantic", "hybrid")
+
+# Reciprocal rank fusion constant; larger values flatten the top ranks
+_RRF_K = 60
+
+# Retrieval runs on these threads so the sources overlap
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="context")
+
+def estimate_tokens(text):
+    """Approximate the LLM token count of a text without a tokenizer."""
+    return len(_TOKEN_RE.findall(text)) if text else 0
+
+def _trim_lines(text, max_tokens, keep_tail=False):
+    """Cut text to about max_tokens on line boundaries, keeping its head (or tail)."""
+    lines = text.splitlines(keepends=True)
+    if keep_tail:
+        lines.reverse()
+
+    kept, used = [], 0
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if used + tokens > max_tokens:
+            if not kept:
+                # A single huge line; keep a proportional slice of it
+                share = max_tokens / max(tokens, 1)
+                cut = int(len(line) * share)
+                kept.append(line[len(line) - cut:] if keep_tail else line[:cut])
+            break
+        kept.append(line)
+        used += tokens
+
+    if keep_tail:
+        kept.reverse()
+    return "".join(kept)
+
+def _dedupe_snippets(snippets):
+    """Drop snippets overlapping a better one in the same file, or repeating its content."""
+    kept = []
+    ranges = {}
+    contents = set()
+    for snippet in snippets:
+        start, end = snippet.get("start_line") or 0, snippet.get("end_line") or 0
+        spans = ranges.setdefault(snippet["file_path"], [])
+        if any(start <= other_end and other_start <= end for other_start, other_end in spans):
+            continue
+
+        digest = hashlib.sha1(" ".join(snippet["content"].split()).encode("utf-8")).digest()
+        if digest in contents:
+            continue
+
+        spans.append((start, end))
+        contents.add(digest)
+        kept.append(snippet)
+    return kept
+
+def _pack(items, field, header, limit, keep_tail=False):
+    """Fit items into `limit` tokens in relevance order.
+
+    Each item costs its header plus its `field` text. Items that don't fit
+    are trimmed if at least CONTEXT_MIN_ITEM_TOKENS of them would remain,
+    and skipped otherwise; no single item takes more than half the limit.
+    """
+    packed, used = [], 0
+    item_cap = max(CONTEXT_MIN_ITEM_TOKENS, limit // 2)
+    for item in items:
+        header_tokens = estimate_tokens(header(item)) + 4
+        text = item.get(field) or ""
+        tokens = estimate_tokens(text)
+        room = min(limit - used - header_tokens, item_cap)
+
+        item = dict(item, truncated=False)
+        if tokens > room:
+            if room < CONTEXT_MIN_ITEM_TOKENS:
+                continue
+            item[field] = _trim_lines(text, room, keep_tail)
+            item["truncated"] = True
+            tokens = estimate_tokens(item[field])
+
+        item["tokens"] = header_tokens + tokens
+        used += item["tokens"]
+        packed.append(item)
+    return packed, used
+
+def _snippet_header(snippet):
+    return f"{snippet['file_path']}:{snippet.get('start_line')}-{snippet.get('end_line')} {snippet.get('kind')} {snippet.get('name')}"
+
+def _command_header(command):
+    return command.get("command", "")
+
+def pack_context(code_results, command_results, token_budget=CONTEXT_TOKEN_BUDGET):
+    """Pack retrieved snippets and commands into a token budget.
+
+    Commands get their share first and keep the end of their output, where
+    errors usually are; code gets whatever is left and keeps the start of
+    each chunk. Whatever code doesn't use goes back to commands that were
+    trimmed or dropped. Returns (snippets, commands, tokens_used).
+    """
+    snippets = _dedupe_snippets(code_results)
+    command_limit = token_budget - int(token_budget * CONTEXT_CODE_SHARE)
+
+    commands, command_tokens = _pack(command_results, "output", _command_header, command_limit, keep_tail=True)
+    snippets, code_tokens = _pack(snippets, "content", _snippet_header, token_budget - command_tokens)
+
+    # Code didn't use its full share; let trimmed or dropped commands have it
+    if (len(commands) < len(command_results) or any(c["truncated"] for c in commands)) \
+            and code_tokens + command_tokens < token_budget:
+        commands, command_tokens = _pack(
+            command_results, "output", _command_header, token_budget - code_tokens, keep_tail=True
+        )
+
+    return snippets, commands, code_tokens + command_tokens
+
+def rank_code(query, limit=10, project_ids=None, ranker=CONTEXT_RANKER):
+    """Search code with the keyword index, the semantic index, or both.
+
+    Hybrid results merge the two rankings by reciprocal rank fusion, so a
+    chunk both agree on beats one that tops only a single list. Without
+    NumPy/SciPy every ranker falls back to keyword search.
+    """
+    started = time.perf_counter()
+    if ranker == "fts" or not semantic_index.available:
+        results = search_code(query, limit, project_ids)
+        observe_search("code_fts", started, len(results))
+        return results
+
+    semantic = get_chunks(chunk_id for chunk_id, _ in semantic_index.search(query, limit, project_ids))
+    if ranker == "semantic":
+        observe_search("code_semantic", started, len(semantic))
+        return semantic
+
+    scores, snippets = {}, {}
+    for results in (search_code(query, limit, project_ids), semantic):
+        for rank, snippet in enumerate(results):
+            key = (snippet["file_path"], snippet["start_line"])
+            scores[key] = scores.get(key, 0.0) + 1.0 / (_RRF_K + rank)
+            snippets.setdefault(key, snippet)
+    results = [snippets[key] for key in sorted(scores, key=scores.get, reverse=True)[:limit]]
+    observe_search("code_hybrid", started, len(results))
+    return results
+
+def _timed_search(kind, search, *args):
+    started = time.perf_counter()
+    results = search(*args)
+    observe_search(kind, started, len(results))
+    return results
+
+def retrieve_context(query, project_path, ranker=CONTEXT_RANKER):
+    """Run symbol, code and command retrieval concurrently.
+
+    Returns (code_results, command_results, complete): definitions of
+    identifiers named in the query first, then the best matches by
+    `ranker`, both from the project containing project_path only. A source
+    that fails or takes longer than CONTEXT_RETRIEVAL_TIMEOUT contributes
+    nothing rather than holding up the response, and complete is False.
+    """
+    identifiers = QUERY_IDENTIFIER_RE.findall(query)[:10]
+    project_ids = resolve_project_ids(project_path)
+    sources = {
+        "definitions": _executor.submit(
+            _timed_search, "definitions", get_symbol_definitions, identifiers, 3, project_ids
+        ),
+        "code": _executor.submit(rank_code, query, CONTEXT_CODE_CANDIDATES, project_ids, ranker),
+        "commands": _executor.submit(
+            _timed_search, "commands", get_similar_commands, query, CONTEXT_COMMAND_CANDIDATES, True, project_path
+        )
+    }
+
+    # One deadline for all sources; whatever hasn't finished by then is left to run out
+    wait(sources.values(), timeout=CONTEXT_RETRIEVAL_TIMEOUT)
+    results = {}
+    complete = True
+    for name, future in sources.items():
+        if not future.done():
+            print(f"Context retrieval from {name} timed out")
+            results[name] = []
+            complete = False
+            continue
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            print(f"Error retrieving {name} context: {e}")
+            results[name] = []
+            complete = False
+    return results["definitions"] + results["code"], results["commands"], complete
+
+def _record_project(project_path):
+    try:
+        update_project_history(project_path)
+    except Exception as e:
+        print(f"Error updating project history: {e}")
+
+def record_project_async(project_path):
+    """Update project history in the background; nothing waits on it."""
+    _executor.submit(_record_project, project_path)
\ No newline at end of file
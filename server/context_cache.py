@@ -0,0 +1,102 @@
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from .config import CONTEXT_CACHE_ENTRIES, CONTEXT_CACHE_MAX_BYTES, CONTEXT_CACHE_TTL
+
+_PUNCTUATION_RE = re.compile(r"^[\s?!.,;:]+|[\s?!.,;:]+$")
+
+def normalize_query(query):
+    """Fold case, whitespace and surrounding punctuation so near-identical questions share an entry."""
+    return _PUNCTUATION_RE.sub("", " ".join(query.split()).lower())
+
+class ContextCache:
+    """LRU cache with a TTL and a memory bound for generated contexts.
+
+    Every entry records the data generation it was built from; once the
+    index or command history moves past it, the entry is treated as a miss
+    and dropped.
+    """
+
+    def __init__(self, max_entries=CONTEXT_CACHE_ENTRIES, max_bytes=CONTEXT_CACHE_MAX_BYTES,
+                 ttl=CONTEXT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()   # key -> (value, size, expires, generation)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, generation):
+        """Return the cached value for `key`, or None on a miss."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, _, expires, entry_generation = entry
+            if entry_generation != generation:
+                self.invalidations += 1
+            elif expires < time.time():
+                self.expirations += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+            self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, value, generation):
+        """Cache a value built from data at `generation`."""
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, size, time.time() + self.ttl, generation)
+            self.total_bytes += size
+
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def get_stats(self):
+        """Get hit/miss statistics."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl
+            }
+
+    def _remove(self, key):
+        _, size, _, _ = self.entries.pop(key)
+        self.total_bytes -= size
+
+# Global context cache instance
+context_cache = ContextCache()
\ No newline at end of file
@@ -1,23 +1,116 @@
 import sqlite3
 import os
+import re
 import time
+import math
+import zlib
+import hashlib
+from contextlib import contextmanager
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
-from .config import DB_FILE, DB_DIR
+from queue import LifoQueue, Empty, Full
+from .config import (
+    DB_FILE, DB_DIR, DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE,
+    DB_SYNCHRONOUS, DB_READ_POOL_SIZE, DB_WRITE_POOL_SIZE,
+    COMMAND_OUTPUT_COMPRESSION_LEVEL, COMMAND_OUTPUT_HEAD_CHARS, COMMAND_OUTPUT_TAIL_CHARS,
+    COMMAND_SEARCH_CANDIDATES, COMMAND_SHORT_QUERY_SCAN, COMMAND_RECENCY_HALF_LIFE_DAYS, LLM_STATS_WINDOW
+)
 
-def get_db_connection():
-    """Get a connection to the SQLite database."""
+def _connect(readonly=False):
+    """Open a connection with the performance pragmas applied."""
     if not os.path.exists(DB_DIR):
         os.makedirs(DB_DIR)
     
-    conn = sqlite3.connect(DB_FILE)
+    if readonly:
+        conn = sqlite3.connect(
+            f"file:{DB_FILE}?mode=ro", uri=True,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False
+        )
+    else:
+        conn = sqlite3.connect(
+            DB_FILE, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False
+        )
     conn.row_factory = sqlite3.Row
+    
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}")
+    conn.execute(f"PRAGMA cache_size = -{int(DB_CACHE_SIZE_KB)}")
+    conn.execute(f"PRAGMA mmap_size = {int(DB_MMAP_SIZE)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        # synchronous is per connection; journal_mode persists in the file
+        conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    
     return conn
 
+def get_db_connection():
+    """Open a new tuned connection to the SQLite database.
+    
+    The caller owns and closes it. Short-lived work should borrow a pooled
+    connection through db_connection() instead.
+    """
+    return _connect()
+
+class ConnectionPool:
+    """Keeps a bounded number of idle connections for reuse across threads."""
+    
+    def __init__(self, readonly, size):
+        self.readonly = readonly
+        self.idle = LifoQueue(maxsize=size)
+    
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except Empty:
+            return _connect(self.readonly)
+    
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self.idle.put_nowait(conn)
+        except Full:
+            conn.close()
+    
+    def close_all(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except Empty:
+                break
+
+# Readers use read-only connections; with WAL they never wait on writers
+_pools = {
+    True: ConnectionPool(readonly=True, size=DB_READ_POOL_SIZE),
+    False: ConnectionPool(readonly=False, size=DB_WRITE_POOL_SIZE),
+}
+
+@contextmanager
+def db_connection(readonly=False):
+    """Borrow a pooled connection, committing on success for writers."""
+    pool = _pools[readonly]
+    conn = pool.acquire()
+    try:
+        yield conn
+        if not readonly:
+            conn.commit()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        pool.release(conn)
+
 def init_db():
     """Initialize the database with the required tables."""
     conn = get_db_connection()
     c = conn.cursor()
     
+    # WAL lets searches read while the indexer writes; the mode is persistent
+    c.execute("PRAGMA journal_mode = WAL")
+    
     # Command history table
     c.execute('''
     CREATE TABLE IF NOT EXISTS command_history (
@@ -30,18 +123,277 @@ def init_db():
     )
     ''')
     
+    # Outputs live compressed in a content-addressed table so identical
+    # outputs are stored once; command_history only keeps the hash
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS command_outputs (
+        hash TEXT PRIMARY KEY,
+        codec TEXT NOT NULL,
+        data BLOB NOT NULL,
+        size INTEGER,
+        original_size INTEGER
+    ) WITHOUT ROWID
+    ''')
+    
+    c.execute("PRAGMA table_info(command_history)")
+    if "output_hash" not in [row['name'] for row in c.fetchall()]:
+        c.execute("ALTER TABLE command_history ADD COLUMN output_hash TEXT")
+    
+    # Latest-N history listings walk this index instead of sorting
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_command_history_timestamp ON command_history (timestamp)"
+    )
+    
+    # One row per distinct (command, working_dir) with run counts, kept up
+    # to date by a trigger; history search ranks these instead of every run
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'command_stats'")
+    command_stats_exist = c.fetchone() is not None
+    
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS command_stats (
+        id INTEGER PRIMARY KEY,
+        command TEXT NOT NULL,
+        working_dir TEXT NOT NULL,
+        run_count INTEGER NOT NULL,
+        success_count INTEGER NOT NULL,
+        last_id INTEGER,
+        last_timestamp DATETIME,
+        UNIQUE (command, working_dir)
+    )
+    ''')
+    
+    c.execute("CREATE INDEX IF NOT EXISTS idx_command_stats_last ON command_stats (last_id)")
+    
+    c.execute('''
+    CREATE TRIGGER IF NOT EXISTS command_history_stats_ai AFTER INSERT ON command_history BEGIN
+        INSERT INTO command_stats (command, working_dir, run_count, success_count, last_id, last_timestamp)
+        VALUES (new.command, COALESCE(new.working_dir, ''), 1, new.exit_code IS 0, new.id, new.timestamp)
+        ON CONFLICT (command, working_dir) DO UPDATE SET
+            run_count = run_count + 1,
+            success_count = success_count + excluded.success_count,
+            last_id = excluded.last_id,
+            last_timestamp = excluded.last_timestamp;
+    END
+    ''')
+    
+    # Trigram index over distinct commands, keyed by their latest run so the
+    # newest matches stream straight out of it; the trigger moves an entry
+    # whenever its command runs again
+    c.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS command_stats_fts USING fts5(
+        command,
+        content='',
+        tokenize='trigram'
+    )
+    ''')
+    
+    c.execute('''
+    CREATE TRIGGER IF NOT EXISTS command_stats_ai AFTER INSERT ON command_stats BEGIN
+        INSERT INTO command_stats_fts (rowid, command) VALUES (new.last_id, new.command);
+    END
+    ''')
+    
+    c.execute('''
+    CREATE TRIGGER IF NOT EXISTS command_stats_au AFTER UPDATE OF last_id ON command_stats BEGIN
+        INSERT INTO command_stats_fts (command_stats_fts, rowid, command)
+        VALUES ('delete', old.last_id, old.command);
+        INSERT INTO command_stats_fts (rowid, command) VALUES (new.last_id, new.command);
+    END
+    ''')
+    
+    if not command_stats_exist:
+        c.execute('''
+        INSERT INTO command_stats (command, working_dir, run_count, success_count, last_id, last_timestamp)
+        SELECT command, COALESCE(working_dir, ''), COUNT(*), SUM(exit_code IS 0), MAX(id), MAX(timestamp)
+        FROM command_history
+        GROUP BY command, COALESCE(working_dir, '')
+        ''')
+    
+    # Move outputs logged before compression into the blob table, a batch
+    # at a time so huge histories never have to fit in memory
+    while True:
+        c.execute(
+            "SELECT id, output FROM command_history WHERE output IS NOT NULL ORDER BY id LIMIT 100"
+        )
+        rows = c.fetchall()
+        if not rows:
+            break
+        for row in rows:
+            output_hash = _store_output(c, row['output'])
+            c.execute(
+                "UPDATE command_history SET output = NULL, output_hash = ? WHERE id = ?",
+                (output_hash, row['id'])
+            )
+        conn.commit()
+    
+    # Indexed project roots; every indexed file belongs to one of them
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS projects (
+        id INTEGER PRIMARY KEY,
+        root_path TEXT NOT NULL UNIQUE,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        last_indexed DATETIME
+    )
+    ''')
+    
+    # The code index from before project scoping has no project column and
+    # may hold duplicate rows; it is dropped (taking its triggers along) and
+    # rebuilt as projects are indexed again
+    c.execute("PRAGMA table_info(code_index)")
+    code_index_columns = [row['name'] for row in c.fetchall()]
+    if code_index_columns and "project_id" not in code_index_columns:
+        for table in ("code_chunks_fts", "code_chunks", "symbols", "code_index"):
+            c.execute(f"DROP TABLE IF EXISTS {table}")
+        c.execute("DROP INDEX IF EXISTS idx_code_index_path")
+    
     # Code index table
     c.execute('''
     CREATE TABLE IF NOT EXISTS code_index (
         id INTEGER PRIMARY KEY,
+        project_id INTEGER NOT NULL,
         file_path TEXT NOT NULL,
         content TEXT,
         language TEXT,
         last_modified DATETIME,
-        size INTEGER
+        size INTEGER,
+        content_hash TEXT,
+        UNIQUE (project_id, file_path)
     )
     ''')
     
+    # Covering index so change detection never touches file contents
+    c.execute('''
+    CREATE INDEX IF NOT EXISTS idx_code_index_project
+    ON code_index (project_id, file_path, last_modified, size, content_hash)
+    ''')
+    
+    # Searchable function/class/block chunks of each indexed file
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS code_chunks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        file_path TEXT NOT NULL,
+        language TEXT,
+        kind TEXT,
+        name TEXT,
+        start_line INTEGER,
+        end_line INTEGER,
+        content TEXT
+    )
+    ''')
+    
+    c.execute("CREATE INDEX IF NOT EXISTS idx_code_chunks_path ON code_chunks (project_id, file_path)")
+    
+    # Chunks are replaced wholesale whenever their file changes or goes away
+    c.execute('''
+    CREATE TRIGGER IF NOT EXISTS code_index_chunks_ad AFTER DELETE ON code_index BEGIN
+        DELETE FROM code_chunks WHERE project_id = old.project_id AND file_path = old.file_path;
+    END
+    ''')
+    
+    c.execute('''
+    CREATE TRIGGER IF NOT EXISTS code_index_chunks_au AFTER UPDATE OF content ON code_index BEGIN
+        DELETE FROM code_chunks WHERE project_id = old.project_id AND file_path = old.file_path;
+    END
+    ''')
+    
+    # Full-text index over the chunks, kept in sync by the triggers below
+    c.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS code_chunks_fts USING fts5(
+        file_path,
+        name,
+        content,
+        content='code_chunks',
+        content_rowid='id'
+    )
+    ''')
+    
+    c.execute('''
+    CREATE TRIGGER IF NOT EXISTS code_chunks_ai AFTER INSERT ON code_chunks BEGIN
+        INSERT INTO code_chunks_fts (rowid, file_path, name, content)
+        VALUES (new.id, new.file_path, new.name, new.content);
+    END
+    ''')
+    
+    c.execute('''
+    CREATE TRIGGER IF NOT EXISTS code_chunks_ad AFTER DELETE ON code_chunks BEGIN
+        INSERT INTO code_chunks_fts (code_chunks_fts, rowid, file_path, name, content)
+        VALUES ('delete', old.id, old.file_path, old.name, old.content);
+    END
+    ''')
+    
+    # Deleted chunk ids in deletion order, so the semantic index only has to
+    # mask those; it prunes the rows it no longer needs when it compacts
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS deleted_chunks (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        chunk_id INTEGER NOT NULL
+    )
+    ''')
+    
+    c.execute('''
+    CREATE TRIGGER IF NOT EXISTS code_chunks_deleted AFTER DELETE ON code_chunks BEGIN
+        INSERT INTO deleted_chunks (chunk_id) VALUES (old.id);
+    END
+    ''')
+    
+    # Symbol definitions and references, looked up by name
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS symbols (
+        id INTEGER PRIMARY KEY,
+        project_id INTEGER NOT NULL,
+        file_path TEXT NOT NULL,
+        name TEXT NOT NULL,
+        kind TEXT,
+        role TEXT NOT NULL,
+        line INTEGER
+    )
+    ''')
+    
+    c.execute("CREATE INDEX IF NOT EXISTS idx_symbols_name ON symbols (name, role, project_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_symbols_path ON symbols (project_id, file_path)")
+    
+    c.execute('''
+    CREATE TRIGGER IF NOT EXISTS code_index_symbols_ad AFTER DELETE ON code_index BEGIN
+        DELETE FROM symbols WHERE project_id = old.project_id AND file_path = old.file_path;
+    END
+    ''')
+    
+    c.execute('''
+    CREATE TRIGGER IF NOT EXISTS code_index_symbols_au AFTER UPDATE OF content ON code_index BEGIN
+        DELETE FROM symbols WHERE project_id = old.project_id AND file_path = old.file_path;
+    END
+    ''')
+    
+    # Whole-file full-text index from before chunking; chunks replace it
+    c.execute("DROP TRIGGER IF EXISTS code_index_ai")
+    c.execute("DROP TRIGGER IF EXISTS code_index_ad")
+    c.execute("DROP TRIGGER IF EXISTS code_index_au")
+    c.execute("DROP TABLE IF EXISTS code_index_fts")
+    
+    # Generation counters bumped on every change to indexed code or command
+    # history; caches compare them to notice their results went stale, even
+    # when another process made the change
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS data_generation (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    ''')
+    c.execute("INSERT OR IGNORE INTO data_generation (name, value) VALUES ('code', 0), ('commands', 0)")
+    
+    for trigger, event, table, name in (
+        ("code_index_generation_ai", "INSERT", "code_index", "code"),
+        ("code_index_generation_au", "UPDATE OF content", "code_index", "code"),
+        ("code_index_generation_ad", "DELETE", "code_index", "code"),
+        ("command_history_generation_ai", "INSERT", "command_history", "commands"),
+    ):
+        c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON {table} BEGIN
+            UPDATE data_generation SET value = value + 1 WHERE name = '{name}';
+        END
+        ''')
+    
     # Project history table
     c.execute('''
     CREATE TABLE IF NOT EXISTS project_history (
@@ -51,121 +403,742 @@ def init_db():
     )
     ''')
     
+    # LLM request timings reported by clients; Ollama's own counters where given
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS llm_requests (
+        id INTEGER PRIMARY KEY,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        model TEXT NOT NULL,
+        stream INTEGER,
+        connect_seconds REAL,
+        first_token_seconds REAL,
+        total_seconds REAL,
+        load_seconds REAL,
+        prompt_eval_seconds REAL,
+        prompt_tokens INTEGER,
+        completion_tokens INTEGER,
+        tokens_per_second REAL,
+        prompt_chars INTEGER,
+        context_chars INTEGER,
+        context_tokens INTEGER
+    )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_llm_requests_model ON llm_requests (model, id)")
+    
     conn.commit()
     conn.close()
     
     print(f"Database initialized at {DB_FILE}")
 
+def _retain_output(output):
+    """Keep the head and tail of an oversized output, marking what was cut."""
+    head, tail = COMMAND_OUTPUT_HEAD_CHARS, COMMAND_OUTPUT_TAIL_CHARS
+    if len(output) <= head + tail:
+        return output
+    omitted = len(output) - head - tail
+    return f"{output[:head]}\n... [{omitted} characters omitted] ...\n{output[len(output) - tail:]}"
+
+def _store_output(c, output):
+    """Compress an output into command_outputs and return its hash.
+    
+    Identical outputs share one row; empty outputs aren't stored at all.
+    """
+    if not output:
+        return None
+    
+    original_size = len(output)
+    encoded = _retain_output(output).encode("utf-8", errors="replace")
+    output_hash = hashlib.sha1(encoded).hexdigest()
+    
+    c.execute("SELECT 1 FROM command_outputs WHERE hash = ?", (output_hash,))
+    if c.fetchone() is None:
+        c.execute(
+            "INSERT INTO command_outputs (hash, codec, data, size, original_size) VALUES (?, ?, ?, ?, ?)",
+            (output_hash, "zlib", zlib.compress(encoded, COMMAND_OUTPUT_COMPRESSION_LEVEL),
+             len(encoded), original_size)
+        )
+    return output_hash
+
+def _load_output(codec, data):
+    """Decompress a stored output."""
+    if data is None:
+        return ""
+    if codec == "zlib":
+        data = zlib.decompress(data)
+    return data.decode("utf-8", errors="replace")
+
 def log_command(command, output, working_dir, exit_code=0):
     """Log a command and its output to the database."""
-    conn = get_db_connection()
-    c = conn.cursor()
+    with db_connection() as conn:
+        c = conn.cursor()
+        
+        output_hash = _store_output(c, output)
+        c.execute(
+            "INSERT INTO command_history (command, working_dir, exit_code, output_hash) VALUES (?, ?, ?, ?)",
+            (command, working_dir, exit_code, output_hash)
+        )
     
-    c.execute(
-        "INSERT INTO command_history (command, output, working_dir, exit_code) VALUES (?, ?, ?, ?)",
-        (command, output, working_dir, exit_code)
-    )
+    return True
+
+# History queries split on whitespace only; commands are full of punctuation
+_HISTORY_TOKEN_RE = re.compile(r"\S+")
+
+def _trigram_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+def _trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _command_candidates(c, tokens):
+    """Find the newest (command, working_dir) stats rows matching the query.
     
-    conn.commit()
-    conn.close()
+    Returns (row, fuzzy) pairs: rows containing every token come first; if
+    there are too few, rows sharing any trigram with the tokens are added.
+    """
+    long_tokens = [token for token in tokens if len(token) >= 3]
+    short_tokens = [token.lower() for token in tokens if len(token) < 3]
+    columns = "s.command, s.working_dir, s.run_count, s.success_count, s.last_id, " \
+        "julianday('now') - julianday(s.last_timestamp) AS age_days"
     
-    return True
+    def newest_matching(match, exclude=()):
+        c.execute(
+            f'''
+            SELECT {columns} FROM (
+                SELECT rowid FROM command_stats_fts WHERE command_stats_fts MATCH ?
+                ORDER BY rowid DESC LIMIT ?
+            ) m JOIN command_stats s ON s.last_id = m.rowid
+            ''',
+            (match, COMMAND_SEARCH_CANDIDATES + len(exclude))
+        )
+        return [row for row in c.fetchall() if row['last_id'] not in exclude]
+    
+    if long_tokens:
+        rows = newest_matching(" AND ".join(_trigram_phrase(token) for token in long_tokens))
+    else:
+        # Too short for the trigram index; only the newest commands are scanned
+        c.execute(
+            f'''
+            SELECT {columns} FROM (
+                SELECT * FROM command_stats ORDER BY last_id DESC LIMIT ?
+            ) s WHERE s.command LIKE ? ORDER BY s.last_id DESC LIMIT ?
+            ''',
+            (COMMAND_SHORT_QUERY_SCAN, f"%{short_tokens[0]}%", COMMAND_SEARCH_CANDIDATES)
+        )
+        rows = c.fetchall()
+    
+    candidates = [
+        (row, False) for row in rows
+        if all(token in row['command'].lower() for token in short_tokens)
+    ]
+    if len(candidates) >= COMMAND_SEARCH_CANDIDATES // 4 or not long_tokens:
+        return candidates
+    
+    trigrams = set().union(*(_trigrams(token) for token in long_tokens))
+    found = {row['last_id'] for row, _ in candidates}
+    fuzzy = newest_matching(" OR ".join(_trigram_phrase(t) for t in sorted(trigrams)), found)
+    candidates.extend((row, True) for row in fuzzy)
+    return candidates
 
-def get_similar_commands(query, limit=5):
-    """Get commands similar to the given query."""
-    conn = get_db_connection()
-    c = conn.cursor()
+def _rank_commands(candidates, query, working_dir=None):
+    """Score candidate commands and return (score, stats) best first.
     
-    # Using LIKE for simple pattern matching
-    c.execute(
-        "SELECT command, output FROM command_history WHERE command LIKE ? ORDER BY timestamp DESC LIMIT ?",
-        (f'%{query}%', limit)
-    )
+    Rows for the same command in different directories are merged. The
+    score mixes text similarity (shared trigrams for fuzzy matches,
+    favouring commands close to the query's length) with how often and how recently the command
+    ran, whether it usually succeeds, and how much of that happened in (or
+    below) the working directory.
+    """
+    if not candidates:
+        return []
     
-    rows = c.fetchall()
-    conn.close()
+    query_text = " ".join(query.split()).lower()
+    query_trigrams = _trigrams(query_text.replace(" ", ""))
+    
+    commands = {}
+    for row, fuzzy in candidates:
+        entry = commands.get(row['command'])
+        if entry is None:
+            command = row['command'].lower()
+            if fuzzy and query_trigrams:
+                similarity = len(query_trigrams & _trigrams(command.replace(" ", ""))) / len(query_trigrams)
+            else:
+                similarity = 1.0
+            entry = commands[row['command']] = {
+                "relevance": similarity * (0.75 + 0.25 * min(1.0, len(query_text) / max(len(command), 1))),
+                "runs": 0, "successes": 0, "dir_runs": 0, "last_id": 0, "age_days": None
+            }
+        
+        entry["runs"] += row['run_count']
+        entry["successes"] += row['success_count']
+        age = max(row['age_days'] or 0.0, 0.0)
+        entry["age_days"] = age if entry["age_days"] is None else min(entry["age_days"], age)
+        entry["last_id"] = max(entry["last_id"], row['last_id'] or 0)
+        if working_dir and (row['working_dir'] + os.sep).startswith(working_dir.rstrip(os.sep) + os.sep):
+            entry["dir_runs"] += row['run_count']
+    
+    max_runs = max(entry["runs"] for entry in commands.values())
+    ranked = []
+    for entry in commands.values():
+        score = (
+            entry["relevance"]
+            + 0.3 * math.log1p(entry["runs"]) / math.log1p(max_runs)
+            + 0.3 * 0.5 ** (entry["age_days"] / COMMAND_RECENCY_HALF_LIFE_DAYS)
+            + 0.2 * entry["dir_runs"] / entry["runs"]
+            + 0.2 * entry["successes"] / entry["runs"]
+        )
+        ranked.append((score, entry))
+    
+    ranked.sort(key=lambda item: (item[0], item[1]["last_id"]), reverse=True)
+    return ranked
+
+def get_similar_commands(query, limit=5, include_output=True, working_dir=None):
+    """Get commands similar to the given query, best first.
+    
+    Each distinct command appears once, represented by its latest run. An
+    empty query lists the latest runs straight off the timestamp index.
+    Outputs are only decompressed for the returned rows, and not at all
+    without include_output.
+    """
+    output_columns = ", o.codec, o.data" if include_output else ""
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        
+        tokens = _HISTORY_TOKEN_RE.findall(query or "")
+        if not tokens:
+            c.execute(
+                f'''
+                SELECT h.id, h.command, h.exit_code, h.timestamp, h.working_dir,
+                       o.size AS output_size {output_columns}
+                FROM command_history h
+                LEFT JOIN command_outputs o ON o.hash = h.output_hash
+                ORDER BY h.timestamp DESC, h.id DESC
+                LIMIT ?
+                ''',
+                (limit,)
+            )
+            rows = c.fetchall()
+            run_counts = {}
+        else:
+            ranked = _rank_commands(_command_candidates(c, tokens), query, working_dir)[:limit]
+            run_counts = {entry["last_id"]: (score, entry["runs"]) for score, entry in ranked}
+            rows = []
+            if ranked:
+                c.execute(
+                    f'''
+                    SELECT h.id, h.command, h.exit_code, h.timestamp, h.working_dir,
+                           o.size AS output_size {output_columns}
+                    FROM command_history h
+                    LEFT JOIN command_outputs o ON o.hash = h.output_hash
+                    WHERE h.id IN ({','.join('?' * len(run_counts))})
+                    ''',
+                    list(run_counts)
+                )
+                by_id = {row['id']: row for row in c.fetchall()}
+                rows = [by_id[last_id] for last_id in run_counts if last_id in by_id]
+    
+    results = []
+    for row in rows:
+        result = dict(row)
+        if row['id'] in run_counts:
+            score, runs = run_counts[row['id']]
+            result["score"] = round(score, 4)
+            result["run_count"] = runs
+        if include_output:
+            result["output"] = _load_output(result.pop("codec"), result.pop("data"))
+        results.append(result)
+    return results
+
+def get_command_output(command_id):
+    """Get the stored output of one logged command, or None if unknown."""
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        
+        c.execute(
+            '''
+            SELECT o.codec, o.data FROM command_history h
+            LEFT JOIN command_outputs o ON o.hash = h.output_hash
+            WHERE h.id = ?
+            ''',
+            (command_id,)
+        )
+        
+        row = c.fetchone()
+    
+    return _load_output(row['codec'], row['data']) if row else None
+
+def register_project(root_path):
+    """Get the id of an indexed project root, creating it if needed, and mark it indexed now."""
+    root_path = os.path.abspath(root_path)
+    with db_connection() as conn:
+        c = conn.cursor()
+        
+        c.execute(
+            """
+            INSERT INTO projects (root_path, last_indexed) VALUES (?, CURRENT_TIMESTAMP)
+            ON CONFLICT (root_path) DO UPDATE SET last_indexed = CURRENT_TIMESTAMP
+            """,
+            (root_path,)
+        )
+        c.execute("SELECT id FROM projects WHERE root_path = ?", (root_path,))
+        return c.fetchone()['id']
+
+def get_project(root_path):
+    """Get the indexed project with exactly this root, or None."""
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, root_path FROM projects WHERE root_path = ?", (os.path.abspath(root_path),))
+        row = c.fetchone()
+    return dict(row) if row else None
+
+def resolve_project_ids(path):
+    """Get the ids of the indexed projects a path refers to.
+    
+    That is the nearest indexed project containing the path, or failing
+    that every indexed project below it (e.g. a directory of checkouts).
+    """
+    path = os.path.abspath(path)
+    ancestors = [path]
+    while os.path.dirname(ancestors[-1]) != ancestors[-1]:
+        ancestors.append(os.path.dirname(ancestors[-1]))
+    
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        
+        c.execute(
+            f"""
+            SELECT id FROM projects WHERE root_path IN ({','.join('?' * len(ancestors))})
+            ORDER BY length(root_path) DESC LIMIT 1
+            """,
+            ancestors
+        )
+        row = c.fetchone()
+        if row:
+            return [row['id']]
+        
+        prefix = os.path.join(path, "")
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        c.execute("SELECT id FROM projects WHERE root_path >= ? AND root_path < ?", (prefix, upper))
+        return [row['id'] for row in c.fetchall()]
+
+def list_projects():
+    """Get every indexed project with its file count."""
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        
+        c.execute(
+            """
+            SELECT p.id, p.root_path, p.created_at, p.last_indexed,
+                   (SELECT COUNT(*) FROM code_index WHERE project_id = p.id) AS files
+            FROM projects p ORDER BY p.root_path
+            """
+        )
+        
+        rows = c.fetchall()
     
     return [dict(row) for row in rows]
 
-def add_code_file(file_path, content, language):
-    """Add or update a code file in the index."""
-    file_stats = os.stat(file_path)
+def add_code_file(project_id, file_path, content, language, content_hash=None, file_stats=None, chunks=(), symbols=()):
+    """Add or update a code file, its chunks and its symbols in a project's index."""
+    if file_stats is None:
+        file_stats = os.stat(file_path)
     
-    conn = get_db_connection()
-    c = conn.cursor()
+    with db_connection() as conn:
+        c = conn.cursor()
+        
+        # Update in place so old chunks and symbols are cleared by triggers
+        c.execute(
+            _CODE_BATCH_SQL["update"],
+            (content, language, file_stats.st_mtime, file_stats.st_size, content_hash, project_id, file_path)
+        )
+        
+        if c.rowcount == 0:
+            c.execute(
+                _CODE_BATCH_SQL["insert"],
+                (project_id, file_path, content, language, file_stats.st_mtime, file_stats.st_size, content_hash)
+            )
+        
+        c.executemany(_CODE_BATCH_SQL["chunk"], [chunk_row(project_id, file_path, language, chunk) for chunk in chunks])
+        c.executemany(_CODE_BATCH_SQL["symbol"], [symbol_row(project_id, file_path, symbol) for symbol in symbols])
     
-    c.execute(
-        """
-        INSERT OR REPLACE INTO code_index 
-        (file_path, content, language, last_modified, size) 
-        VALUES (?, ?, ?, ?, ?)
-        """,
-        (file_path, content, language, file_stats.st_mtime, file_stats.st_size)
+    return True
+
+def symbol_row(project_id, file_path, symbol):
+    """Parameters for inserting one symbol from code_parser.analyze_file()."""
+    return (project_id, file_path, symbol["name"], symbol["kind"], symbol["role"], symbol["line"])
+
+def chunk_row(project_id, file_path, language, chunk):
+    """Parameters for inserting one chunk from code_parser.chunk_file()."""
+    return (
+        project_id, file_path, language, chunk["kind"], chunk["name"],
+        chunk["start_line"], chunk["end_line"], chunk["content"]
     )
+
+# Statements for write_code_batch, keyed by operation
+_CODE_BATCH_SQL = {
+    "insert": """
+        INSERT INTO code_index
+        (project_id, file_path, content, language, last_modified, size, content_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+    "update": """
+        UPDATE code_index
+        SET content = ?, language = ?, last_modified = ?, size = ?, content_hash = ?
+        WHERE project_id = ? AND file_path = ?
+    """,
+    "touch": "UPDATE code_index SET last_modified = ?, size = ? WHERE project_id = ? AND file_path = ?",
+    "remove": "DELETE FROM code_index WHERE project_id = ? AND file_path = ?",
+    "chunk": """
+        INSERT INTO code_chunks
+        (project_id, file_path, language, kind, name, start_line, end_line, content)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+    "symbol": "INSERT INTO symbols (project_id, file_path, name, kind, role, line) VALUES (?, ?, ?, ?, ?, ?)",
+    # Dropping a project: one indexed delete per table, children first so
+    # the per-file triggers on code_index find nothing left to do
+    "drop_symbols": "DELETE FROM symbols WHERE project_id = ?",
+    "drop_chunks": "DELETE FROM code_chunks WHERE project_id = ?",
+    "drop_files": "DELETE FROM code_index WHERE project_id = ?",
+    "drop_project": "DELETE FROM projects WHERE id = ?",
+}
+
+# Operations, in order, that remove a project and everything indexed in it
+DROP_PROJECT_OPERATIONS = ("drop_symbols", "drop_chunks", "drop_files", "drop_project")
+
+def write_code_batch(conn, operations):
+    """Apply a batch of (operation, params) index writes on an open connection.
     
-    conn.commit()
-    conn.close()
+    Chunk and symbol rows must follow the insert/update of their file, since
+    updating a file's content clears its old chunks and symbols. Consecutive operations of the same kind go through one executemany call.
+    The caller owns the transaction and commits.
+    """
+    c = conn.cursor()
+    for operation, group in groupby(operations, key=itemgetter(0)):
+        c.executemany(_CODE_BATCH_SQL[operation], [params for _, params in group])
     
     return True
 
-def search_code(query, limit=10):
-    """Search the code index for the given query."""
-    conn = get_db_connection()
-    c = conn.cursor()
+def drop_project(project_id):
+    """Remove a project and everything indexed in it."""
+    with db_connection() as conn:
+        write_code_batch(conn, [(operation, (project_id,)) for operation in DROP_PROJECT_OPERATIONS])
     
-    c.execute(
-        """
-        SELECT file_path, content, language 
-        FROM code_index 
-        WHERE content LIKE ? 
-        LIMIT ?
-        """,
-        (f'%{query}%', limit)
-    )
+    return True
+
+def get_indexed_files(project_id, directory=None):
+    """Get stored stat data and hashes for a project's indexed files, optionally only under a directory."""
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        
+        sql = "SELECT file_path, last_modified, size, content_hash FROM code_index WHERE project_id = ?"
+        params = [project_id]
+        if directory is not None:
+            # Range scan on the covering index instead of LIKE, which can't use it
+            prefix = os.path.join(directory, "")
+            upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            sql += " AND file_path >= ? AND file_path < ?"
+            params += [prefix, upper]
+        
+        c.execute(sql, params)
+        rows = c.fetchall()
     
-    rows = c.fetchall()
-    conn.close()
+    return {row['file_path']: dict(row) for row in rows}
+
+def get_indexed_file_rows(project_id, file_paths, batch_size=500):
+    """Get stored stat data and hashes for specific files of a project."""
+    file_paths = list(file_paths)
+    stored = {}
     
-    return [dict(row) for row in rows]
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(file_paths), batch_size):
+            batch = file_paths[start:start + batch_size]
+            c.execute(
+                f"""
+                SELECT file_path, last_modified, size, content_hash
+                FROM code_index
+                WHERE project_id = ? AND file_path IN ({','.join('?' * len(batch))})
+                """,
+                [project_id] + batch
+            )
+            stored.update((row['file_path'], dict(row)) for row in c.fetchall())
+    
+    return stored
 
-def update_project_history(project_path):
-    """Update the last access time for a project."""
-    conn = get_db_connection()
-    c = conn.cursor()
+# Quoted phrases or bare terms, e.g. `"open file" parse_conf*`
+_FTS_TERM_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+def build_fts_query(query, operator="AND"):
+    """Translate a free-text query into an FTS5 MATCH expression.
     
-    # Check if project exists
-    c.execute("SELECT id FROM project_history WHERE project_path = ?", (project_path,))
-    project = c.fetchone()
+    Quoted text is matched as a phrase and a trailing '*' marks a prefix term.
+    Every term is quoted so punctuation in code (dots, parens, operators)
+    can't be misread as FTS5 syntax.
+    """
+    terms = []
+    for phrase, word in _FTS_TERM_RE.findall(query or ""):
+        text = phrase or word
+        prefix = False
+        if word and word.endswith("*"):
+            text = word.rstrip("*")
+            prefix = True
+        
+        # Terms without any word characters produce no tokens
+        if not re.search(r"\w", text):
+            continue
+        
+        term = '"' + text.replace('"', '""') + '"'
+        terms.append(term + "*" if prefix else term)
+    
+    return f" {operator} ".join(terms)
+
+# Columns returned for each code search hit
+CHUNK_FIELDS = ("file_path", "language", "kind", "name", "start_line", "end_line", "content")
+
+def _project_filter(column, project_ids):
+    """SQL condition and parameters limiting a query to some projects (None means all)."""
+    if project_ids is None:
+        return "1", []
+    return f"{column} IN ({','.join('?' * len(project_ids))})", list(project_ids)
+
+def _search_code_fts(c, match, limit, exclude_ids=(), project_ids=None):
+    """Run a ranked FTS5 query against the indexed chunks."""
+    # bm25 weights: symbol names count most, then paths, then chunk bodies
+    project_condition, project_params = _project_filter("code_chunks.project_id", project_ids)
+    sql = f"""
+        SELECT code_chunks.id, {', '.join('code_chunks.' + field for field in CHUNK_FIELDS)}
+        FROM code_chunks_fts
+        JOIN code_chunks ON code_chunks.id = code_chunks_fts.rowid
+        WHERE code_chunks_fts MATCH ? AND {project_condition}
+    """
+    params = [match] + project_params
+    if exclude_ids:
+        sql += f" AND code_chunks.id NOT IN ({','.join('?' * len(exclude_ids))})"
+        params.extend(exclude_ids)
+    sql += " ORDER BY bm25(code_chunks_fts, 2.0, 4.0, 1.0) LIMIT ?"
+    params.append(limit)
     
-    if project:
-        # Update existing project
+    c.execute(sql, params)
+    return c.fetchall()
+
+def search_code(query, limit=10, project_ids=None):
+    """Search the indexed code for the given query, best matching chunks first.
+    
+    project_ids limits the search to those projects; None searches all.
+    """
+    match = build_fts_query(query)
+    if not match or project_ids == []:
+        return []
+    
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        
+        # Chunks containing every term rank first; top up with partial matches
+        # so natural-language questions still return something useful
+        rows = _search_code_fts(c, match, limit, project_ids=project_ids)
+        any_match = build_fts_query(query, operator="OR")
+        if len(rows) < limit and any_match != match:
+            rows += _search_code_fts(
+                c, any_match, limit - len(rows), [row['id'] for row in rows], project_ids
+            )
+    
+    return [{field: row[field] for field in CHUNK_FIELDS} for row in rows]
+
+def get_chunks(chunk_ids):
+    """Get chunks by id, in the given order; ids that no longer exist are skipped."""
+    chunk_ids = list(chunk_ids)
+    if not chunk_ids:
+        return []
+    
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        
         c.execute(
-            "UPDATE project_history SET last_access = CURRENT_TIMESTAMP WHERE id = ?",
-            (project['id'],)
+            f"""
+            SELECT id, {', '.join(CHUNK_FIELDS)} FROM code_chunks
+            WHERE id IN ({','.join('?' * len(chunk_ids))})
+            """,
+            chunk_ids
         )
+        
+        rows = {row['id']: row for row in c.fetchall()}
+    
+    return [{field: rows[chunk_id][field] for field in CHUNK_FIELDS} for chunk_id in chunk_ids if chunk_id in rows]
+
+def find_symbols(name, kind=None, prefix=False, limit=50, project_ids=None):
+    """Get definitions and references of a symbol by name."""
+    if project_ids == []:
+        return {"definitions": [], "references": []}
+    
+    if prefix:
+        # Range on the name index rather than LIKE, which can't use it
+        condition, params = "name >= ? AND name < ?", [name, name + "\U0010ffff"]
     else:
-        # Add new project
+        condition, params = "name = ?", [name]
+    
+    project_condition, project_params = _project_filter("project_id", project_ids)
+    results = {}
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        
+        for role, key in (("definition", "definitions"), ("reference", "references")):
+            sql = f"SELECT name, kind, file_path, line FROM symbols WHERE {condition} AND role = ? AND {project_condition}"
+            role_params = params + [role] + project_params
+            if kind and role == "definition":
+                sql += " AND kind = ?"
+                role_params.append(kind)
+            sql += " ORDER BY file_path, line LIMIT ?"
+            
+            c.execute(sql, role_params + [limit])
+            results[key] = [dict(row) for row in c.fetchall()]
+    
+    return results
+
+def get_symbol_definitions(names, limit=5, project_ids=None):
+    """Get the chunks that define any of the given symbol names."""
+    names = list(dict.fromkeys(names))
+    if not names or project_ids == []:
+        return []
+    
+    project_condition, project_params = _project_filter("symbols.project_id", project_ids)
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        
+        # CROSS JOIN keeps symbols as the outer loop, found by name through
+        # idx_symbols_name; with a project filter the planner would otherwise
+        # walk every chunk of the project and probe symbols by path
         c.execute(
-            "INSERT INTO project_history (project_path) VALUES (?)",
-            (project_path,)
+            f"""
+            SELECT DISTINCT {', '.join('code_chunks.' + field for field in CHUNK_FIELDS)}
+            FROM symbols
+            CROSS JOIN code_chunks ON code_chunks.project_id = symbols.project_id
+                AND code_chunks.file_path = symbols.file_path
+                AND symbols.line BETWEEN code_chunks.start_line AND code_chunks.end_line
+            WHERE symbols.name IN ({','.join('?' * len(names))})
+                AND symbols.role = 'definition'
+                AND {project_condition}
+            LIMIT ?
+            """,
+            names + project_params + [limit]
         )
+        
+        rows = c.fetchall()
     
-    conn.commit()
-    conn.close()
+    return [dict(row) for row in rows]
+
+def get_data_generation():
+    """Get the current generation of each kind of data, e.g. {"code": 12, "commands": 3}."""
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        c.execute("SELECT name, value FROM data_generation")
+        return {row['name']: row['value'] for row in c.fetchall()}
+
+def update_project_history(project_path):
+    """Update the last access time for a project."""
+    with db_connection() as conn:
+        c = conn.cursor()
+        
+        # Check if project exists
+        c.execute("SELECT id FROM project_history WHERE project_path = ?", (project_path,))
+        project = c.fetchone()
+        
+        if project:
+            # Update existing project
+            c.execute(
+                "UPDATE project_history SET last_access = CURRENT_TIMESTAMP WHERE id = ?",
+                (project['id'],)
+            )
+        else:
+            # Add new project
+            c.execute(
+                "INSERT INTO project_history (project_path) VALUES (?)",
+                (project_path,)
+            )
     
     return True
 
 def get_recent_projects(limit=5):
     """Get the most recently accessed projects."""
-    conn = get_db_connection()
-    c = conn.cursor()
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        
+        c.execute(
+            "SELECT project_path, last_access FROM project_history ORDER BY last_access DESC LIMIT ?",
+            (limit,)
+        )
+        
+        rows = c.fetchall()
     
-    c.execute(
-        "SELECT project_path, last_access FROM project_history ORDER BY last_access DESC LIMIT ?",
-        (limit,)
-    )
+    return [dict(row) for row in rows]
+
+# Columns of llm_requests a client may report
+LLM_REQUEST_FIELDS = (
+    "model", "stream", "connect_seconds", "first_token_seconds", "total_seconds",
+    "load_seconds", "prompt_eval_seconds", "prompt_tokens", "completion_tokens",
+    "tokens_per_second", "prompt_chars", "context_chars", "context_tokens"
+)
+
+# Summarized by get_llm_stats, in display order
+_LLM_STAT_FIELDS = (
+    "connect_seconds", "first_token_seconds", "total_seconds", "tokens_per_second",
+    "prompt_tokens", "completion_tokens", "context_tokens"
+)
+
+def log_llm_request(timing):
+    """Store the timing of one LLM request; unknown keys are ignored."""
+    values = [timing.get(field) for field in LLM_REQUEST_FIELDS]
+    with db_connection() as conn:
+        conn.execute(
+            f"INSERT INTO llm_requests ({', '.join(LLM_REQUEST_FIELDS)}) VALUES ({', '.join('?' * len(LLM_REQUEST_FIELDS))})",
+            values
+        )
     
-    rows = c.fetchall()
-    conn.close()
+    return True
+
+def _percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+def get_llm_stats(model=None, limit=LLM_STATS_WINDOW):
+    """Summarize the latest `limit` LLM requests per model.
+    
+    Each field gets its mean, median and 90th percentile over the requests
+    that reported it.
+    """
+    with db_connection(readonly=True) as conn:
+        c = conn.cursor()
+        
+        if model:
+            c.execute("SELECT * FROM llm_requests WHERE model = ? ORDER BY id DESC LIMIT ?", (model, limit))
+        else:
+            # The window applies per model, so a busy model can't crowd out the others
+            c.execute(
+                '''
+                SELECT * FROM (
+                    SELECT *, ROW_NUMBER() OVER (PARTITION BY model ORDER BY id DESC) AS position
+                    FROM llm_requests
+                ) WHERE position <= ?
+                ''',
+                (limit,)
+            )
+        rows = c.fetchall()
+    
+    stats = []
+    for name, group in groupby(sorted(rows, key=itemgetter("model")), key=itemgetter("model")):
+        group = list(group)
+        summary = {
+            "model": name,
+            "requests": len(group),
+            "last_request": max(row["timestamp"] for row in group)
+        }
+        for field in _LLM_STAT_FIELDS:
+            values = sorted(row[field] for row in group if row[field] is not None)
+            summary[field] = {
+                "mean": round(sum(values) / len(values), 3),
+                "p50": round(_percentile(values, 50), 3),
+                "p90": round(_percentile(values, 90), 3)
+            } if values else None
+        stats.append(summary)
     
-    return [dict(row) for row in rows]
\ No newline at end of file
+    return sorted(stats, key=lambda summary: summary["last_request"], reverse=True)
\ No newline at end of file
@@ -0,0 +1,294 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+from .config import WATCH_DEBOUNCE, WATCH_MAX_DELAY, WATCH_POLL_INTERVAL
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+def _load_inotify():
+    """Return libc with the inotify calls, or None where unsupported."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+_libc = _load_inotify()
+
+class FileWatcher:
+    """Watches a directory tree and reports debounced batches of changes.
+
+    Uses inotify where available so an idle tree costs nothing, and falls
+    back to periodically comparing stat data. Bursts of events (saves,
+    checkouts, builds) are coalesced until the tree has been quiet for
+    `debounce` seconds, or at most `max_delay` seconds, and then delivered as
+    on_changes(changed_files, deleted_files, deleted_dirs) using the state of
+    each path at delivery time. If the kernel drops events, on_rescan() is
+    called instead so the caller can reconcile the whole tree.
+    """
+
+    def __init__(self, root, on_changes, should_watch_dir, should_watch_file,
+                 on_rescan=None, debounce=WATCH_DEBOUNCE, max_delay=WATCH_MAX_DELAY,
+                 poll_interval=WATCH_POLL_INTERVAL, force_polling=False):
+        self.root = os.path.abspath(root)
+        self.on_changes = on_changes
+        self.on_rescan = on_rescan
+        self.should_watch_dir = should_watch_dir
+        self.should_watch_file = should_watch_file
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.mode = "polling" if force_polling or _libc is None else "inotify"
+        self.watch_thread = None
+        self.stop_event = threading.Event()
+        self.fd = None
+        self.watch_paths = {}   # inotify watch descriptor -> directory
+        self.pending = set()
+        self.pending_dirs = set()
+        self.rescan_needed = False
+        self.first_event = None
+        self.last_event = None
+        self.events_seen = 0
+        self.batches_delivered = 0
+        self.overflows = 0
+
+    def start(self):
+        """Start watching in a background thread."""
+        if self.mode == "inotify":
+            fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                self.mode = "polling"
+            else:
+                self.fd = fd
+                self._watch_tree(self.root)
+
+        target = self._run_inotify if self.mode == "inotify" else self._run_polling
+        self.watch_thread = threading.Thread(target=target, name="file-watcher", daemon=True)
+        self.watch_thread.start()
+
+    def stop(self):
+        """Stop watching and release the inotify descriptor."""
+        self.stop_event.set()
+        if self.watch_thread and self.watch_thread is not threading.current_thread():
+            self.watch_thread.join(timeout=5)
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def get_status(self):
+        """Get watcher state for status reporting."""
+        return {
+            "root": self.root,
+            "mode": self.mode,
+            "watched_dirs": len(self.watch_paths),
+            "pending_changes": len(self.pending) + len(self.pending_dirs),
+            "events_seen": self.events_seen,
+            "batches_delivered": self.batches_delivered,
+            "overflows": self.overflows
+        }
+
+    def _walk_dirs(self, top):
+        for root, dirs, _ in os.walk(top):
+            dirs[:] = [d for d in dirs if self.should_watch_dir(d)]
+            yield root
+
+    def _watch_tree(self, top):
+        """Add watches for a directory and everything below it."""
+        for directory in self._walk_dirs(top):
+            wd = _libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                # Out of watches (fs.inotify.max_user_watches) or a race with
+                # deletion; directories past the limit go unwatched
+                if ctypes.get_errno() == errno.ENOSPC:
+                    print(f"inotify watch limit reached at {directory}")
+                    break
+                continue
+            self.watch_paths[wd] = directory
+
+    def _note(self, path, is_dir=False):
+        now = time.time()
+        if self.first_event is None:
+            self.first_event = now
+        self.last_event = now
+        self.events_seen += 1
+        (self.pending_dirs if is_dir else self.pending).add(path)
+
+    def _due(self):
+        """Whether pending changes have settled long enough to deliver."""
+        if self.first_event is None:
+            return False
+        now = time.time()
+        return (now - self.last_event >= self.debounce
+                or now - self.first_event >= self.max_delay)
+
+    def _deliver(self):
+        """Resolve pending paths against the disk and hand them over."""
+        pending, pending_dirs = self.pending, self.pending_dirs
+        self.pending, self.pending_dirs = set(), set()
+        self.first_event = self.last_event = None
+
+        if self.rescan_needed and self.on_rescan is not None:
+            self.rescan_needed = False
+            self.batches_delivered += 1
+            try:
+                self.on_rescan()
+            except Exception as e:
+                print(f"Error rescanning watched tree: {e}")
+            return
+
+        changed, deleted, deleted_dirs = set(), set(), set()
+        for directory in pending_dirs:
+            if os.path.isdir(directory):
+                # New or moved-in directory: everything inside is new to us
+                for root in self._walk_dirs(directory):
+                    try:
+                        names = os.listdir(root)
+                    except OSError:
+                        continue
+                    pending.update(os.path.join(root, name) for name in names)
+            else:
+                deleted_dirs.add(directory)
+
+        for path in pending:
+            if os.path.isfile(path):
+                if self.should_watch_file(path):
+                    changed.add(path)
+            elif not os.path.isdir(path):
+                deleted.add(path)
+
+        if changed or deleted or deleted_dirs:
+            self.batches_delivered += 1
+            try:
+                self.on_changes(changed, deleted, deleted_dirs)
+            except Exception as e:
+                print(f"Error applying watched changes: {e}")
+
+    def _run_inotify(self):
+        """Read inotify events until stopped."""
+        buffer = b""
+        while not self.stop_event.is_set():
+            timeout = self.debounce if self.first_event is not None else 1.0
+            try:
+                readable, _, _ = select.select([self.fd], [], [], timeout)
+            except (OSError, ValueError, TypeError):
+                break
+
+            if readable:
+                try:
+                    buffer += os.read(self.fd, 64 * 1024)
+                except BlockingIOError:
+                    pass
+                except OSError:
+                    break
+                buffer = self._parse_events(buffer)
+
+            if self._due():
+                self._deliver()
+
+    def _parse_events(self, buffer):
+        """Consume complete inotify events from the buffer."""
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buffer):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            end = offset + _EVENT_HEADER.size + length
+            if end > len(buffer):
+                break
+            name = buffer[offset + _EVENT_HEADER.size:end].rstrip(b"\0")
+            offset = end
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; the whole tree has to be re-checked
+                self.overflows += 1
+                self.rescan_needed = True
+                self._note(self.root, is_dir=True)
+                continue
+
+            directory = self.watch_paths.get(wd)
+            if directory is None:
+                continue
+
+            if mask & IN_IGNORED:
+                self.watch_paths.pop(wd, None)
+                continue
+
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                self._note(directory, is_dir=True)
+                continue
+
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if not self.should_watch_dir(os.path.basename(path)):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_tree(path)
+                self._note(path, is_dir=True)
+            else:
+                self._note(path)
+
+        return buffer[offset:]
+
+    def _snapshot(self):
+        """Stat every watchable file under the root."""
+        snapshot = {}
+        for directory in self._walk_dirs(self.root):
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False) and self.should_watch_file(entry.path):
+                    try:
+                        stats = entry.stat()
+                    except OSError:
+                        continue
+                    snapshot[entry.path] = (stats.st_mtime, stats.st_size)
+        return snapshot
+
+    def _run_polling(self):
+        """Compare stat snapshots at a fixed interval until stopped."""
+        previous = self._snapshot()
+        while not self.stop_event.wait(self.poll_interval):
+            current = self._snapshot()
+            for path, stats in current.items():
+                if previous.get(path) != stats:
+                    self._note(path)
+            for path in previous.keys() - current.keys():
+                self._note(path)
+            previous = current
+
+            # One interval already separates snapshots, so deliver right away
+            if self.first_event is not None:
+                self._deliver()
\ No newline at end of file
@@ -0,0 +1,195 @@
+import time
+import atexit
+import threading
+from queue import Queue, Empty
+from .database import (
+    get_db_connection, write_code_batch, chunk_row, symbol_row, DROP_PROJECT_OPERATIONS
+)
+from .metrics import (
+    INDEX_WRITTEN_FILES, INDEX_WRITTEN_BYTES, INDEX_BATCH_SECONDS, INDEX_BATCH_FILES, INDEX_BATCH_FAILURES
+)
+from .config import INDEX_BATCH_SIZE, INDEX_BATCH_INTERVAL, INDEX_WRITER_IDLE
+
+# Queue marker asking the writer thread to exit after committing
+_SHUTDOWN = object()
+
+class IndexWriter:
+    """Single owner of index writes.
+
+    Producers enqueue file updates; one thread holding one long-lived
+    connection applies them with executemany and commits once per batch of
+    `batch_size` files or `batch_interval` seconds, and whenever producers go
+    idle, instead of once per file.
+    """
+
+    def __init__(self, batch_size=INDEX_BATCH_SIZE, batch_interval=INDEX_BATCH_INTERVAL):
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.write_queue = Queue()
+        self.writer_thread = None
+        self.stats_lock = threading.Lock()
+        self.files_written = 0
+        self.bytes_written = 0
+        self.batches_committed = 0
+        self.commit_seconds = 0.0
+        self.active_seconds = 0.0
+        self.last_batch_size = 0
+        self.last_batch_seconds = 0.0
+        self.commit_listeners = []
+
+    def start(self):
+        """Start the writer thread."""
+        if self.writer_thread is None or not self.writer_thread.is_alive():
+            self.writer_thread = threading.Thread(
+                target=self._run,
+                daemon=True
+            )
+            self.writer_thread.start()
+            atexit.register(self.close)
+
+    def add_commit_listener(self, callback):
+        """Call callback() after every committed batch, on the writer thread."""
+        self.commit_listeners.append(callback)
+
+    def add_file(self, project_id, file_path, content, language, content_hash, file_stats, is_new,
+                 chunks=(), symbols=()):
+        """Queue a new or changed file together with its chunks and symbols."""
+        values = (content, language, file_stats.st_mtime, file_stats.st_size, content_hash)
+        if is_new:
+            operations = [("insert", (project_id, file_path) + values)]
+        else:
+            operations = [("update", values + (project_id, file_path))]
+        operations.extend(("chunk", chunk_row(project_id, file_path, language, chunk)) for chunk in chunks)
+        operations.extend(("symbol", symbol_row(project_id, file_path, symbol)) for symbol in symbols)
+        self.write_queue.put(("file", operations, len(content)))
+
+    def touch_file(self, project_id, file_path, file_stats):
+        """Queue a stat-only update for a file whose content didn't change."""
+        operations = [("touch", (file_stats.st_mtime, file_stats.st_size, project_id, file_path))]
+        self.write_queue.put(("file", operations, 0))
+
+    def remove_files(self, project_id, file_paths):
+        """Queue removal of files from a project's index."""
+        count = 0
+        for file_path in file_paths:
+            self.write_queue.put(("file", [("remove", (project_id, file_path))], 0))
+            count += 1
+        return count
+
+    def remove_project(self, project_id):
+        """Queue removal of a project and everything indexed in it."""
+        operations = [(operation, (project_id,)) for operation in DROP_PROJECT_OPERATIONS]
+        self.write_queue.put(("file", operations, 0))
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been committed."""
+        done = threading.Event()
+        self.write_queue.put(("flush", done, 0))
+        return done.wait(timeout)
+
+    def close(self, timeout=10):
+        """Commit pending writes and stop the writer thread."""
+        if self.writer_thread and self.writer_thread.is_alive():
+            self.write_queue.put(_SHUTDOWN)
+            self.writer_thread.join(timeout)
+
+    def _run(self):
+        """Collect queued writes into batches and commit them."""
+        conn = get_db_connection()
+        pending = []        # (operation, params) rows for write_code_batch
+        pending_files = 0
+        pending_bytes = 0
+        batch_started = None
+
+        try:
+            while True:
+                # Wait briefly for more work; a quiet queue means commit now
+                timeout = INDEX_WRITER_IDLE
+                if batch_started is not None:
+                    remaining = self.batch_interval - (time.time() - batch_started)
+                    timeout = max(0, min(timeout, remaining))
+
+                try:
+                    item = self.write_queue.get(timeout=timeout if pending else None)
+                except Empty:
+                    item = None
+
+                if item is _SHUTDOWN:
+                    break
+
+                if item is not None:
+                    kind, payload, size = item
+                    if kind == "flush":
+                        self._commit(conn, pending, pending_files, pending_bytes, batch_started)
+                        pending, pending_files, pending_bytes, batch_started = [], 0, 0, None
+                        payload.set()
+                        continue
+
+                    if batch_started is None:
+                        batch_started = time.time()
+                    pending.extend(payload)
+                    pending_files += 1
+                    pending_bytes += size
+
+                    if (pending_files < self.batch_size
+                            and time.time() - batch_started < self.batch_interval):
+                        continue
+
+                self._commit(conn, pending, pending_files, pending_bytes, batch_started)
+                pending, pending_files, pending_bytes, batch_started = [], 0, 0, None
+        finally:
+            self._commit(conn, pending, pending_files, pending_bytes, batch_started)
+            conn.close()
+
+    def _commit(self, conn, pending, pending_files, pending_bytes, batch_started):
+        """Write and commit one batch."""
+        if not pending:
+            return
+
+        commit_started = time.time()
+        try:
+            write_code_batch(conn, pending)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            INDEX_BATCH_FAILURES.inc()
+            print(f"Error writing index batch of {pending_files} files: {e}")
+            return
+
+        finished = time.time()
+        with self.stats_lock:
+            self.files_written += pending_files
+            self.bytes_written += pending_bytes
+            self.batches_committed += 1
+            self.commit_seconds += finished - commit_started
+            self.active_seconds += finished - batch_started
+            self.last_batch_size = pending_files
+            self.last_batch_seconds = finished - commit_started
+        INDEX_BATCH_SECONDS.observe(finished - commit_started)
+        INDEX_BATCH_FILES.observe(pending_files)
+        INDEX_WRITTEN_FILES.inc(pending_files)
+        INDEX_WRITTEN_BYTES.inc(pending_bytes)
+
+        for callback in self.commit_listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in index commit listener: {e}")
+
+    def get_stats(self):
+        """Get write throughput statistics."""
+        with self.stats_lock:
+            active = self.active_seconds or None
+            return {
+                "files_written": self.files_written,
+                "bytes_written": self.bytes_written,
+                "batches_committed": self.batches_committed,
+                "pending_writes": self.write_queue.qsize(),
+                "last_batch_size": self.last_batch_size,
+                "last_batch_seconds": round(self.last_batch_seconds, 4),
+                "avg_commit_seconds": round(self.commit_seconds / self.batches_committed, 4) if self.batches_committed else 0,
+                "files_per_second": round(self.files_written / active, 1) if active else 0,
+                "bytes_per_second": round(self.bytes_written / active, 1) if active else 0,
+                "batch_size": self.batch_size,
+                "batch_interval": self.batch_interval
+            }
\ No newline at end of file
@@ -2,7 +2,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context, g
 from flask_cors import CORS
 import subprocess
 import json
@@ -10,21 +10,79 @@ import time
 from pathlib import Path
 
 from server.database import (
-    init_db, log_command, get_similar_commands, 
-    search_code, update_project_history, get_recent_projects
+    init_db, log_command, get_similar_commands, get_command_output,
+    update_project_history, get_recent_projects,
+    find_symbols, get_data_generation, resolve_project_ids, list_projects,
+    log_llm_request, get_llm_stats, LLM_REQUEST_FIELDS
 )
 from server.code_indexer import indexer
-from server.config import SERVER_HOST, SERVER_PORT
+from server.command_runner import start_command, stop_command, stream_process_output
+from server.command_jobs import job_manager, JobQueueFull
+from server.context_cache import context_cache, normalize_query
+from server.context_builder import (
+    retrieve_context, pack_context, record_project_async, rank_code, RANKERS
+)
+from server.semantic_index import semantic_index
+from server.metrics import (
+    worker_metrics, registry, REQUEST_SECONDS, COMMAND_SECONDS, CONTENT_TYPE,
+    observe_search, observe_llm_request, command_outcome
+)
+from server.config import CONTEXT_TOKEN_BUDGET, CONTEXT_RANKER
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Ensure database is initialized
-init_db()
+def start_background():
+    """Initialize the database and start indexing; only the owner process does this."""
+    init_db()
+    
+    # Start the indexer thread
+    indexer.start_indexing_thread()
+    
+    # Keep the semantic index in step with what the indexer writes
+    semantic_index.start()
+    indexer.writer.add_commit_listener(semantic_index.schedule_refresh)
+
+def stop_background():
+    """Stop watching, cancel running jobs and commit pending index writes."""
+    indexer.stop_watching()
+    job_manager.shutdown()
+    indexer.writer.close()
+
+# Where /api/metrics comes from: this process, or the owner's aggregate
+metrics_store = worker_metrics
 
-# Start the indexer thread
-indexer.start_indexing_thread()
+def attach_owner(owner_indexer, owner_jobs, owner_metrics):
+    """Serve indexing, job and metrics requests from the owner process's instances."""
+    global indexer, job_manager, metrics_store
+    indexer, job_manager, metrics_store = owner_indexer, owner_jobs, owner_metrics
+
+def push_metrics():
+    """Send this worker's metrics to the owner process."""
+    metrics_store.update(os.getpid(), registry.snapshot())
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    # Label by route pattern, not path, so job ids don't each get a series
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - g.request_started,
+        endpoint=endpoint,
+        method=request.method,
+        status=response.status_code
+    )
+    return response
+
+def _invalid_ranker(ranker):
+    return jsonify({
+        "status": "error",
+        "message": f"Unknown ranker '{ranker}', expected one of: {', '.join(RANKERS)}"
+    }), 400
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -34,6 +92,14 @@ def health_check():
         "timestamp": time.time()
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Indexing, search, command, LLM and request metrics in Prometheus text format."""
+    # Workers report through the owner, so every scrape sees all processes
+    if metrics_store is not worker_metrics:
+        push_metrics()
+    return Response(metrics_store.render(), content_type=CONTENT_TYPE)
+
 @app.route('/api/index/project', methods=['POST'])
 def index_project():
     """Index a project directory."""
@@ -57,10 +123,72 @@ def index_project():
         "message": "Indexing started" if success else "Failed to start indexing"
     })
 
+@app.route('/api/index/cancel', methods=['POST'])
+def cancel_indexing():
+    """Cancel indexing of one project, or of every project being indexed."""
+    data = request.get_json(silent=True) or {}
+    project_path = data.get('project_path')
+    
+    cancelled = indexer.cancel_indexing(project_path)
+    if not cancelled:
+        return jsonify({
+            "status": "error",
+            "message": f"{project_path} is not being indexed" if project_path else "Nothing is being indexed"
+        }), 404
+    
+    return jsonify({
+        "status": "success",
+        "message": f"Cancelled indexing of {', '.join(cancelled)}",
+        "cancelled": cancelled
+    })
+
+@app.route('/api/index/pause', methods=['POST'])
+def pause_indexing():
+    """Stop starting on queued files until indexing is resumed."""
+    indexer.pause_indexing()
+    return jsonify({
+        "status": "success",
+        "message": "Indexing paused"
+    })
+
+@app.route('/api/index/resume', methods=['POST'])
+def resume_indexing():
+    """Resume paused indexing."""
+    indexer.resume_indexing()
+    return jsonify({
+        "status": "success",
+        "message": "Indexing resumed"
+    })
+
+@app.route('/api/index/watch', methods=['POST'])
+def watch_project():
+    """Turn watch mode on or off for a project."""
+    data = request.json or {}
+    enabled = data.get('enabled', True)
+    project_path = data.get('project_path')
+    
+    if enabled and project_path and not os.path.isdir(project_path):
+        return jsonify({
+            "status": "error",
+            "message": "Invalid project path"
+        }), 400
+    
+    if enabled:
+        indexer.start_watching(project_path)
+    else:
+        indexer.stop_watching()
+    
+    return jsonify({
+        "status": "success",
+        "message": "Watching for changes" if enabled else "Stopped watching",
+        "watch": indexer.get_indexing_status()["watch"]
+    })
+
 @app.route('/api/index/status', methods=['GET'])
 def indexing_status():
     """Get the current indexing status."""
     status = indexer.get_indexing_status()
+    status["semantic"] = semantic_index.get_stats()
     return jsonify(status)
 
 @app.route('/api/search/code', methods=['POST'])
@@ -69,6 +197,8 @@ def search_codebase():
     data = request.json
     query = data.get('query')
     limit = data.get('limit', 10)
+    project_path = data.get('project_path')
+    ranker = data.get('ranker', 'fts')
     
     if not query:
         return jsonify({
@@ -76,33 +206,87 @@ def search_codebase():
             "message": "Query is required"
         }), 400
     
-    results = search_code(query, limit)
+    if ranker not in RANKERS:
+        return _invalid_ranker(ranker)
+    
+    # Without a project path every indexed project is searched
+    project_ids = resolve_project_ids(project_path) if project_path else None
+    results = rank_code(query, limit, project_ids, ranker)
     
     return jsonify({
         "status": "success",
         "results": results
     })
 
+@app.route('/api/symbols', methods=['GET'])
+def symbols():
+    """Look up where a symbol is defined and used."""
+    name = request.args.get('name')
+    kind = request.args.get('kind')
+    prefix = request.args.get('prefix', 'false').lower() == 'true'
+    limit = request.args.get('limit', 50, type=int)
+    project_path = request.args.get('project_path')
+    
+    if not name:
+        return jsonify({
+            "status": "error",
+            "message": "Name is required"
+        }), 400
+    
+    started = time.perf_counter()
+    project_ids = resolve_project_ids(project_path) if project_path else None
+    results = find_symbols(name, kind, prefix, limit, project_ids)
+    observe_search("symbols", started, len(results["definitions"]) + len(results["references"]))
+    
+    return jsonify({
+        "status": "success",
+        "name": name,
+        "definitions": results["definitions"],
+        "references": results["references"]
+    })
+
 @app.route('/api/search/commands', methods=['POST'])
 def search_commands():
     """Search command history."""
     data = request.json
     query = data.get('query')
     limit = data.get('limit', 5)
+    include_output = data.get('include_output', True)
+    working_dir = data.get('working_dir')
     
-    if not query:
+    # An empty query is allowed and lists the latest commands
+    if query is None:
         return jsonify({
             "status": "error",
             "message": "Query is required"
         }), 400
     
-    results = get_similar_commands(query, limit)
+    started = time.perf_counter()
+    results = get_similar_commands(query, limit, include_output=include_output, working_dir=working_dir)
+    observe_search("commands", started, len(results))
     
     return jsonify({
         "status": "success",
         "results": results
     })
 
+@app.route('/api/command/<int:command_id>/output', methods=['GET'])
+def command_output(command_id):
+    """Get the full stored output of a logged command."""
+    output = get_command_output(command_id)
+    
+    if output is None:
+        return jsonify({
+            "status": "error",
+            "message": f"Command {command_id} not found"
+        }), 404
+    
+    return jsonify({
+        "status": "success",
+        "id": command_id,
+        "output": output
+    })
+
 @app.route('/api/command/log', methods=['POST'])
 def log_command_endpoint():
     """Log a command and its output."""
@@ -140,6 +324,7 @@ def execute_command():
     
     try:
         # Execute the command
+        started = time.perf_counter()
         process = subprocess.run(
             command,
             shell=True,
@@ -147,6 +332,9 @@ def execute_command():
             text=True,
             cwd=working_dir
         )
+        COMMAND_SECONDS.observe(
+            time.perf_counter() - started, mode="sync", outcome=command_outcome(process.returncode)
+        )
         
         # Log the command
         log_command(
@@ -168,6 +356,226 @@ def execute_command():
             "message": str(e)
         }), 500
 
+@app.route('/api/command/execute/stream', methods=['POST'])
+def execute_command_stream():
+    """Execute a shell command, streaming its output as it is produced.
+    
+    The response is newline-delimited JSON: {"type": "output", "stream":
+    "stdout"|"stderr", "data": ...} events followed by one {"type": "exit",
+    "exit_code": ...} event.
+    """
+    data = request.json
+    command = data.get('command')
+    working_dir = data.get('working_dir', os.getcwd())
+    
+    if not command:
+        return jsonify({
+            "status": "error",
+            "message": "Command is required"
+        }), 400
+    
+    try:
+        started = time.perf_counter()
+        # Own process group, so a disconnect can stop everything the shell spawned
+        process = start_command(command, working_dir, new_session=True)
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+    
+    def generate():
+        # Only this copy of the output is kept, for the history log
+        output = []
+        outcome = "cancelled"
+        try:
+            for stream, text in stream_process_output(process):
+                output.append(text)
+                yield json.dumps({"type": "output", "stream": stream, "data": text}) + "\n"
+            
+            exit_code = process.wait()
+            outcome = command_outcome(exit_code)
+            yield json.dumps({"type": "exit", "exit_code": exit_code}) + "\n"
+            log_command(command, "".join(output), working_dir, exit_code)
+        finally:
+            # Client went away before the command finished
+            if process.poll() is None:
+                stop_command(process)
+                process.wait()
+            COMMAND_SECONDS.observe(time.perf_counter() - started, mode="stream", outcome=outcome)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _job_not_found(job_id):
+    return jsonify({
+        "status": "error",
+        "message": f"Unknown job: {job_id}"
+    }), 404
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Run a shell command in the background and return its job id."""
+    data = request.json
+    command = data.get('command')
+    working_dir = data.get('working_dir', os.getcwd())
+    
+    if not command:
+        return jsonify({
+            "status": "error",
+            "message": "Command is required"
+        }), 400
+    
+    try:
+        job = job_manager.submit(
+            command,
+            working_dir,
+            timeout=data.get('timeout'),
+            max_output=data.get('max_output')
+        )
+    except JobQueueFull as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 429
+    
+    return jsonify({
+        "status": "success",
+        "job": job.to_dict()
+    }), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """List running, queued and recently finished jobs."""
+    return jsonify({
+        "status": "success",
+        "jobs": job_manager.list_jobs(),
+        "stats": job_manager.get_stats()
+    })
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Get the status of a job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return _job_not_found(job_id)
+    
+    return jsonify({
+        "status": "success",
+        "job": job.to_dict()
+    })
+
+@app.route('/api/jobs/<job_id>/output', methods=['GET'])
+def job_output(job_id):
+    """Poll a job's output from an offset, optionally waiting for new output."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return _job_not_found(job_id)
+    
+    offset = request.args.get('offset', 0, type=int)
+    wait = min(request.args.get('wait', 0, type=float), 30)
+    events, next_offset = job.read_output(offset, wait)
+    
+    return jsonify({
+        "status": "success",
+        "events": [{"stream": stream, "data": text} for stream, text in events],
+        "offset": next_offset,
+        "done": job.done,
+        "job": job.to_dict()
+    })
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def job_stream(job_id):
+    """Stream a job's output as newline-delimited JSON until it finishes.
+    
+    Uses the same event format as /api/command/execute/stream.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return _job_not_found(job_id)
+    
+    offset = request.args.get('offset', 0, type=int)
+    
+    def generate():
+        position = offset
+        while True:
+            done = job.done
+            events, position = job.read_output(position, wait=1.0)
+            for stream, text in events:
+                yield json.dumps({"type": "output", "stream": stream, "data": text}) + "\n"
+            # Read once more after completion so no trailing output is lost
+            if done and not events:
+                break
+        
+        yield json.dumps({
+            "type": "exit",
+            "exit_code": job.exit_code,
+            "job_status": job.status
+        }) + "\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running job."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return _job_not_found(job_id)
+    
+    return jsonify({
+        "status": "success",
+        "job": job.to_dict()
+    })
+
+@app.route('/api/llm/requests', methods=['POST'])
+def log_llm_request_endpoint():
+    """Record how long an LLM request took, as measured by the client."""
+    data = request.json or {}
+    
+    if not data.get('model'):
+        return jsonify({
+            "status": "error",
+            "message": "Model is required"
+        }), 400
+    
+    timing = {field: data.get(field) for field in LLM_REQUEST_FIELDS}
+    invalid = [
+        field for field, value in timing.items()
+        if field != 'model' and value is not None and not isinstance(value, (int, float))
+    ]
+    if invalid:
+        return jsonify({
+            "status": "error",
+            "message": f"Expected numbers for: {', '.join(invalid)}"
+        }), 400
+    
+    success = log_llm_request(timing)
+    observe_llm_request(timing)
+    
+    return jsonify({
+        "status": "success" if success else "error",
+        "message": "LLM request logged" if success else "Failed to log LLM request"
+    })
+
+@app.route('/api/llm/stats', methods=['GET'])
+def llm_stats():
+    """Summarize recent LLM request timings per model."""
+    model = request.args.get('model')
+    limit = request.args.get('limit', type=int)
+    stats = get_llm_stats(model, limit) if limit else get_llm_stats(model)
+    
+    return jsonify({
+        "status": "success",
+        "models": stats
+    })
+
 @app.route('/api/projects/recent', methods=['GET'])
 def recent_projects():
     """Get recently accessed projects."""
@@ -179,6 +587,45 @@ def recent_projects():
         "projects": projects
     })
 
+@app.route('/api/projects', methods=['GET'])
+def indexed_projects():
+    """List indexed projects with their file counts."""
+    return jsonify({
+        "status": "success",
+        "projects": list_projects()
+    })
+
+@app.route('/api/projects', methods=['DELETE'])
+def delete_project():
+    """Drop a project and everything indexed in it."""
+    data = request.json or {}
+    project_path = data.get('project_path')
+    
+    if not project_path:
+        return jsonify({
+            "status": "error",
+            "message": "Project path is required"
+        }), 400
+    
+    try:
+        dropped = indexer.drop_project(project_path)
+    except RuntimeError as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 409
+    
+    if not dropped:
+        return jsonify({
+            "status": "error",
+            "message": f"Project {project_path} is not indexed"
+        }), 404
+    
+    return jsonify({
+        "status": "success",
+        "message": f"Dropped project {project_path}"
+    })
+
 @app.route('/api/context/generate', methods=['POST'])
 def generate_context():
     """Generate context for an LLM query."""
@@ -192,32 +639,60 @@ def generate_context():
             "message": "Query is required"
         }), 400
     
-    # Get relevant code snippets
-    code_results = search_code(query, limit=5)
+    try:
+        token_budget = int(data.get('token_budget') or CONTEXT_TOKEN_BUDGET)
+    except (TypeError, ValueError):
+        return jsonify({
+            "status": "error",
+            "message": "token_budget must be a number"
+        }), 400
     
-    # Get relevant commands
-    command_results = get_similar_commands(query, limit=3)
+    ranker = data.get('ranker', CONTEXT_RANKER)
+    if ranker not in RANKERS:
+        return _invalid_ranker(ranker)
     
-    # Update project history
-    update_project_history(project_path)
+    record_project_async(project_path)
+    
+    # Repeated questions reuse the last retrieval until the index or the
+    # command history changes
+    cache_key = (normalize_query(query), project_path, ranker)
+    generation = get_data_generation()
+    cached = context_cache.get(cache_key, generation)
+    
+    if cached is not None:
+        code_results, command_results = cached
+    else:
+        code_results, command_results, complete = retrieve_context(query, project_path, ranker)
+        # A timed-out or failed source would otherwise be served as "no results"
+        if complete:
+            context_cache.put(cache_key, (code_results, command_results), generation)
+    
+    snippets, commands, tokens = pack_context(code_results, command_results, token_budget)
     
     # Format the context
     context = {
         "project_path": project_path,
-        "code_snippets": code_results,
-        "command_history": command_results,
+        "code_snippets": snippets,
+        "command_history": commands,
+        "token_budget": token_budget,
+        "tokens": tokens,
         "timestamp": time.time()
     }
     
     return jsonify({
         "status": "success",
-        "context": context
+        "context": context,
+        "cached": cached is not None
+    })
+
+@app.route('/api/context/cache', methods=['GET'])
+def context_cache_stats():
+    """Get context cache hit/miss statistics."""
+    return jsonify({
+        "status": "success",
+        "cache": context_cache.get_stats()
     })
 
 if __name__ == '__main__':
-    # Print some info
-    print(f"Starting MCP Server on {SERVER_HOST}:{SERVER_PORT}")
-    print("Press Ctrl+C to exit")
-    
-    # Start the server
-    app.run(host=SERVER_HOST, port=SERVER_PORT, debug=True)
\ No newline at end of file
+    from server.serve import main
+    main()
\ No newline at end of file
@@ -0,0 +1,266 @@
+import math
+import time
+import bisect
+import threading
+from .config import METRICS_LATENCY_BUCKETS, METRICS_COMMAND_BUCKETS, METRICS_LLM_BUCKETS
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class Metric:
+    """A named family of samples, one per combination of label values."""
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def collect(self):
+        """Get {label values: value} for every sample."""
+        with self.lock:
+            return dict(self.samples)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+class Gauge(Metric):
+    """A value that can go up and down, or be read from a function at collection time."""
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self.function = None
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.samples[self._key(labels)] = value
+
+    def set_function(self, function):
+        """Read the (unlabelled) value from function() whenever metrics are collected."""
+        self.function = function
+
+    def collect(self):
+        if self.function is None:
+            return super().collect()
+        try:
+            return {(): float(self.function())}
+        except Exception as e:
+            print(f"Error collecting metric {self.name}: {e}")
+            return {}
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum and count."""
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=METRICS_LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            sample = self.samples.get(key)
+            if sample is None:
+                sample = self.samples[key] = [[0] * len(self.buckets), 0.0, 0]
+            sample[0][index] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    def collect(self):
+        with self.lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self.samples.items()}
+
+class Registry:
+    """The metrics of one process.
+
+    snapshot() gives a picklable copy of every sample, so worker processes
+    can hand theirs to the owner process, and render() merges snapshots
+    into one Prometheus text page.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=METRICS_LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def snapshot(self):
+        return {metric.name: metric.collect() for metric in self.metrics}
+
+    def render(self, snapshots=()):
+        """Render this registry's samples plus those of other processes' snapshots."""
+        lines = []
+        for metric in self.metrics:
+            merged = metric.collect()
+            for snapshot in snapshots:
+                for key, value in snapshot.get(metric.name, {}).items():
+                    merged[key] = _merge(metric, merged.get(key), value)
+
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key in sorted(merged):
+                value = merged[key]
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{_format_labels(metric.label_names, key)} {_format_value(value)}")
+                    continue
+
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(metric.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(metric.label_names, key, [("le", _format_value(float(bound)))])
+                    lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(metric.label_names, key)
+                lines.append(f"{metric.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{metric.name}_count{labels} {count}")
+        return "\n".join(lines) + "\n"
+
+def _merge(metric, current, value):
+    if current is None:
+        return value
+    if metric.kind == "histogram":
+        return ([a + b for a, b in zip(current[0], value[0])], current[1] + value[1], current[2] + value[2])
+    return current + value
+
+class WorkerMetrics:
+    """Latest snapshots pushed by worker processes, merged into the owner's metrics.
+
+    A worker's last snapshot outlives the worker, so merged counters never
+    go backwards when one is replaced.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.snapshots = {}
+        self.lock = threading.Lock()
+
+    def update(self, worker_id, snapshot):
+        with self.lock:
+            self.snapshots[worker_id] = snapshot
+
+    def render(self):
+        with self.lock:
+            snapshots = list(self.snapshots.values())
+        return self.registry.render(snapshots)
+
+# Global registry and the metrics recorded in it
+registry = Registry()
+worker_metrics = WorkerMetrics(registry)
+
+REQUEST_SECONDS = registry.histogram(
+    "mcp_http_request_duration_seconds", "Time to produce an HTTP response (streams: until it starts)",
+    ("endpoint", "method", "status")
+)
+
+INDEX_FILES = registry.counter(
+    "mcp_index_files_total", "Files seen by indexing runs and watch mode, by outcome", ("outcome",)
+)
+INDEX_ERRORS = registry.counter("mcp_index_errors_total", "Files that failed to index")
+INDEX_IGNORED = registry.counter(
+    "mcp_index_ignored_files_total", "Files left out of the index: too large, binary, minified or generated",
+    ("reason",)
+)
+INDEX_QUEUE_DEPTH = registry.gauge("mcp_index_queue_depth", "Files waiting to be read and parsed")
+INDEX_WRITE_QUEUE_DEPTH = registry.gauge("mcp_index_write_queue_depth", "Parsed files waiting for the index writer")
+INDEX_IN_PROGRESS = registry.gauge("mcp_index_in_progress", "1 while a project is being scanned or files are in flight")
+INDEX_WRITTEN_FILES = registry.counter("mcp_index_written_files_total", "Files committed to the index")
+INDEX_WRITTEN_BYTES = registry.counter("mcp_index_written_bytes_total", "Bytes of file content committed to the index")
+INDEX_FILES_PER_SECOND = registry.gauge(
+    "mcp_index_files_per_second", "Files committed per second of active writing, since startup"
+)
+INDEX_BYTES_PER_SECOND = registry.gauge(
+    "mcp_index_bytes_per_second", "Bytes committed per second of active writing, since startup"
+)
+INDEX_BATCH_SECONDS = registry.histogram(
+    "mcp_index_batch_commit_seconds", "Time to write and commit one batch of index updates"
+)
+INDEX_BATCH_FILES = registry.histogram(
+    "mcp_index_batch_files", "Files per committed index batch", buckets=(1, 5, 10, 50, 100, 250, 500, 1000)
+)
+INDEX_BATCH_FAILURES = registry.counter("mcp_index_batch_failures_total", "Index batches rolled back after an error")
+
+SEARCH_SECONDS = registry.histogram("mcp_search_duration_seconds", "Search latency by kind", ("kind",))
+SEARCH_RESULTS = registry.histogram(
+    "mcp_search_results", "Results returned per search, by kind", ("kind",), buckets=(0, 1, 2, 5, 10, 20, 50, 100)
+)
+
+COMMAND_SECONDS = registry.histogram(
+    "mcp_command_duration_seconds", "Shell command run time by how it was run and how it ended",
+    ("mode", "outcome"), buckets=METRICS_COMMAND_BUCKETS
+)
+JOBS_RUNNING = registry.gauge("mcp_jobs_running", "Background jobs running")
+JOBS_QUEUED = registry.gauge("mcp_jobs_queued", "Background jobs waiting for a worker")
+
+LLM_FIRST_TOKEN_SECONDS = registry.histogram(
+    "mcp_llm_first_token_seconds", "Time to the first streamed token, as reported by clients", ("model",),
+    buckets=METRICS_LLM_BUCKETS
+)
+LLM_DURATION_SECONDS = registry.histogram(
+    "mcp_llm_duration_seconds", "Time for a complete LLM response, as reported by clients", ("model",),
+    buckets=METRICS_LLM_BUCKETS
+)
+LLM_TOKENS_PER_SECOND = registry.histogram(
+    "mcp_llm_tokens_per_second", "LLM generation speed", ("model",), buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 200)
+)
+LLM_PROMPT_TOKENS = registry.histogram(
+    "mcp_llm_prompt_tokens", "Prompt size in tokens, context included", ("model",),
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+)
+
+def observe_search(kind, started, results):
+    """Record a search that began at perf_counter() `started` and found `results`."""
+    SEARCH_SECONDS.observe(time.perf_counter() - started, kind=kind)
+    SEARCH_RESULTS.observe(results, kind=kind)
+
+def observe_llm_request(timing):
+    """Record a client-reported LLM request timing in the LLM histograms."""
+    model = timing.get("model")
+    for histogram, field in (
+        (LLM_FIRST_TOKEN_SECONDS, "first_token_seconds"),
+        (LLM_DURATION_SECONDS, "total_seconds"),
+        (LLM_TOKENS_PER_SECOND, "tokens_per_second"),
+        (LLM_PROMPT_TOKENS, "prompt_tokens")
+    ):
+        if timing.get(field) is not None:
+            histogram.observe(timing[field], model=model)
+
+def command_outcome(exit_code):
+    return "success" if exit_code == 0 else "failure"
\ No newline at end of file
@@ -0,0 +1,464 @@
+import os
+import re
+import json
+import math
+import time
+import threading
+from collections import Counter
+from .database import db_connection, get_data_generation
+from .config import (
+    DB_FILE, SEMANTIC_INDEX_DIR, SEMANTIC_REFRESH_DELAY, SEMANTIC_POLL_INTERVAL,
+    SEMANTIC_COMPACT_RATIO
+)
+
+# NumPy/SciPy are optional; without them only keyword search is available
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+# Words, including those inside identifiers: "HTTPRetryError" -> HTTP, Retry, Error
+_WORD_RE = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])")
+
+# English filler and keywords too common in code to tell chunks apart
+_STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from", "how",
+    "if", "in", "is", "it", "of", "on", "or", "the", "this", "to", "we", "what", "where",
+    "which", "who", "why", "with", "def", "self", "return", "none", "true", "false",
+    "null", "var", "let", "const", "function", "import", "else", "elif", "int", "str",
+}
+
+# (suffix, replacement, shortest stem allowed)
+_SUFFIXES = (
+    ("ies", "y", 3), ("ied", "y", 3), ("ing", "", 4), ("ed", "", 4), ("es", "", 3), ("s", "", 3)
+)
+
+# Segments saved to disk are stored as these arrays
+_ARRAYS = ("data", "indices", "indptr", "chunk_ids", "project_ids")
+
+# Merge into a new saved segment once there are more in-memory segments than this
+_MAX_SEGMENTS = 8
+
+def _stem(word):
+    """Crude suffix stripping so e.g. "retries", "retrying" and "retry" meet."""
+    if word.endswith("ss"):
+        return word
+    for suffix, replacement, shortest in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= shortest:
+            return word[:-len(suffix)] + replacement
+    return word
+
+def tokenize(text):
+    """Split text (prose or code) into lowercase, stemmed terms."""
+    terms = []
+    for word in _WORD_RE.findall(text):
+        word = word.lower()
+        if 2 <= len(word) <= 30 and word not in _STOP_WORDS:
+            terms.append(_stem(word))
+    return terms
+
+def _deleted_rows(segment, chunk_ids):
+    """Rows of a segment holding any of chunk_ids; a segment's ids are in ascending order."""
+    positions = np.searchsorted(segment.chunk_ids, chunk_ids)
+    found = positions < len(segment.chunk_ids)
+    positions = positions[found]
+    return positions[segment.chunk_ids[positions] == chunk_ids[found]]
+
+def _pad_columns(matrix, columns):
+    """Widen a CSC matrix to `columns` columns without touching its data."""
+    extra = columns - matrix.shape[1]
+    if extra <= 0:
+        return matrix
+    indptr = np.concatenate([matrix.indptr, np.full(extra, matrix.indptr[-1], dtype=matrix.indptr.dtype)])
+    return sparse.csc_matrix((matrix.data, matrix.indices, indptr), shape=(matrix.shape[0], columns))
+
+class _Segment:
+    """A block of chunk vectors: rows are chunks, columns are terms."""
+
+    def __init__(self, matrix, chunk_ids, project_ids, alive=None):
+        self.matrix = matrix            # CSC, log-scaled term frequencies
+        self.chunk_ids = chunk_ids
+        self.project_ids = project_ids
+        self.alive = np.ones(len(chunk_ids), dtype=bool) if alive is None else alive
+        self.norms = None
+
+class SemanticIndex:
+    """TF-IDF vectors of indexed chunks for cosine-similarity search.
+
+    Vectors live in segments: the saved one, memory-mapped from disk, plus
+    small in-memory ones for chunks added since. Rows hold log-scaled term
+    frequencies and IDF is applied at query time, so weights stay current
+    as chunks come and go. Deleted chunks, read from the deleted_chunks
+    log, are masked out until the next compaction merges everything into a
+    new saved segment.
+
+    Without `persist` the index never writes to disk: it follows the saved
+    segment written by the process that does, reloading it whenever it
+    changes, and keeps newer chunks in memory.
+    """
+
+    def __init__(self, index_dir=SEMANTIC_INDEX_DIR, persist=True):
+        self.index_dir = index_dir
+        self.persist = persist
+        self.available = np is not None
+        self.refresh_lock = threading.Lock()
+        self.refresh_event = threading.Event()
+        self.refresh_thread = None
+        # Queries read this (vocabulary, idf, segments) snapshot; refreshes
+        # build a new one and swap it in
+        self.state = ({}, None, [])
+        self.df = None
+        self.max_id = 0
+        # Last deleted_chunks row applied (None: unknown, check every chunk),
+        # and the one recorded with the saved segment
+        self.deleted_seq = None
+        self.saved_deleted_seq = None
+        self.saved_rows = 0
+        self.changed_rows = 0
+        self.generation = None
+        self.loaded_version = None
+        self.refreshes = 0
+        self.last_refresh_seconds = 0.0
+
+    def start(self):
+        """Load the saved index and keep it in step with the database in the background."""
+        if not self.available or (self.refresh_thread and self.refresh_thread.is_alive()):
+            return
+        try:
+            self.load()
+        except Exception as e:
+            print(f"Error loading semantic index, rebuilding: {e}")
+
+        self.refresh_thread = threading.Thread(target=self._run, name="semantic-index", daemon=True)
+        self.refresh_thread.start()
+        self.schedule_refresh()
+
+    def schedule_refresh(self):
+        """Ask the background thread to pick up new chunks (e.g. after an index commit)."""
+        self.refresh_event.set()
+
+    def _run(self):
+        while True:
+            # Commits arrive in bursts while indexing; let them settle first
+            if self.refresh_event.wait(SEMANTIC_POLL_INTERVAL):
+                time.sleep(SEMANTIC_REFRESH_DELAY)
+                self.refresh_event.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing semantic index: {e}")
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def _saved_version(self):
+        try:
+            return os.stat(self._path("meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        """Memory-map the saved segment, if there is one for this database."""
+        # Worker processes reload while a refresh may be running
+        with self.refresh_lock:
+            return self._load()
+
+    def _load(self):
+        try:
+            version = self._saved_version()
+            with open(self._path("meta.json")) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return False
+
+        if meta.get("db_file") != DB_FILE:
+            return False
+
+        arrays = {name: np.load(self._path(f"{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+        with open(self._path("vocab.json")) as f:
+            terms = json.load(f)
+
+        matrix = sparse.csc_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]), shape=tuple(meta["shape"])
+        )
+        segment = _Segment(matrix, arrays["chunk_ids"], arrays["project_ids"])
+        vocab = {term: column for column, term in enumerate(terms)}
+        if len(vocab) != matrix.shape[1] or len(segment.chunk_ids) != matrix.shape[0]:
+            raise ValueError("saved semantic index is inconsistent")
+
+        self.df = np.zeros(len(vocab))
+        self.df[:matrix.shape[1]] = np.diff(matrix.indptr)
+        self.max_id = meta["max_id"]
+        self.deleted_seq = self.saved_deleted_seq = meta.get("deleted_seq")
+        self.saved_rows = matrix.shape[0]
+        self.changed_rows = 0
+        self.generation = None
+        self.loaded_version = version
+        self._publish(vocab, [segment])
+        return True
+
+    def _save(self, segment, vocab):
+        """Write a segment and the vocabulary; files are replaced only once all are written."""
+        os.makedirs(self.index_dir, exist_ok=True)
+        matrix = segment.matrix
+        index_type = np.int32 if matrix.nnz < 2 ** 31 else np.int64
+        arrays = {
+            "data": matrix.data.astype(np.float32),
+            "indices": matrix.indices.astype(index_type),
+            "indptr": matrix.indptr.astype(index_type),
+            "chunk_ids": np.asarray(segment.chunk_ids, dtype=np.int64),
+            "project_ids": np.asarray(segment.project_ids, dtype=np.int64),
+        }
+        meta = {
+            "db_file": DB_FILE, "max_id": self.max_id, "deleted_seq": self.deleted_seq,
+            "shape": list(matrix.shape)
+        }
+
+        written = []
+        for name, array in arrays.items():
+            with open(self._path(f"{name}.npy.tmp"), "wb") as f:
+                np.save(f, array)
+            written.append(f"{name}.npy")
+        with open(self._path("vocab.json.tmp"), "w") as f:
+            json.dump(sorted(vocab, key=vocab.get), f)
+        written.append("vocab.json")
+        with open(self._path("meta.json.tmp"), "w") as f:
+            json.dump(meta, f)
+        written.append("meta.json")
+
+        for name in written:
+            os.replace(self._path(name + ".tmp"), self._path(name))
+
+    def _publish(self, vocab, segments):
+        """Recompute IDF and row norms, then swap in the new state."""
+        live = sum(int(segment.alive.sum()) for segment in segments)
+        idf = np.log((live + 1) / (self.df + 1)) + 1
+        for segment in segments:
+            columns = segment.matrix.shape[1]
+            segment.norms = np.sqrt(segment.matrix.power(2) @ (idf[:columns] ** 2))
+        self.state = (vocab, idf, segments)
+
+    def refresh(self):
+        """Bring the vectors up to date with code_chunks.
+
+        Only chunks added since the last refresh are tokenized, and only
+        chunks deleted since then are masked. Returns whether anything was
+        checked.
+        """
+        if not self.available:
+            return False
+
+        with self.refresh_lock:
+            # Another process compacted the index; start from its saved segment
+            if not self.persist and self._saved_version() not in (None, self.loaded_version):
+                self._load()
+
+            generation = get_data_generation().get("code")
+            if generation == self.generation:
+                return False
+
+            started = time.time()
+            vocab, _, segments = self.state
+            vocab = dict(vocab)
+            df = self.df if self.df is not None else np.zeros(0)
+
+            with db_connection(readonly=True) as conn:
+                c = conn.cursor()
+
+                c.execute("SELECT MAX(id) FROM code_chunks")
+                newest = c.fetchone()[0] or 0
+                if newest < self.max_id:
+                    # Chunk ids went backwards: the index was rebuilt, so start over
+                    vocab, segments, df, self.max_id, self.saved_rows = {}, [], np.zeros(0), 0, 0
+
+                # Mask rows whose chunks are gone and take them out of the document frequencies
+                c.execute("SELECT COALESCE(MAX(seq), 0) FROM deleted_chunks")
+                deleted_seq = c.fetchone()[0]
+                if not segments:
+                    dead_rows = None
+                elif self.deleted_seq is None:
+                    # No record of which deletions were applied; check every chunk once
+                    c.execute("SELECT id FROM code_chunks WHERE id <= ?", (self.max_id,))
+                    live_ids = np.fromiter((row[0] for row in c), dtype=np.int64)
+                    dead_rows = lambda segment: np.flatnonzero(~np.isin(segment.chunk_ids, live_ids))
+                else:
+                    c.execute(
+                        "SELECT chunk_id FROM deleted_chunks WHERE seq > ? AND seq <= ?",
+                        (self.deleted_seq, deleted_seq)
+                    )
+                    deleted_ids = np.unique(np.fromiter((row[0] for row in c), dtype=np.int64))
+                    dead_rows = (lambda segment: _deleted_rows(segment, deleted_ids)) if len(deleted_ids) else None
+                self.deleted_seq = deleted_seq
+
+                if dead_rows is not None:
+                    updated = []
+                    for segment in segments:
+                        dead = dead_rows(segment)
+                        dead = dead[segment.alive[dead]]
+                        alive = segment.alive
+                        if len(dead):
+                            alive = alive.copy()
+                            alive[dead] = False
+                            df = df.copy()
+                            df[:segment.matrix.shape[1]] -= np.diff(segment.matrix[dead].indptr)
+                            self.changed_rows += len(dead)
+                        updated.append(_Segment(segment.matrix, segment.chunk_ids, segment.project_ids, alive))
+                    segments = updated
+
+                # Vectorize new chunks; ids only grow, so "newer than max_id" finds them all
+                rows, columns, values, chunk_ids, project_ids = [], [], [], [], []
+                c.execute(
+                    "SELECT id, project_id, file_path, name, content FROM code_chunks WHERE id > ? ORDER BY id",
+                    (self.max_id,)
+                )
+                for chunk_id, project_id, file_path, name, content in c:
+                    # Names and file names say a lot about a chunk; count them twice
+                    label = f"{name or ''} {os.path.splitext(os.path.basename(file_path))[0]} "
+                    counts = Counter(tokenize(label * 2 + (content or "")))
+                    row = len(chunk_ids)
+                    for term, count in counts.items():
+                        rows.append(row)
+                        columns.append(vocab.setdefault(term, len(vocab)))
+                        values.append(1.0 + math.log(count))
+                    chunk_ids.append(chunk_id)
+                    project_ids.append(project_id)
+
+            if len(df) < len(vocab):
+                df = np.concatenate([df, np.zeros(len(vocab) - len(df))])
+            if chunk_ids:
+                matrix = sparse.csc_matrix(
+                    (np.asarray(values, dtype=np.float32), (rows, columns)),
+                    shape=(len(chunk_ids), len(vocab))
+                )
+                df[:matrix.shape[1]] += np.diff(matrix.indptr)
+                segments.append(_Segment(matrix, np.asarray(chunk_ids, dtype=np.int64),
+                                         np.asarray(project_ids, dtype=np.int64)))
+                self.max_id = chunk_ids[-1]
+                self.changed_rows += len(chunk_ids)
+
+            self.df = df
+            if len(segments) > _MAX_SEGMENTS or \
+                    (self.persist and self.changed_rows > SEMANTIC_COMPACT_RATIO * self.saved_rows):
+                segments = [self._compact(segments, vocab)]
+            self._publish(vocab, segments)
+
+            self.generation = generation
+            self.refreshes += 1
+            self.last_refresh_seconds = time.time() - started
+            return True
+
+    def _compact(self, segments, vocab):
+        """Merge live rows of all segments into one, save it and map it back in."""
+        blocks = [
+            _pad_columns(segment.matrix[np.flatnonzero(segment.alive)], len(vocab))
+            for segment in segments
+        ]
+        if blocks:
+            matrix = sparse.vstack(blocks, format="csc")
+        else:
+            matrix = sparse.csc_matrix((0, len(vocab)), dtype=np.float32)
+        merged = _Segment(
+            matrix,
+            np.concatenate([segment.chunk_ids[segment.alive] for segment in segments] or [np.zeros(0, np.int64)]),
+            np.concatenate([segment.project_ids[segment.alive] for segment in segments] or [np.zeros(0, np.int64)])
+        )
+
+        if not self.persist:
+            return merged
+
+        try:
+            self._save(merged, vocab)
+            arrays = {name: np.load(self._path(f"{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+            merged = _Segment(
+                sparse.csc_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=matrix.shape),
+                arrays["chunk_ids"],
+                arrays["project_ids"]
+            )
+        except OSError as e:
+            print(f"Error saving semantic index: {e}")
+        else:
+            self._prune_deleted()
+
+        self.saved_rows = matrix.shape[0]
+        self.changed_rows = 0
+        return merged
+
+    def _prune_deleted(self):
+        """Drop deletion log rows that are no longer needed.
+
+        Processes following the saved segment read the log from the
+        position saved with it, so rows are kept until one more compaction
+        has happened; a process further behind reloads before reading.
+        """
+        pruned, self.saved_deleted_seq = self.saved_deleted_seq, self.deleted_seq
+        if not pruned:
+            return
+        try:
+            with db_connection() as conn:
+                conn.execute("DELETE FROM deleted_chunks WHERE seq <= ?", (pruned,))
+                conn.commit()
+        except Exception as e:
+            print(f"Error pruning deleted chunk log: {e}")
+
+    def search(self, query, limit=10, project_ids=None):
+        """Get (chunk_id, score) pairs for the chunks most similar to the query, best first."""
+        if not self.available or project_ids == []:
+            return []
+
+        vocab, idf, segments = self.state
+        counts = Counter(term for term in tokenize(query) if term in vocab)
+        if not counts or idf is None:
+            return []
+
+        columns = np.array([vocab[term] for term in counts])
+        weights = np.array([1.0 + math.log(count) for count in counts.values()]) * idf[columns]
+        weights /= np.linalg.norm(weights)
+
+        scores, chunk_ids = [], []
+        for segment in segments:
+            usable = columns < segment.matrix.shape[1]
+            if not usable.any() or not len(segment.chunk_ids):
+                continue
+
+            # Dot products with every chunk in one sparse-matrix/vector product
+            # over just the query's columns, then cosine normalization
+            segment_scores = segment.matrix[:, columns[usable]] @ (weights[usable] * idf[columns[usable]])
+            segment_scores /= np.maximum(segment.norms, 1e-9)
+
+            mask = segment.alive
+            if project_ids is not None:
+                mask = mask & np.isin(segment.project_ids, project_ids)
+            scores.append(np.where(mask, segment_scores, 0.0))
+            chunk_ids.append(segment.chunk_ids)
+
+        if not scores:
+            return []
+
+        scores = np.concatenate(scores)
+        chunk_ids = np.concatenate(chunk_ids)
+        k = min(limit, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(chunk_ids[i]), round(float(scores[i]), 4)) for i in top]
+
+    def get_stats(self):
+        """Get index size and freshness for status reporting."""
+        vocab, _, segments = self.state
+        return {
+            "available": self.available,
+            "chunks": sum(int(segment.alive.sum()) for segment in segments),
+            "terms": len(vocab),
+            "segments": len(segments),
+            "saved_rows": self.saved_rows,
+            "pending_rows": self.changed_rows,
+            "refreshes": self.refreshes,
+            "last_refresh_seconds": round(self.last_refresh_seconds, 3)
+        }
+
+# Global semantic index instance
+semantic_index = SemanticIndex()
\ No newline at end of file
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import time
+import signal
+import socket
+import secrets
+import argparse
+import threading
+import multiprocessing
+from multiprocessing.managers import BaseManager, BaseProxy
+from werkzeug.serving import make_server, WSGIRequestHandler
+from werkzeug.wsgi import LimitedStream
+
+from server import mcp_server
+from server.code_indexer import indexer
+from server.command_jobs import job_manager, ACTIVE_STATES
+from server.semantic_index import semantic_index
+from server.metrics import worker_metrics
+from server.config import (
+    SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_SHUTDOWN_TIMEOUT, SERVER_SOCKET,
+    SERVER_KEEPALIVE_TIMEOUT, METRICS_PUSH_INTERVAL
+)
+
+# Workers are started fresh rather than forked from a process running threads
+_context = multiprocessing.get_context("spawn")
+
+# Unread request bodies up to this size are skipped to keep the connection open
+_MAX_SKIPPED_BODY = 1024 * 1024
+
+class CommandJobProxy(BaseProxy):
+    """A job living in the owner process, with the attributes the job endpoints read."""
+    _exposed_ = ("read_output", "to_dict")
+
+    def read_output(self, offset=0, wait=0):
+        return self._callmethod("read_output", (offset, wait))
+
+    def to_dict(self):
+        return self._callmethod("to_dict")
+
+    @property
+    def status(self):
+        return self.to_dict()["status"]
+
+    @property
+    def exit_code(self):
+        return self.to_dict()["exit_code"]
+
+    @property
+    def done(self):
+        return self.status not in ACTIVE_STATES
+
+class JobManagerProxy(BaseProxy):
+    """The owner's job manager; unknown job ids give None as they do locally."""
+    _exposed_ = ("submit", "get", "has_job", "cancel", "list_jobs", "get_stats")
+    _method_to_typeid_ = {"submit": "CommandJob", "get": "CommandJob", "cancel": "CommandJob"}
+
+    def submit(self, command, working_dir, timeout=None, max_output=None):
+        return self._callmethod("submit", (command, working_dir, timeout, max_output))
+
+    def get(self, job_id):
+        if not self._callmethod("has_job", (job_id,)):
+            return None
+        return self._callmethod("get", (job_id,))
+
+    def cancel(self, job_id):
+        if not self._callmethod("has_job", (job_id,)):
+            return None
+        return self._callmethod("cancel", (job_id,))
+
+    def list_jobs(self):
+        return self._callmethod("list_jobs")
+
+    def get_stats(self):
+        return self._callmethod("get_stats")
+
+class OwnerManager(BaseManager):
+    """Serves the owner process's indexer, job manager and metrics to the workers."""
+
+OwnerManager.register(
+    "indexer",
+    callable=lambda: indexer,
+    exposed=(
+        "index_project", "cancel_indexing", "pause_indexing", "resume_indexing",
+        "start_watching", "stop_watching", "drop_project", "get_indexing_status"
+    )
+)
+OwnerManager.register("jobs", callable=lambda: job_manager, proxytype=JobManagerProxy)
+OwnerManager.register("CommandJob", proxytype=CommandJobProxy, create_method=False)
+OwnerManager.register("metrics", callable=lambda: worker_metrics, exposed=("update", "render"))
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """Request handler that keeps HTTP/1.1 connections open between requests.
+
+    Werkzeug closes every connection, partly because after each response it
+    throws away whatever the client has sent since, which on a kept-alive
+    connection could be the next request. Here the app reads the body
+    through a stream bounded by Content-Length, the unread rest of it is
+    skipped afterwards, and Werkzeug's discard step is given nothing to read.
+    Connections idle for SERVER_KEEPALIVE_TIMEOUT seconds are closed.
+    """
+    timeout = SERVER_KEEPALIVE_TIMEOUT
+    keep_alive = False
+    body = None
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; don't let the second
+        # wait for the client's delayed ACK of the first
+        if self.connection.family in (socket.AF_INET, socket.AF_INET6):
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _can_keep_alive(self):
+        if self.request_version != "HTTP/1.1" or self.close_connection:
+            return False
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            return False
+        return self.headers.get("Content-Length", "0").strip().isdigit()
+
+    def run_wsgi(self):
+        self.keep_alive = self._can_keep_alive()
+        rfile = self.rfile
+        try:
+            super().run_wsgi()
+        finally:
+            self.rfile = rfile
+
+        if not self.keep_alive or not self._skip_body():
+            self.close_connection = True
+
+    def make_environ(self):
+        environ = super().make_environ()
+        if self.keep_alive:
+            self.body = LimitedStream(self.rfile, int(self.headers.get("Content-Length", "0")))
+            environ["wsgi.input"] = self.body
+            environ["wsgi.input_terminated"] = True
+            self.rfile = io.BytesIO()
+        return environ
+
+    def _skip_body(self):
+        """Read past what the app left of the request body. Returns whether that worked."""
+        if self.body is None:
+            return True
+        if self.body.limit - self.body.tell() > _MAX_SKIPPED_BODY:
+            return False
+        try:
+            while self.body.read(64 * 1024):
+                pass
+        except Exception:
+            return False
+        return True
+
+    def send_header(self, keyword, value):
+        # Werkzeug asks for every connection to be closed
+        if self.keep_alive and keyword.lower() == "connection":
+            return
+        super().send_header(keyword, value)
+
+    def log_error(self, format, *args):
+        # Idle keep-alive connections timing out are routine
+        if not format.startswith("Request timed out"):
+            super().log_error(format, *args)
+
+class InFlightRequests:
+    """WSGI middleware counting requests in progress, so shutdown can let them finish."""
+
+    def __init__(self, app):
+        self.app = app
+        self.active = 0
+        self.idle = threading.Condition()
+
+    def __call__(self, environ, start_response):
+        with self.idle:
+            self.active += 1
+        try:
+            body = self.app(environ, start_response)
+        except BaseException:
+            self._finished()
+            raise
+        return _ClosingIterator(body, self._finished)
+
+    def _finished(self):
+        with self.idle:
+            self.active -= 1
+            self.idle.notify_all()
+
+    def wait_idle(self, timeout):
+        """Wait for running requests (streams included) to complete. Returns whether they did."""
+        deadline = time.monotonic() + timeout
+        with self.idle:
+            while self.active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.idle.wait(remaining)
+        return True
+
+class _ClosingIterator:
+    """Response body that reports completion once the server closes it."""
+
+    def __init__(self, body, on_close):
+        self.body = body
+        self.on_close = on_close
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def close(self):
+        try:
+            if hasattr(self.body, "close"):
+                self.body.close()
+        finally:
+            self.on_close()
+
+def _http_server(host, port, app, listener=None):
+    """A threaded server, on an already listening socket if one is given."""
+    return make_server(
+        host, port, app,
+        threaded=True,
+        request_handler=KeepAliveRequestHandler,
+        fd=listener.fileno() if listener is not None else None
+    )
+
+def _wait_for_signal(tick=None):
+    """Block until SIGTERM or SIGINT, calling tick() about once a second meanwhile."""
+    stopping = threading.Event()
+
+    def request_stop(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    # Wake up now and then so the handlers run promptly on every platform
+    while not stopping.wait(1.0):
+        if tick is not None:
+            tick()
+
+def _serve(servers, requests, name):
+    """Run HTTP servers until SIGTERM/SIGINT, then drain them."""
+    for server in servers:
+        threading.Thread(target=server.serve_forever, name="http-server", daemon=True).start()
+
+    _wait_for_signal()
+    for server in servers:
+        server.shutdown()
+    if not requests.wait_idle(SERVER_SHUTDOWN_TIMEOUT):
+        print(f"{name}: {requests.active} requests still running after {SERVER_SHUTDOWN_TIMEOUT}s, stopping anyway")
+    for server in servers:
+        server.server_close()
+
+def _unix_listener(path):
+    """Listen on a Unix socket that only this user can connect to."""
+    if os.path.exists(path):
+        os.remove(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    os.chmod(path, 0o600)
+    listener.listen(128)
+    return listener
+
+def _remove_socket(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def _push_metrics_forever():
+    while True:
+        time.sleep(METRICS_PUSH_INTERVAL)
+        try:
+            mcp_server.push_metrics()
+        except Exception as e:
+            print(f"Error sending metrics to the owner process: {e}")
+
+def _run_worker(listener, unix_listener, host, port, unix_socket, manager_address, authkey):
+    """Worker process: answer requests on the shared sockets, using the owner's indexer and jobs."""
+    manager = OwnerManager(address=manager_address, authkey=authkey)
+    manager.connect()
+    mcp_server.attach_owner(manager.indexer(), manager.jobs(), manager.metrics())
+    threading.Thread(target=_push_metrics_forever, name="metrics-push", daemon=True).start()
+
+    # Follow the owner's saved semantic index rather than writing one
+    semantic_index.persist = False
+    semantic_index.start()
+
+    requests = InFlightRequests(mcp_server.app)
+    servers = [_http_server(host, port, requests, listener)]
+    if unix_listener is not None:
+        servers.append(_http_server(f"unix://{unix_socket}", 0, requests, unix_listener))
+    _serve(servers, requests, f"Worker {os.getpid()}")
+
+def _start_worker(*args):
+    process = _context.Process(target=_run_worker, args=args, name="mcp-worker")
+    process.start()
+    return process
+
+def _stop_workers(workers):
+    for process in workers:
+        if process.is_alive():
+            process.terminate()
+    deadline = time.monotonic() + SERVER_SHUTDOWN_TIMEOUT + 5
+    for process in workers:
+        process.join(max(0, deadline - time.monotonic()))
+        if process.is_alive():
+            print(f"Worker {process.pid} did not stop, killing it")
+            process.kill()
+            process.join()
+
+def serve_threaded(host, port, unix_socket=None):
+    """Serve from this process alone, one thread per request."""
+    mcp_server.start_background()
+    requests = InFlightRequests(mcp_server.app)
+    servers = [_http_server(host, port, requests)]
+    if unix_socket:
+        unix_listener = _unix_listener(unix_socket)
+        servers.append(_http_server(f"unix://{unix_socket}", 0, requests, unix_listener))
+        unix_listener.close()
+    try:
+        _serve(servers, requests, "Server")
+    finally:
+        _remove_socket(unix_socket)
+        mcp_server.stop_background()
+
+def serve_workers(host, port, workers, unix_socket=None):
+    """Serve from `workers` processes sharing one listening socket.
+
+    This process owns the indexer, the semantic index writer and the
+    background jobs and hands them to workers over a local manager
+    connection; a worker that dies is replaced.
+    """
+    mcp_server.start_background()
+
+    authkey = secrets.token_bytes(32)
+    manager_server = OwnerManager(address=("127.0.0.1", 0), authkey=authkey).get_server()
+    threading.Thread(target=manager_server.serve_forever, name="owner-manager", daemon=True).start()
+
+    listener = socket.create_server((host, port), backlog=128)
+    unix_listener = _unix_listener(unix_socket) if unix_socket else None
+    args = (listener, unix_listener, host, port, unix_socket, manager_server.address, authkey)
+
+    processes = [_start_worker(*args) for _ in range(workers)]
+
+    def replace_dead_workers():
+        for index, process in enumerate(processes):
+            if not process.is_alive():
+                print(f"Worker {process.pid} exited with code {process.exitcode}, restarting it")
+                processes[index] = _start_worker(*args)
+
+    try:
+        _wait_for_signal(replace_dead_workers)
+    finally:
+        _stop_workers(processes)
+        listener.close()
+        if unix_listener is not None:
+            unix_listener.close()
+            _remove_socket(unix_socket)
+        mcp_server.stop_background()
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Run the MCP server")
+    parser.add_argument("--host", default=SERVER_HOST, help="Address to listen on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS,
+                        help="Worker processes answering requests (1 serves from this process)")
+    parser.add_argument("--unix-socket", default=SERVER_SOCKET,
+                        help="Also listen on this Unix domain socket (default: $MCP_SERVER_SOCKET)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    print(f"Starting MCP Server on {args.host}:{args.port} with {max(args.workers, 1)} worker(s)")
+    print("Press Ctrl+C to exit")
+
+    if args.unix_socket and not hasattr(socket, "AF_UNIX"):
+        print("Unix domain sockets are not supported on this platform; serving over TCP only")
+        args.unix_socket = None
+    elif args.unix_socket:
+        print(f"Also listening on {args.unix_socket}")
+
+    if args.workers > 1:
+        serve_workers(args.host, args.port, args.workers, args.unix_socket)
+    else:
+        serve_threaded(args.host, args.port, args.unix_socket)
+    print("MCP Server stopped")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file